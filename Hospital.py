@@ -1,33 +1,30 @@
+import argparse
 import csv
+import io
+import json
 import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
 
-def insert_data_from_csv(csv_file, table_name, conn):
-    with open(csv_file, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        next(reader)  # Skip header row
-        data = [tuple(row) for row in reader]
+from db import DB_PATH, WriterQueue, configure_storage
+from identity import refresh_identity_map
+from load_state import (
+    SAVE_ROW_HASH, changed_rows, first_rows, hash_rows, plan_load, save_state, table_key, update_sql,
+)
+from migrations import NURSE_ASSIGNMENT_SCHEMA, SEARCH_INDEXES, apply_migrations, rebuild_aggregates
+from query_stats import InstrumentedConnection, get_stats, page
 
-    if not data:
-        print(f"No data found in {csv_file}. Skipping insertion.")
-        return
-
-    # Use INSERT OR IGNORE to avoid duplicate key errors
-    query = f"INSERT OR IGNORE INTO {table_name} VALUES ({', '.join(['?' for _ in data[0]])})"
-    
-    try:
-        conn.executemany(query, data)
-        conn.commit()
-        print(f"Inserted {conn.total_changes} new rows into {table_name}.")
-    except sqlite3.IntegrityError as e:
-        print(f"Error inserting into {table_name}: {e}")
-# Connect to SQLite database
-conn = sqlite3.connect("hospital.db")
-
-# Ensure foreign keys are enabled
-conn.execute("PRAGMA foreign_keys = ON;")
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 # Create tables with consistent naming
-conn.executescript("""
+SCHEMA = """
                    
 CREATE TABLE IF NOT EXISTS USER_DATA(
     user_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -95,6 +92,8 @@ CREATE TABLE IF NOT EXISTS APPOINTMENT (
     DATE TEXT NOT NULL, 
     TIME TEXT NOT NULL, 
     PAT_ID INTEGER NOT NULL,
+    START_TS TEXT,
+    END_TS TEXT,
     FOREIGN KEY (DOC_ID) REFERENCES DOCTOR(DOC_ID) ON DELETE CASCADE,
     FOREIGN KEY (PAT_ID) REFERENCES PATIENT(PAT_ID) ON DELETE CASCADE
 );
@@ -104,37 +103,9 @@ invoice_id TEXT NOT NULL PRIMARY KEY,
 pat_id INTEGER NOT NULL, 
 items TEXT NOT NULL, 
 amount REAL NOT NULL, 
+BILLED_ON TEXT,
 FOREIGN KEY (pat_id) REFERENCES Patient(pat_id) ON DELETE CASCADE);
 
-DROP VIEW IF EXISTS Nurse_Appointments;
-CREATE VIEW Nurse_Appointments AS
-SELECT 
-    A.appt_id, 
-    P.pat_id, 
-    P.fname AS patient_fname, 
-    P.lname AS patient_lname, 
-    A.date, 
-    A.time, 
-    D.doc_id, 
-    D.doc_name AS doctor_name,
-    S.staff_id AS nurse_id,  
-    S.name AS nurse_name
-FROM Appointment A
-JOIN Patient P ON A.pat_id = P.pat_id
-JOIN Doctor D ON A.doc_id = D.doc_id
-JOIN Staff S ON S.staff_id = P.pat_id  
-WHERE S.designation = 'Nurse';  
-
-DROP VIEW IF EXISTS Nurse_Patient_History;
-CREATE VIEW Nurse_Patient_History AS
-SELECT 
-    UH.pat_name, 
-    UH.history
-FROM Updated_History UH;
-
-
-PRAGMA foreign_keys=OFF;
-BEGIN TRANSACTION;
 CREATE TABLE IF NOT EXISTS Medical_History (  
     proc_id INTEGER NOT NULL,  
     name TEXT NOT NULL,  
@@ -143,22 +114,508 @@ CREATE TABLE IF NOT EXISTS Medical_History (
     FOREIGN KEY (appt_id) REFERENCES Appointment(appt_id) ON DELETE CASCADE
     
 );
-""")
+""" + NURSE_ASSIGNMENT_SCHEMA  # nurse-patient assignments, see migrations.py
+
+# (CSV file, table), parents before the tables that reference them
+CSV_FEEDS = (
+    ('Department.csv', 'DEPARTMENT'),
+    ('Staff_table_filled.csv', 'STAFF'),
+    ('Cashiers.csv', 'CASHIER'),
+    ('Doctor.csv', 'DOCTOR'),
+    ('Nurse.csv', 'NURSE'),
+    ('Admin.csv', 'ADMIN'),
+    ('Patient.csv', 'PATIENT'),
+    ('Appointment.csv', 'APPOINTMENT'),
+    ('med_history.csv', 'MEDICAL_HISTORY'),
+    ('Billing.csv', 'BILLING'),
+    ('User_data.csv', 'USER_DATA'),
+)
+
+# Sample data, loaded only with --sample-data (see sample_data/README.md).
+# No feed of nurse-patient assignments exists yet; these are made up, so
+# the nurse pages have patients to show in a demo database.
+SAMPLE_FEEDS = (
+    ('sample_data/Nurse_assignment.csv', 'NURSE_ASSIGNMENT'),
+)
+
+# Tables the dashboard summaries are computed from
+AGGREGATE_SOURCES = {'APPOINTMENT', 'BILLING', 'PATIENT', 'DOCTOR', 'STAFF'}
+
+# Rows per INSERT job handed to the writer
+BATCH_SIZE = 5000
+# Raw CSV text per chunk handed to a parser process
+CHUNK_BYTES = 4 * 1024 * 1024
+# Parsed chunks and insert batches allowed in flight, which bounds memory
+MAX_PENDING = 4
+# Rejected rows quoted in the load report, per table
+REJECTED_SAMPLES = 20
+# Statements listed in the load report, the most total time first
+REPORTED_QUERIES = 20
+
+
+def read_chunks(file, chunk_bytes=CHUNK_BYTES):
+    # Yield lists of raw lines of about chunk_bytes each. A chunk only ends
+    # between records, never inside a quoted field that spans lines.
+    lines = []
+    size = 0
+    in_quotes = False
+    for line in file:
+        lines.append(line)
+        size += len(line)
+        if line.count('"') % 2:
+            in_quotes = not in_quotes
+        if size >= chunk_bytes and not in_quotes:
+            yield lines
+            lines = []
+            size = 0
+    if lines:
+        yield lines
+
+
+def parse_chunk(lines):
+    # Runs in a worker process; blank lines are skipped
+    return [tuple(row) for row in csv.reader(lines) if row]
+
+
+def parse_keyed_chunk(key_positions, lines):
+    return hash_rows(key_positions, parse_chunk(lines))
+
+
+def timed_parse(parse, lines):
+    start = time.perf_counter()
+    rows = parse(lines)
+    return rows, time.perf_counter() - start
+
+
+def parse_chunks(chunks, pool, parse=parse_chunk, stats=None):
+    # Parse chunks on the pool, yielding the rows in file order. The time
+    # spent parsing, in whichever process did it, is added to stats.
+    timed = partial(timed_parse, parse)
+    if pool is None:
+        results = (timed(chunk) for chunk in chunks)
+    else:
+        results = _pooled(chunks, pool, timed)
+    for rows, seconds in results:
+        if stats is not None:
+            stats["parse_seconds"] += seconds
+        yield rows
+
+
+def _pooled(chunks, pool, fn):
+    # A file of one chunk is parsed inline: starting the workers and
+    # pickling the chunk to them would cost more than parsing it here
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    second = next(chunks, None) if first is not None else None
+    if second is None:
+        if first is not None:
+            yield fn(first)
+        return
+    pending = deque()
+    for chunk in chain((first, second), chunks):
+        pending.append(pool.submit(fn, chunk))
+        if len(pending) >= MAX_PENDING:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def batches(parsed, batch_size):
+    batch = []
+    for rows in parsed:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def table_columns(conn, table_name):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+
+
+def insert_columns(header, columns):
+    # Insert by column name when the CSV header names the table's columns,
+    # so a feed in a different column order (Appointment.csv) still lands in
+    # the right columns; otherwise insert by position as before
+    by_name = {column.upper(): column for column in columns}
+    names = [name.strip().upper() for name in header]
+    if len(set(names)) == len(names) and all(name in by_name for name in names):
+        return [by_name[name] for name in names]
+    return columns[:len(header)]
+
+
+def drop_secondary_objects(conn, table_name):
+    # Drop the table's indexes and triggers, returning the SQL to recreate
+    # them. Indexes behind PRIMARY KEY/UNIQUE have no SQL and stay.
+    objects = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE type IN ('index', 'trigger') AND tbl_name = ? COLLATE NOCASE AND sql IS NOT NULL",
+        (table_name,),
+    ).fetchall()
+    for kind, name, sql in objects:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    return [sql for kind, name, sql in objects]
+
+
+def restore_secondary_objects(conn, table_name, ddl):
+    for sql in ddl:
+        conn.execute(sql)
+    # The FTS sync triggers were off during the load
+    for fts, table, rowid, columns in SEARCH_INDEXES:
+        if table.upper() == table_name.upper():
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    conn.execute(f"ANALYZE {table_name}")
+
+
+def write_rows(conn, query, rows):
+    # Returns (rows changed, [(index, reason)]). A batch that fails is
+    # retried row by row, so only the offending rows are rejected.
+    conn.execute("SAVEPOINT batch")
+    try:
+        changed = conn.executemany(query, rows).rowcount
+        conn.execute("RELEASE batch")
+        return changed, []
+    except sqlite3.Error:
+        conn.execute("ROLLBACK TO batch")
+        conn.execute("RELEASE batch")
+    changed = 0
+    rejected = []
+    for i, row in enumerate(rows):
+        try:
+            changed += conn.execute(query, row).rowcount
+        except sqlite3.Error as e:
+            rejected.append((i, str(e)))
+    return changed, rejected
+
+
+def peak_memory_mb(workers=False):
+    # High-water mark of this process so far, or with workers=True of the
+    # largest parser process that has exited (KB on Linux, bytes on macOS)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if workers else resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def new_table_stats(csv_file, table_name):
+    return {
+        "table": table_name,
+        "file": csv_file,
+        "status": "loaded",
+        "rows_read": 0,
+        "rows_inserted": 0,
+        "rows_updated": 0,
+        "rows_ignored": 0,
+        "rows_unchanged": 0,
+        "rows_rejected": 0,
+        "rejected_reasons": {},
+        "rejected_samples": [],
+        "parse_seconds": 0.0,
+        "insert_seconds": 0.0,
+        "index_seconds": 0.0,
+        "total_seconds": 0.0,
+        "rows_per_second": 0.0,
+        # The loading process only: the parser processes are measured once
+        # they exit, for the whole load (see load_all)
+        "parent_peak_memory_mb": None,
+    }
+
+
+def reject(stats, record, reason, row):
+    stats["rows_rejected"] += 1
+    stats["rejected_reasons"][reason] = stats["rejected_reasons"].get(reason, 0) + 1
+    if len(stats["rejected_samples"]) < REJECTED_SAMPLES:
+        stats["rejected_samples"].append({"record": record, "reason": reason, "row": list(row)})
+
+
+def insert_data_from_csv(csv_file, table_name, writer, pool=None, batch_size=BATCH_SIZE,
+                         chunk_bytes=CHUNK_BYTES, rebuild_indexes=True, state_conn=None):
+    """Load one CSV feed and return its entry for the load report.
+
+    With state_conn (a read connection) the load is incremental: only new
+    and changed rows are written, inserted or updated by the table's key.
+    Later rows with a key already read from the file are ignored, as the
+    full load's INSERT OR IGNORE does.
+    """
+    start = time.perf_counter()
+    stats = new_table_stats(csv_file, table_name)
+    incremental = state_conn is not None
+    offset = 0
+    if incremental:
+        offset, size, checksum = plan_load(state_conn, csv_file)
+        if offset is None:
+            stats["status"] = "unchanged"
+            print(f"{csv_file} is unchanged since the last load. Skipping.")
+            return finish_stats(stats, start)
+
+    with open(csv_file, 'rb') as raw:
+        header = next(csv.reader([raw.readline().decode('utf-8')]), None)
+        if not header:
+            stats["status"] = "empty"
+            print(f"No data found in {csv_file}. Skipping insertion.")
+            return finish_stats(stats, start)
+        if offset:
+            # Appended to since the last load: read only the new tail
+            stats["status"] = "appended"
+            raw.seek(offset)
+        file = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+        columns = insert_columns(header, writer.submit(lambda conn: table_columns(conn, table_name)).result())
+        # Use INSERT OR IGNORE to avoid duplicate key errors
+        query = (
+            f"INSERT OR IGNORE INTO {table_name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['?' for _ in columns])})"
+        )
+        parse = parse_chunk
+        key = None
+        if incremental:
+            key = writer.submit(lambda conn: table_key(conn, table_name)).result()
+            if key and all(column in columns for column in key):
+                update, update_positions = update_sql(table_name, columns, key)
+                parse = partial(parse_keyed_chunk, [columns.index(column) for column in key])
+                # Keys read so far, to ignore later rows with the same key
+                seen = set()
+            else:
+                # No key to match rows on: a changed file is re-inserted as before
+                key = None
+
+        def insert(conn, batch):
+            job_start = time.perf_counter()
+            inserted, rejected = write_rows(conn, query, batch)
+            return inserted, 0, rejected, time.perf_counter() - job_start
+
+        def upsert_changed(conn, keyed):
+            # New keys are inserted, then rows of existing keys updated where
+            # they differ; rows inserted just now match and are left alone
+            job_start = time.perf_counter()
+            rows = [row for row, row_key, digest in keyed]
+            inserted, rejected = write_rows(conn, query, rows)
+            updated = 0
+            if update is not None:
+                bad = {i for i, reason in rejected}
+                kept = [i for i in range(len(rows)) if i not in bad]
+                updated, update_rejected = write_rows(
+                    conn, update, [tuple(rows[i][position] for position in update_positions) for i in kept]
+                )
+                rejected += [(kept[i], reason) for i, reason in update_rejected]
+            bad = {i for i, reason in rejected}
+            conn.executemany(SAVE_ROW_HASH, [
+                (table_name, row_key, digest) for i, (row, row_key, digest) in enumerate(keyed) if i not in bad
+            ])
+            return inserted, updated, rejected, time.perf_counter() - job_start
+
+        def timed_index_job(fn):
+            def job(conn):
+                job_start = time.perf_counter()
+                result = fn(conn)
+                stats["index_seconds"] += time.perf_counter() - job_start
+                return result
+            return job
+
+        ddl = []
+        if rebuild_indexes:
+            ddl = writer.submit(timed_index_job(lambda conn: drop_secondary_objects(conn, table_name))).result()
+
+        pending = deque()
+
+        def wait_oldest():
+            future, first_record, rows = pending.popleft()
+            try:
+                inserted, updated, rejected, seconds = future.result()
+            except sqlite3.Error as e:
+                # The whole transaction failed, e.g. the database was locked
+                inserted, updated, rejected, seconds = 0, 0, [(i, str(e)) for i in range(len(rows))], 0.0
+            stats["rows_inserted"] += inserted
+            stats["rows_updated"] += updated
+            # Keyed rows that were neither inserted nor updated already matched the table
+            stats["rows_unchanged" if key else "rows_ignored"] += len(rows) - inserted - updated - len(rejected)
+            stats["insert_seconds"] += seconds
+            for i, reason in rejected:
+                reject(stats, first_record + i, reason, rows[i][0] if key else rows[i])
+
+        try:
+            for batch in batches(parse_chunks(read_chunks(file, chunk_bytes), pool, parse, stats), batch_size):
+                first_record = stats["rows_read"] + 1
+                stats["rows_read"] += len(batch)
+                # Rows with the wrong number of fields are rejected up front
+                valid = []
+                for i, entry in enumerate(batch):
+                    row = entry[0] if key else entry
+                    if len(row) != len(columns):
+                        reject(stats, first_record + i, f"expected {len(columns)} fields, got {len(row)}", row)
+                    else:
+                        valid.append(entry)
+                if key:
+                    # Later rows of a key are ignored, as by INSERT OR IGNORE
+                    first = first_rows(valid, seen)
+                    changed, unchanged, earlier = changed_rows(state_conn, table_name, first, appended=bool(offset))
+                    stats["rows_unchanged"] += unchanged
+                    stats["rows_ignored"] += len(valid) - len(first) + earlier
+                    valid = changed
+                if not valid:
+                    continue
+                job = partial(upsert_changed, keyed=valid) if key else partial(insert, batch=valid)
+                pending.append((writer.submit(job), first_record, valid))
+                if len(pending) >= MAX_PENDING:
+                    wait_oldest()
+            while pending:
+                wait_oldest()
+        finally:
+            # Put the indexes back even if the load failed part way
+            if ddl:
+                writer.submit(timed_index_job(lambda conn: restore_secondary_objects(conn, table_name, ddl))).result()
+
+    # Rejected rows leave the state alone, so the next run reads the file again
+    if incremental and not stats["rows_rejected"]:
+        writer.submit(lambda conn: save_state(
+            conn, csv_file, table_name, size, checksum, stats["rows_inserted"], stats["rows_updated"],
+        )).result()
+
+    finish_stats(stats, start)
+    if not stats["rows_read"]:
+        print(f"No new data found in {csv_file}." if offset else f"No data found in {csv_file}. Skipping insertion.")
+        return stats
+    loaded = f"{table_name}: read {stats['rows_read']} rows, inserted {stats['rows_inserted']}"
+    if key:
+        loaded = (f"{table_name}: read {stats['rows_read']} rows, inserted {stats['rows_inserted']}, "
+                  f"updated {stats['rows_updated']}, {stats['rows_unchanged']} unchanged")
+    print(f"{loaded}, ignored {stats['rows_ignored']}, rejected {stats['rows_rejected']} "
+          f"in {stats['total_seconds']:.2f}s ({stats['rows_per_second']:,.0f} rows/s).")
+    return stats
+
+
+def finish_stats(stats, start):
+    stats["total_seconds"] = time.perf_counter() - start
+    if stats["total_seconds"] > 0:
+        stats["rows_per_second"] = stats["rows_read"] / stats["total_seconds"]
+    stats["parent_peak_memory_mb"] = peak_memory_mb()
+    for name in ("parse_seconds", "insert_seconds", "index_seconds", "total_seconds", "rows_per_second"):
+        stats[name] = round(stats[name], 4)
+    return stats
+
+
+def check_foreign_keys(conn):
+    # Foreign keys are off while loading, so check the result once at the end
+    violations = {}
+    for table, rowid, parent, fkid in conn.execute("PRAGMA foreign_key_check"):
+        violations[(table, parent)] = violations.get((table, parent), 0) + 1
+    for (table, parent), count in sorted(violations.items()):
+        print(f"Foreign key check: {count} rows in {table} reference missing {parent} rows.")
+    if not violations:
+        print("Foreign key check passed.")
+    return [{"table": table, "parent": parent, "rows": count} for (table, parent), count in sorted(violations.items())]
+
+
+def create_schema(db_path):
+    # Connect to SQLite database
+    conn = sqlite3.connect(db_path, factory=InstrumentedConnection)
+
+    # Switch the database to WAL so the app keeps reading during the load
+    configure_storage(conn)
+
+    # Ensure foreign keys are enabled
+    conn.execute("PRAGMA foreign_keys = ON;")
+    conn.executescript(SCHEMA)
+    conn.commit()
+
+    # Secondary indexes for the queries in HospitalApp.py
+    apply_migrations(conn)
+    conn.close()
+
+
+def load_all(db_path=DB_PATH, batch_size=BATCH_SIZE, workers=None, chunk_bytes=CHUNK_BYTES,
+             rebuild_indexes=True, incremental=False, sample_data=False):
+    """Load every CSV feed, and the sample feeds with sample_data, and return the load report."""
+    start = time.perf_counter()
+    report = {
+        "database": db_path,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mode": "incremental" if incremental else "full",
+        "batch_size": batch_size,
+        "workers": workers,
+        "sample_data": sample_data,
+        "tables": [],
+    }
+    # Statements are timed under the table being loaded (see query_stats.py)
+    with page("load"):
+        create_schema(db_path)
+
+    # All inserts go through one serialized writer. Foreign keys are off for
+    # the load, since a feed may arrive before the rows it references, and
+    # checked once at the end instead.
+    writer = WriterQueue(path=db_path, foreign_keys=False)
+    # Worker processes only start once a file spans more than one chunk
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    # Incremental loads compare row hashes on their own read connection
+    state_conn = sqlite3.connect(db_path, factory=InstrumentedConnection) if incremental else None
+    try:
+        for csv_file, table_name in CSV_FEEDS + (SAMPLE_FEEDS if sample_data else ()):
+            # An incremental load writes few rows, too few to repay an index rebuild
+            with page(f"load {table_name}"):
+                report["tables"].append(insert_data_from_csv(
+                    csv_file, table_name, writer, pool, batch_size, chunk_bytes,
+                    rebuild_indexes and not incremental, state_conn,
+                ))
+
+        with page("load"):
+            # Re-map logins to doctor/nurse/staff records the load may have changed
+            writer.submit(refresh_identity_map).result()
+            # The dashboard summaries (and appointments' START_TS) missed rows
+            # loaded with their triggers dropped, and depend on the doctor, staff
+            # and patient records
+            changed = {stats["table"] for stats in report["tables"] if stats["rows_inserted"] or stats["rows_updated"]}
+            if not incremental or changed & AGGREGATE_SOURCES:
+                writer.submit(rebuild_aggregates).result()
+            report["foreign_key_violations"] = writer.submit(check_foreign_keys).result()
+    finally:
+        if state_conn is not None:
+            state_conn.close()
+        if pool is not None:
+            pool.shutdown()
+        # Wait for pending writes and close the writer's connection
+        writer.close()
+    report["total_seconds"] = round(time.perf_counter() - start, 4)
+    report["parent_peak_memory_mb"] = peak_memory_mb()
+    # The pool has been shut down, so its workers have exited and are counted
+    report["workers_peak_memory_mb"] = peak_memory_mb(workers=True) if pool is not None else None
+    report["queries"] = [
+        {key: value for key, value in series.items() if key not in ("buckets", "seconds")}
+        for series in get_stats().snapshot()
+        if series["page"].startswith("load") or series["page"] == "writer"
+    ][:REPORTED_QUERIES]
+    return report
+
+
+def write_report(report, path):
+    text = json.dumps(report, indent=2)
+    if path == "-":
+        print(text)
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text + "\n")
 
-# Insert data from CSV files
-insert_data_from_csv('Department.csv', 'DEPARTMENT', conn)
-insert_data_from_csv('Staff_table_filled.csv', 'STAFF', conn)
-insert_data_from_csv('Cashiers.csv', 'CASHIER', conn)
-insert_data_from_csv('Doctor.csv', 'DOCTOR', conn)
-insert_data_from_csv('Nurse.csv', 'NURSE', conn)
-insert_data_from_csv('Admin.csv', 'ADMIN', conn)
-insert_data_from_csv('Patient.csv', 'PATIENT', conn)
-insert_data_from_csv('Appointment.csv', 'APPOINTMENT', conn)
-insert_data_from_csv('med_history.csv', 'MEDICAL_HISTORY', conn)
-insert_data_from_csv('Billing.csv', 'BILLING', conn)
-insert_data_from_csv('User_data.csv', 'USER_DATA', conn)
 
+def main():
+    parser = argparse.ArgumentParser(description="Load the hospital CSV feeds into the database.")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per insert batch")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (1 parses inline)")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / (1024 * 1024), help="CSV text per parse chunk")
+    parser.add_argument("--keep-indexes", action="store_true", help="load with the indexes in place instead of rebuilding them")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip unchanged files, read only appended rows and upsert only changed rows")
+    parser.add_argument("--sample-data", action="store_true",
+                        help="also load the made-up feeds in sample_data/, e.g. nurse-patient assignments")
+    parser.add_argument("--report", default="load_report.json",
+                        help="where to write the JSON load report, - for stdout (default: %(default)s)")
+    args = parser.parse_args()
+    report = load_all(args.db, args.batch_size, args.workers, int(args.chunk_mb * 1024 * 1024),
+                      not args.keep_indexes, args.incremental, args.sample_data)
+    write_report(report, args.report)
 
-# Close the database connection
-conn.close()
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# Archival of old appointments, their procedures and invoices. Rows older
+# than HORIZON_DAYS move out of hospital.db into one archive database per
+# year (ARCHIVE_DIR/hospital-2021.db), so the hot database, and the indexes
+# every daily query reads, only grow with recent activity and stay in the
+# page cache. The dashboard summaries keep counting the archived days.
+#
+# Reads inside db.archive_reads(start, end) see archived rows as well: the
+# archive files of the years the range covers are ATTACHed to the
+# connection, and a TEMP view named after each archived table, the UNION
+# ALL of the hot table and its archived rows, stands in for it until the
+# connection is handed back. Queries run unchanged; SQLite pushes their
+# WHERE clauses into each part of the view, where the archive's own
+# indexes serve them. Views in the main schema, such as
+# Nurse_Appointments, still read the hot tables only.
+#
+#   python archive.py                      # rows older than HOSPITAL_ARCHIVE_DAYS
+#   python archive.py --before 2023-01-01
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from cache import bump_tables
+from db import DB_PATH, get_pool, set_archive_source
+from migrations import INDEXES
+from query_stats import add_gauges
+
+HORIZON_DAYS = int(os.environ.get("HOSPITAL_ARCHIVE_DAYS", "730"))
+ARCHIVE_DIR = os.environ.get("HOSPITAL_ARCHIVE_DIR", os.path.join(os.path.dirname(DB_PATH), "archive"))
+
+# (table, WHERE clause picking its rows of the archived part of a year,
+# [:start, :end)). Procedures go with their appointments, so they are moved
+# first, while those appointments are still in the hot table.
+ARCHIVED_TABLES = (
+    ("Medical_History",
+     "appt_id IN (SELECT APPT_ID FROM main.APPOINTMENT WHERE START_TS >= :start AND START_TS < :end)"),
+    ("APPOINTMENT", "START_TS >= :start AND START_TS < :end"),
+    ("Billing", "BILLED_ON >= :start AND BILLED_ON < :end"),
+)
+
+# Summary triggers that would count archived rows out of the dashboard
+KEPT_COUNTS = ("agg_appointment_ad", "agg_billing_ad")
+
+# Databases SQLite attaches to one connection at most (SQLITE_MAX_ATTACHED),
+# and so archive years one read can cover
+MAX_ATTACHED = sqlite3.connect(":memory:").getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+# How long a listing of ARCHIVE_DIR is trusted; archive.py run from
+# another process shows up within this
+YEARS_MAX_AGE = 60.0
+
+
+class ArchiveTooWide(sqlite3.OperationalError):
+    pass
+
+
+def _year(value):
+    # Bounds may be dates, datetimes or ISO strings, as in queries.time_bound
+    return value.year if hasattr(value, "year") else int(str(value)[:4])
+
+
+def _columns(conn, schema, table):
+    # (name, declared type, pk position) of each column; empty if there is no such table
+    return [(row[1], row[2], row[5]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+class ArchiveManager:
+    """The per-year archive files, and the moves of old rows into them."""
+
+    def __init__(self, directory=ARCHIVE_DIR, path=DB_PATH, horizon_days=HORIZON_DAYS):
+        self.directory = directory
+        self.path = path
+        self.horizon_days = horizon_days
+        self._base = os.path.splitext(os.path.basename(path))[0]
+        self._lock = threading.Lock()
+        # Serializes archive() runs within this process
+        self._run_lock = threading.Lock()
+        self._years = None
+        self._listed_at = 0.0
+        self._counters = {"reads": 0, "attached": 0, "runs": 0, "rows_archived": 0}
+
+    def year_path(self, year):
+        return os.path.join(self.directory, f"{self._base}-{year}.db")
+
+    def years(self):
+        """Years with an archive file, in order."""
+        with self._lock:
+            if self._years is not None and time.monotonic() - self._listed_at <= YEARS_MAX_AGE:
+                return self._years
+        pattern = re.compile(re.escape(self._base) + r"-(\d{4})\.db$")
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        years = sorted(int(match.group(1)) for match in map(pattern.match, names) if match)
+        with self._lock:
+            self._years = years
+            self._listed_at = time.monotonic()
+        return years
+
+    def years_between(self, start=None, end=None):
+        first = _year(start) if start is not None else None
+        last = _year(end) if end is not None else None
+        return [
+            year for year in self.years()
+            if (first is None or year >= first) and (last is None or year <= last)
+        ]
+
+    def check_range(self, start=None, end=None):
+        """Raise ArchiveTooWide if reads from start to end need more archive years than can be attached."""
+        years = self.years_between(start, end)
+        if len(years) > MAX_ATTACHED:
+            raise ArchiveTooWide(
+                f"The range covers {len(years)} archived years; at most {MAX_ATTACHED} can be read at once"
+            )
+
+    @contextmanager
+    def including(self, connection, start=None, end=None):
+        """connection (a context manager), with the archived rows from start to end in view."""
+        with connection as conn:
+            years = self.years_between(start, end)
+            # A connection already set up by an enclosing read keeps its views
+            if not years or getattr(conn, "archive_years", None) is not None:
+                yield conn
+                return
+            self._attach(conn, years)
+            try:
+                yield conn
+            finally:
+                self._detach(conn)
+
+    def _attach(self, conn, years):
+        attached = sum(1 for row in conn.execute("PRAGMA database_list") if row[1] not in ("main", "temp"))
+        free = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) - attached
+        if len(years) > free:
+            raise ArchiveTooWide(
+                f"The range covers {len(years)} archived years; at most {free} can be read at once"
+            )
+        conn.archive_years = []
+        try:
+            for year in years:
+                conn.execute(f"ATTACH DATABASE ? AS archive_{year}", (os.path.abspath(self.year_path(year)),))
+                conn.archive_years.append(year)
+            for table, where in ARCHIVED_TABLES:
+                columns = [name for name, declared, pk in _columns(conn, "main", table)]
+                if not columns:
+                    continue
+                parts = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+                for year in years:
+                    archived = {name.lower() for name, declared, pk in _columns(conn, f"archive_{year}", table)}
+                    if not archived:
+                        continue
+                    # Columns added to the hot table since the year was archived read as NULL
+                    selected = [name if name.lower() in archived else f"NULL AS {name}" for name in columns]
+                    parts.append(f"SELECT {', '.join(selected)} FROM archive_{year}.{table}")
+                conn.execute(f"CREATE TEMP VIEW {table} AS " + " UNION ALL ".join(parts))
+        except sqlite3.Error:
+            self._detach(conn)
+            raise
+        with self._lock:
+            self._counters["reads"] += 1
+            self._counters["attached"] += len(years)
+
+    def _detach(self, conn):
+        for table, where in ARCHIVED_TABLES:
+            conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+        for year in conn.archive_years:
+            conn.execute(f"DETACH DATABASE archive_{year}")
+        conn.archive_years = None
+
+    def _prepare(self, conn, alias):
+        # The archive's tables have the hot tables' columns and keys, without
+        # their foreign keys, and the hot tables' indexes
+        for table, where in ARCHIVED_TABLES:
+            columns = _columns(conn, "main", table)
+            archived = {name.lower() for name, declared, pk in _columns(conn, alias, table)}
+            if not archived:
+                keys = [name for name, declared, pk in sorted(columns, key=lambda column: column[2]) if pk]
+                defs = [f"{name} {declared}".strip() for name, declared, pk in columns]
+                conn.execute(f"CREATE TABLE {alias}.{table} ({', '.join(defs)}, PRIMARY KEY ({', '.join(keys)}))")
+            else:
+                for name, declared, pk in columns:
+                    if name.lower() not in archived:
+                        conn.execute(f"ALTER TABLE {alias}.{table} ADD COLUMN {name} {declared}")
+            for indexed, name, indexed_columns in INDEXES:
+                if indexed.lower() == table.lower():
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.{name} ON {table} ({indexed_columns})")
+
+    def _keys(self, conn, table):
+        columns = sorted((pk, name) for name, declared, pk in _columns(conn, "main", table) if pk)
+        return ", ".join(name for pk, name in columns)
+
+    def _first_year(self, conn, before):
+        starts = [
+            conn.execute("SELECT MIN(START_TS) FROM APPOINTMENT WHERE START_TS < ?", (before,)).fetchone()[0],
+            conn.execute("SELECT MIN(BILLED_ON) FROM Billing WHERE BILLED_ON < ?", (before,)).fetchone()[0],
+        ]
+        starts = [start for start in starts if start]
+        return _year(min(starts)) if starts else None
+
+    def archive(self, before=None):
+        """Move the rows dated before `before` (default: the horizon) to the archive files.
+
+        Returns {year: {table: rows moved}}. Each year is copied, and
+        committed to its archive file, before it is deleted from the hot
+        database; a run that stops in between leaves the rows in both, and
+        the next run finishes the move.
+        """
+        if before is None:
+            before = date.today() - timedelta(days=self.horizon_days)
+        before = before.isoformat() if hasattr(before, "isoformat") else before
+        moved = {}
+        with self._run_lock:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            try:
+                conn.execute("PRAGMA busy_timeout = 5000")
+                first = self._first_year(conn, before)
+                if first is not None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    for year in range(first, _year(before) + 1):
+                        bounds = {"start": f"{year:04d}-01-01", "end": min(f"{year + 1:04d}-01-01", before)}
+                        counts = self._archive_year(conn, year, bounds)
+                        if counts:
+                            moved[year] = counts
+            finally:
+                conn.close()
+            with self._lock:
+                self._years = None
+                self._counters["runs"] += 1
+                self._counters["rows_archived"] += sum(sum(counts.values()) for counts in moved.values())
+        if moved:
+            # Cached results that read these tables no longer match them
+            bump_tables([table for table, where in ARCHIVED_TABLES] + ["ARCHIVE_STATE"])
+        return moved
+
+    def _archive_year(self, conn, year, bounds):
+        pending = [
+            table for table, where in ARCHIVED_TABLES
+            if conn.execute(f"SELECT 1 FROM main.{table} WHERE {where} LIMIT 1", bounds).fetchone()
+        ]
+        if not pending:
+            return {}
+        alias = f"archive_{year}"
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (self.year_path(year),))
+        try:
+            # Copy, replacing rows archived before and loaded again since
+            conn.execute("BEGIN")
+            self._prepare(conn, alias)
+            for table, where in ARCHIVED_TABLES:
+                columns = ", ".join(name for name, declared, pk in _columns(conn, "main", table))
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {alias}.{table} ({columns}) "
+                    f"SELECT {columns} FROM main.{table} WHERE {where}",
+                    bounds,
+                )
+            conn.execute("COMMIT")
+            conn.execute(f"ANALYZE {alias}")
+
+            # Delete what was copied, with the summary triggers that would
+            # count it out of the dashboard off for the transaction
+            conn.execute("BEGIN IMMEDIATE")
+            triggers = conn.execute(
+                f"SELECT name, sql FROM main.sqlite_master WHERE type = 'trigger' "
+                f"AND name IN ({', '.join('?' for _ in KEPT_COUNTS)})",
+                KEPT_COUNTS,
+            ).fetchall()
+            for name, sql in triggers:
+                conn.execute(f"DROP TRIGGER main.{name}")
+            counts = {}
+            for table, where in ARCHIVED_TABLES:
+                keys = self._keys(conn, table)
+                counts[table] = conn.execute(
+                    f"DELETE FROM main.{table} WHERE {where} AND ({keys}) IN (SELECT {keys} FROM {alias}.{table})",
+                    bounds,
+                ).rowcount
+                conn.execute(
+                    "INSERT INTO ARCHIVE_STATE (table_name, archived_before, rows, archived_at) "
+                    "VALUES (?, ?, ?, datetime('now')) "
+                    "ON CONFLICT (table_name) DO UPDATE SET archived_before = MAX(archived_before, "
+                    "excluded.archived_before), rows = rows + excluded.rows, archived_at = excluded.archived_at",
+                    (table, bounds["end"], counts[table]),
+                )
+            for name, sql in triggers:
+                conn.execute(sql)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.execute(f"DETACH DATABASE {alias}")
+        return {table: count for table, count in counts.items() if count}
+
+    def stats(self):
+        years = self.years()
+        with self._lock:
+            stats = dict(self._counters)
+        stats["years"] = len(years)
+        return stats
+
+
+_archive = ArchiveManager()
+add_gauges("archive", _archive.stats)
+set_archive_source(_archive)
+
+
+def get_archive():
+    return _archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old appointments, procedures and invoices to per-year archives.")
+    parser.add_argument("--before", default=None,
+                        help=f"archive rows dated before this day (default: {HORIZON_DAYS} days ago)")
+    args = parser.parse_args()
+
+    # Bring the database up to date (ARCHIVE_STATE, indexes) before moving rows
+    with get_pool().connection():
+        pass
+    moved = _archive.archive(date.fromisoformat(args.before) if args.before else None)
+    if not moved:
+        print("Nothing to archive.")
+    for year, counts in moved.items():
+        summary = ", ".join(f"{count:,} {table}" for table, count in counts.items())
+        print(f"{year}: {summary} -> {_archive.year_path(year)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Timings of the Cashier billing reports (billing_reports.py) over a
+# synthetic Billing table, 10M invoices by default. The database is built
+# once and reused while it holds the requested number of invoices.
+#
+#   python benchmarks/bench_billing.py [--invoices 10000000] [--db bench_billing.db]
+
+import argparse
+import csv
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Rows per executemany() while generating invoices
+INSERT_ROWS = 100_000
+
+
+def billing_items():
+    with open(os.path.join(ROOT, "Billing.csv"), newline="") as f:
+        return sorted({row["items"] for row in csv.DictReader(f)})
+
+
+def invoice_count(db_path):
+    if not os.path.exists(db_path):
+        return 0
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM Billing").fetchone()[0]
+    except sqlite3.Error:
+        return 0
+    finally:
+        conn.close()
+
+
+def generate(db_path, invoices, patients, days, seed=0):
+    from Hospital import create_schema, drop_secondary_objects, restore_secondary_objects
+    from migrations import rebuild_aggregates
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    create_schema(db_path)
+    rng = np.random.default_rng(seed)
+    items = billing_items()
+    first_day = date.today() - timedelta(days=days - 1)
+    day_names = [(first_day + timedelta(days=i)).isoformat() for i in range(days)]
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous = OFF")
+    types = rng.choice(["Inpatient", "Outpatient"], size=patients)
+    conn.executemany(
+        "INSERT INTO PATIENT (PAT_ID, FNAME, LNAME, EMAIL, PATIENT_TYPE) VALUES (?, ?, ?, ?, ?)",
+        ((i + 1, f"First{i}", f"Last{i}", f"patient{i}@example.com", str(types[i])) for i in range(patients)),
+    )
+    # Load with the indexes and triggers dropped, as Hospital.py does
+    ddl = drop_secondary_objects(conn, "Billing")
+    for offset in range(0, invoices, INSERT_ROWS):
+        n = min(INSERT_ROWS, invoices - offset)
+        pat_ids = rng.integers(1, patients + 1, size=n).tolist()
+        item_ids = rng.integers(0, len(items), size=n).tolist()
+        amounts = rng.integers(100, 1_000_000, size=n).tolist()
+        day_ids = rng.integers(0, days, size=n).tolist()
+        conn.executemany(
+            "INSERT INTO Billing (invoice_id, pat_id, items, amount, BILLED_ON) VALUES (?, ?, ?, ?, ?)",
+            ((f"inv-{offset + i:010d}", pat_ids[i], items[item_ids[i]], amounts[i], day_names[day_ids[i]])
+             for i in range(n)),
+        )
+        print(f"\r{offset + n:,} invoices", end="", flush=True)
+    print()
+    restore_secondary_objects(conn, "Billing", ddl)
+    rebuild_aggregates(conn)
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat):
+    from cache import get_cache
+
+    cold = []
+    for _ in range(repeat):
+        get_cache().clear()
+        start = time.perf_counter()
+        fn()
+        cold.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    fn()
+    warm = time.perf_counter() - start
+    return statistics.median(cold), warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the billing reports over a synthetic Billing table.")
+    parser.add_argument("--invoices", type=int, default=10_000_000)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=730, help="days the invoices are spread over")
+    parser.add_argument("--db", default="bench_billing.db", help="scratch database (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="uncached runs per report")
+    args = parser.parse_args()
+    # db.py reads the database path when it is first imported
+    os.environ["HOSPITAL_DB"] = args.db
+
+    if invoice_count(args.db) != args.invoices:
+        start = time.perf_counter()
+        generate(args.db, args.invoices, args.patients, args.days)
+        print(f"Generated {args.invoices:,} invoices in {time.perf_counter() - start:.1f}s")
+
+    import billing_reports
+
+    first, last = billing_reports.billed_days()
+    month_start = last.replace(day=1)
+    reports = (
+        ("revenue by month", lambda: billing_reports.revenue_by_period(first, last, "Month")),
+        ("revenue by day", lambda: billing_reports.revenue_by_period(first, last, "Day")),
+        ("revenue by item", lambda: billing_reports.revenue_by_item(first, last)),
+        ("revenue by item, 1 month", lambda: billing_reports.revenue_by_item(month_start, last)),
+        ("revenue by patient type", lambda: billing_reports.revenue_by_patient_type(first, last)),
+        ("top patients", lambda: billing_reports.top_patients(first, last)),
+        ("amount percentiles", lambda: billing_reports.amount_distribution(first, last)),
+        ("amount percentiles, 1 month", lambda: billing_reports.amount_distribution(month_start, last)),
+    )
+    print(f"{'report':<28} {'uncached s':>11} {'cached ms':>10}")
+    for name, fn in reports:
+        cold, warm = timed(fn, args.repeat)
+        print(f"{name:<28} {cold:>11.3f} {warm * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
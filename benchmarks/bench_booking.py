@@ -0,0 +1,178 @@
+# Booking throughput and free-slot search latency (see scheduling.py) over
+# synthetic data. Threads book random slots with a few busy doctors, as the
+# dashboard's Schedule Appointment card does, so that many requests collide
+# and are rejected, by the interval trees or by the check in the writer's
+# transaction. The bookings are then checked for overlaps in SQL.
+#
+#   python benchmarks/bench_booking.py --rows 100000 --threads 16 --requests 20000
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bench_suite import RESULTS_DIR, git_commit, latency_stats, time_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Overlaps between the benchmark's bookings and any appointment of the same doctor
+OVERLAPS = """
+SELECT COUNT(*) FROM APPOINTMENT B
+JOIN APPOINTMENT A ON A.DOC_ID = B.DOC_ID AND A.APPT_ID != B.APPT_ID
+    AND A.START_TS < B.END_TS AND A.END_TS > B.START_TS
+WHERE B.APPT_ID > ?
+"""
+
+
+def time_slot_search(specializations, iterations, rng):
+    import scheduling
+
+    latencies = []
+    slots = 0
+    for _ in range(iterations):
+        after = datetime.now() + timedelta(days=rng.randrange(14), hours=rng.randrange(10))
+        start = time.perf_counter()
+        doctors = scheduling.doctors_for(specialization=rng.choice(specializations))
+        found = scheduling.free_slots(doctors, after, rng.choice((15, 30, 60)))
+        latencies.append(time.perf_counter() - start)
+        slots += len(found)
+    return latency_stats(latencies, slots)
+
+
+def time_bookings(doctors, patients, requests, threads, days, seed):
+    """Book `requests` random slots from `threads` threads; return the figures."""
+    import scheduling
+
+    counts = {"booked": 0, "taken": 0}
+    lock = threading.Lock()
+    latencies = []
+    first_day = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    slots_per_day = (scheduling.CLOSE_HOUR - scheduling.OPEN_HOUR) * 60 // scheduling.SLOT_MINUTES
+
+    def worker(n, per_thread):
+        rng = random.Random(seed * 1000 + n)
+        booked = taken = 0
+        times = []
+        for _ in range(per_thread):
+            start = first_day + timedelta(days=rng.randrange(days), hours=scheduling.OPEN_HOUR,
+                                          minutes=rng.randrange(slots_per_day) * scheduling.SLOT_MINUTES)
+            began = time.perf_counter()
+            try:
+                scheduling.book(rng.choice(doctors), rng.choice(patients), start, rng.choice((15, 30, 60)))
+                booked += 1
+            except scheduling.SlotTaken:
+                taken += 1
+            times.append(time.perf_counter() - began)
+        with lock:
+            counts["booked"] += booked
+            counts["taken"] += taken
+            latencies.extend(times)
+
+    per_thread = requests // threads
+    workers = [threading.Thread(target=worker, args=(n, per_thread)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - start
+    done = per_thread * threads
+    return {
+        **counts,
+        "requests": done,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(done / seconds, 1),
+        "bookings_per_second": round(counts["booked"] / seconds, 1),
+        "latency": latency_stats(latencies, done),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time appointment booking and free-slot search over synthetic data.")
+    parser.add_argument("--rows", type=int, default=10000, help="appointments in the dataset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="bench_data", help="where datasets are kept (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent booking threads")
+    parser.add_argument("--requests", type=int, default=10000, help="booking requests in total")
+    parser.add_argument("--doctors", type=int, default=20, help="doctors the requests are spread over")
+    parser.add_argument("--days", type=int, default=14, help="days ahead the requests are spread over")
+    parser.add_argument("--searches", type=int, default=200, help="free-slot searches")
+    parser.add_argument("--label", default=None, help="name of the results file (default: booking-ROWS-COMMIT)")
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(os.path.join(args.data_dir, str(args.rows)))
+    # Bookings are written to a database of their own, so bench_suite.py's stays as loaded
+    db_path = os.path.join(data_dir, "booking.db")
+    os.environ["HOSPITAL_DB"] = db_path
+    import synthetic
+
+    if not synthetic.dataset_ready(data_dir, args.rows, args.seed):
+        synthetic.generate(data_dir, args.rows, args.seed)
+    load = time_load(data_dir, db_path, None)
+    print(f"Loaded {load['rows']:,} rows in {load['seconds']:.1f}s")
+
+    import scheduling
+    from db import get_db_connection, get_writer
+
+    rng = random.Random(args.seed)
+    with get_db_connection() as conn:
+        doc_ids = [row[0] for row in conn.execute("SELECT DOC_ID FROM DOCTOR ORDER BY DOC_ID")]
+        patients = [row[0] for row in conn.execute("SELECT PAT_ID FROM PATIENT LIMIT 1000")]
+        specializations = [row[0] for row in conn.execute("SELECT DISTINCT SPECIALIZATION FROM DOCTOR")]
+        last_appt_id = conn.execute("SELECT MAX(APPT_ID) FROM APPOINTMENT").fetchone()[0]
+    doctors = rng.sample(doc_ids, min(args.doctors, len(doc_ids)))
+
+    schedule = scheduling.get_schedule()
+    start = time.perf_counter()
+    for doc_id in doc_ids:
+        schedule.tree(doc_id)
+    build_seconds = time.perf_counter() - start
+    print(f"Built {len(doc_ids):,} doctors' interval trees in {build_seconds * 1000:.1f} ms "
+          f"({schedule.stats()['appointments']:,} appointments)")
+
+    results = {
+        "label": args.label or f"booking-{args.rows}-{git_commit() or 'local'}",
+        "rows": args.rows,
+        "threads": args.threads,
+        "doctors": len(doctors),
+        "days": args.days,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "tree_build_ms": round(build_seconds * 1000, 3),
+    }
+    results["slot_search"] = time_slot_search(specializations, args.searches, rng)
+    search = results["slot_search"]
+    print(f"Free-slot search: p50 {search['p50_ms']:.3f} ms, p95 {search['p95_ms']:.3f} ms, "
+          f"p99 {search['p99_ms']:.3f} ms ({search['queries_per_second']:,.0f}/s)")
+
+    results["booking"] = booking = time_bookings(doctors, patients, args.requests, args.threads, args.days, args.seed)
+    stats = schedule.stats()
+    booking["rejected_by_tree"] = stats["rejected"]
+    booking["rejected_by_sql"] = stats["conflicts"]
+    booking["writer"] = get_writer().stats()
+    with get_db_connection() as conn:
+        booking["overlaps"] = conn.execute(OVERLAPS, (last_appt_id,)).fetchone()[0]
+    print(f"Booking: {booking['requests']:,} requests in {booking['seconds']:.2f}s "
+          f"({booking['requests_per_second']:,.0f} requests/s, {booking['bookings_per_second']:,.0f} bookings/s)")
+    print(f"  booked {booking['booked']:,}, rejected {booking['taken']:,} "
+          f"({stats['rejected']:,} by the interval trees, {stats['conflicts']:,} in SQL)")
+    print(f"  latency p50 {booking['latency']['p50_ms']:.3f} ms, p99 {booking['latency']['p99_ms']:.3f} ms; "
+          f"largest commit batch {booking['writer']['largest_batch']}")
+    print(f"  overlapping bookings: {booking['overlaps']}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, results["label"] + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"\nResults written to {path}")
+    if booking["overlaps"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Logins/sec for candidate scrypt parameter sets, to pick the cost in
+# passwords.PARAMETERS against the peak login rate.
+#
+#   python benchmarks/bench_passwords.py [--seconds 3] [--workers 1 4]
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import passwords  # noqa: E402
+from passwords import PasswordPool  # noqa: E402
+
+CANDIDATES = (
+    {"n": 2 ** 13, "r": 8, "p": 1, "dklen": 32},
+    {"n": 2 ** 14, "r": 8, "p": 1, "dklen": 32},
+    {"n": 2 ** 15, "r": 8, "p": 1, "dklen": 32},
+    {"n": 2 ** 16, "r": 8, "p": 1, "dklen": 32},
+)
+
+
+def logins_per_second(params, workers, seconds):
+    # Register the parameter set under a scratch version so the real
+    # hash/verify code paths are measured
+    version = max(passwords.PARAMETERS) + 1
+    passwords.PARAMETERS[version] = params
+    try:
+        stored = passwords.hash_password("correct horse", version)
+        pool = PasswordPool(max_workers=workers, max_queued=workers)
+        done = 0
+        latencies = []
+        start = time.perf_counter()
+        try:
+            while time.perf_counter() - start < seconds:
+                submitted = time.perf_counter()
+                futures = [pool.submit(passwords.verify_password, "correct horse", stored) for _ in range(workers)]
+                wait(futures)
+                latencies.append((time.perf_counter() - submitted) * 1000)
+                done += len(futures)
+        finally:
+            pool.close()
+        elapsed = time.perf_counter() - start
+    finally:
+        del passwords.PARAMETERS[version]
+    latencies.sort()
+    return done / elapsed, latencies[len(latencies) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure password logins/sec per scrypt parameter set.")
+    parser.add_argument("--seconds", type=float, default=3.0, help="time per measurement")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    current = passwords.PARAMETERS[passwords.CURRENT_VERSION]
+    print(f"{'n':>7} {'r':>3} {'p':>3} {'memory':>8} {'workers':>8} {'logins/s':>10} {'p50 ms':>8}")
+    for params in CANDIDATES:
+        for workers in sorted(set(args.workers)):
+            rate, p50 = logins_per_second(params, workers, args.seconds)
+            memory = 128 * params["n"] * params["r"] // (1024 * 1024)
+            marker = "  <- current" if params == current else ""
+            print(f"{params['n']:>7} {params['r']:>3} {params['p']:>3} {memory:>6}MB {workers:>8} "
+                  f"{rate:>10.1f} {p50:>8.1f}{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# Cold-start and rerun times of HospitalApp.py, run headless through
+# Streamlit's AppTest over synthetic data. Each scenario signs in as a user
+# type and opens one page, in a fresh Python process so nothing is imported
+# yet: the first run is the cold start, the first visit to the page adds its
+# modules, and the reruns after that are what every interaction costs.
+#
+#   python benchmarks/bench_startup.py --rows 10000
+#
+# --app times another checkout, e.g. the commit before a change, to compare:
+#
+#   git worktree add /tmp/before HEAD~1
+#   python benchmarks/bench_startup.py --app /tmp/before/HospitalApp.py --label startup-before
+#   python benchmarks/bench_startup.py --compare benchmarks/results/startup-before.json
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bench_suite import REGRESSION_RATIO, RESULTS_DIR, git_commit, latency_stats, time_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (user type, page); None is the signed-out login page
+SCENARIOS = (
+    (None, "User Authentication"),
+    ("Patient", "Dashboard"),
+    ("Doctor", "Appointments"),
+    ("Nurse", "Appointments"),
+    ("Cashier", "Reports"),
+    ("Admin", "System"),
+)
+
+
+def scenario_name(user_type, page):
+    return f"{user_type}/{page}" if user_type else page
+
+
+def run_scenario(app, user_type, page, identity, reruns):
+    """Time one scenario in this process; only meaningful in a fresh one."""
+    app_dir = os.path.dirname(os.path.abspath(app))
+    sys.path.insert(0, app_dir)
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    streamlit_seconds = time.perf_counter() - start
+    loaded = set(sys.modules)
+
+    at = AppTest.from_file(app, default_timeout=120)
+    if user_type:
+        at.session_state["logged_in"] = True
+        at.session_state["username"] = "bench"
+        at.session_state["user_type"] = user_type
+        at.session_state["identity"] = identity
+    start = time.perf_counter()
+    at.run()
+    first_seconds = time.perf_counter() - start
+    app_modules = sorted(
+        name for name in set(sys.modules) - loaded
+        if (getattr(sys.modules[name], "__file__", None) or "").startswith(app_dir)
+    )
+
+    # The first page shown is the first in the navigation
+    start = time.perf_counter()
+    if at.sidebar.radio[0].value != page:
+        at.sidebar.radio[0].set_value(page).run()
+    page_seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        latencies.append(time.perf_counter() - start)
+    return {
+        "streamlit_import_ms": round(streamlit_seconds * 1000, 3),
+        "first_run_ms": round(first_seconds * 1000, 3),
+        "first_page_ms": round(page_seconds * 1000, 3),
+        "app_modules": app_modules,
+        "reruns": latencies,
+        "exceptions": [e.value for e in at.exception],
+    }
+
+
+def run_child(args, user_type, page, identity):
+    command = [sys.executable, os.path.abspath(__file__), "--child", json.dumps([user_type, page, identity]),
+               "--app", args.app, "--reruns", str(args.reruns)]
+    output = subprocess.run(command, capture_output=True, text=True, cwd=args.work_dir)
+    if output.returncode:
+        sys.exit(f"{scenario_name(user_type, page)} failed:\n{output.stderr}")
+    # The last line is the result; Streamlit may print warnings before it
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def time_scenarios(args, identity):
+    results = {}
+    for user_type, page in SCENARIOS:
+        runs = [run_child(args, user_type, page, identity) for _ in range(args.processes)]
+        errors = [e for run in runs for e in run["exceptions"]]
+        if errors:
+            sys.exit(f"{scenario_name(user_type, page)} raised: {errors[0]}")
+        results[scenario_name(user_type, page)] = {
+            "streamlit_import_ms": median(run["streamlit_import_ms"] for run in runs),
+            "first_run_ms": median(run["first_run_ms"] for run in runs),
+            "first_page_ms": median(run["first_page_ms"] for run in runs),
+            "app_modules": len(runs[0]["app_modules"]),
+            "rerun": latency_stats([seconds for run in runs for seconds in run["reruns"]], 0),
+        }
+    return results
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    """Print each scenario's cold start and rerun p50 against the baseline; return the regressions."""
+    regressions = []
+    print(f"\n{'compared to ' + baseline.get('label', '?'):<48} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for name, stats in results["scenarios"].items():
+        before_stats = baseline["scenarios"].get(name)
+        if before_stats is None:
+            continue
+        for figure, before, now in (
+            ("first run ms", before_stats["first_run_ms"], stats["first_run_ms"]),
+            ("first page ms", before_stats["first_page_ms"], stats["first_page_ms"]),
+            ("rerun p50 ms", before_stats["rerun"]["p50_ms"], stats["rerun"]["p50_ms"]),
+        ):
+            change = now / before if before else 1.0
+            # A few milliseconds either way is noise from the test harness
+            flag = change > ratio and now - before > 5
+            print(f"{name + ' ' + figure:<48} {before:>10.1f} {now:>10.1f} {change:>7.2f}"
+                  f"{'  REGRESSION' if flag else ''}")
+            if flag:
+                regressions.append(f"{name} {figure}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time HospitalApp.py's cold start and reruns per page.")
+    parser.add_argument("--rows", type=int, default=10000, help="appointments in the dataset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="bench_data", help="where datasets are kept (default: %(default)s)")
+    parser.add_argument("--app", default=os.path.join(ROOT, "HospitalApp.py"), help="the app script to time")
+    parser.add_argument("--processes", type=int, default=3, help="fresh processes per scenario")
+    parser.add_argument("--reruns", type=int, default=20, help="reruns timed per process")
+    parser.add_argument("--label", default=None, help="name of the results file (default: startup-ROWS-COMMIT)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.app = os.path.abspath(args.app)
+
+    if args.child:
+        user_type, page, identity = json.loads(args.child)
+        result = run_scenario(args.app, user_type, page, identity, args.reruns)
+        print(json.dumps(result))
+        return
+
+    data_dir = os.path.abspath(os.path.join(args.data_dir, str(args.rows)))
+    # The app gets a database of its own, so bench_suite.py's stays as loaded
+    db_path = os.path.join(data_dir, "startup.db")
+    os.environ["HOSPITAL_DB"] = db_path
+    # Snapshot copies in the background would be timed along with the pages
+    os.environ["HOSPITAL_REPLICA"] = "0"
+    sys.path.insert(0, ROOT)
+    import synthetic
+
+    if not synthetic.dataset_ready(data_dir, args.rows, args.seed):
+        synthetic.generate(data_dir, args.rows, args.seed)
+    load = time_load(data_dir, db_path, None)
+    print(f"Loaded {load['rows']:,} rows in {load['seconds']:.1f}s")
+
+    from db import get_db_connection
+
+    # The doctor with the most appointments and a nurse with assigned patients
+    with get_db_connection() as conn:
+        doc_id = conn.execute(
+            "SELECT DOC_ID FROM APPOINTMENT GROUP BY DOC_ID ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()[0]
+        nurse_id = conn.execute("SELECT nurse_id FROM Nurse_Appointments LIMIT 1").fetchone()[0]
+    identity = {"doc_id": doc_id, "nurse_id": nurse_id, "staff_id": None}
+
+    # Metrics and slow-query files are written next to the database
+    args.work_dir = data_dir
+    results = {
+        "label": args.label or f"startup-{args.rows}-{git_commit() or 'local'}",
+        "rows": args.rows,
+        "app": args.app,
+        "processes": args.processes,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    results["scenarios"] = time_scenarios(args, identity)
+    print(f"\n{'scenario':<28} {'modules':>7} {'first run ms':>13} {'first page ms':>14} "
+          f"{'rerun p50 ms':>13} {'rerun p95 ms':>13}")
+    for name, stats in results["scenarios"].items():
+        print(f"{name:<28} {stats['app_modules']:>7} {stats['first_run_ms']:>13.1f} {stats['first_page_ms']:>14.1f} "
+              f"{stats['rerun']['p50_ms']:>13.1f} {stats['rerun']['p95_ms']:>13.1f}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, results["label"] + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {REGRESSION_RATIO}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# Loader and page-query timings over synthetic data (see synthetic.py).
+# Results are stored as JSON; --compare checks them against an earlier run
+# and exits non-zero on a regression.
+#
+#   python benchmarks/bench_suite.py --rows 100000
+#   python benchmarks/bench_suite.py --rows 100000 --compare benchmarks/results/baseline-100000.json
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# A query or loader figure this many times worse than the baseline is a regression
+REGRESSION_RATIO = 1.25
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_load(data_dir, db_path, workers):
+    from Hospital import load_all
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    # The loader reads the CSV feeds from the working directory
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        # The generated nurse assignments are written as the sample feed
+        report = load_all(db_path, workers=workers, sample_data=True)
+    finally:
+        os.chdir(cwd)
+    rows = sum(stats["rows_read"] for stats in report["tables"])
+    return {
+        "seconds": report["total_seconds"],
+        "rows": rows,
+        "rows_per_second": round(rows / report["total_seconds"], 1),
+        "parent_peak_memory_mb": report["parent_peak_memory_mb"],
+        "workers_peak_memory_mb": report["workers_peak_memory_mb"],
+        "tables": {
+            stats["table"]: {"rows": stats["rows_read"], "seconds": stats["total_seconds"],
+                             "rows_per_second": stats["rows_per_second"]}
+            for stats in report["tables"]
+        },
+    }
+
+
+def latency_stats(latencies, rows):
+    latencies = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "iterations": len(latencies),
+        "rows": rows,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "queries_per_second": round(len(latencies) / (latencies.sum() / 1000), 1),
+    }
+
+
+def data_samples(conn):
+    """Query parameters that match rows of the generated data."""
+    doc_id, pat_id = conn.execute("SELECT DOC_ID, PAT_ID FROM APPOINTMENT LIMIT 1").fetchone()
+    patient = conn.execute("SELECT FNAME FROM PATIENT WHERE PAT_ID = ?", (pat_id,)).fetchone()[0]
+    return {
+        "doc_id": doc_id,
+        "nurse_id": conn.execute("SELECT NURSE_ID FROM NURSE_ASSIGNMENT WHERE PAT_ID = ?", (pat_id,)).fetchone()[0],
+        "specialization": conn.execute("SELECT SPECIALIZATION FROM DOCTOR WHERE DOC_ID = ?", (doc_id,)).fetchone()[0],
+        "dept_id": conn.execute("SELECT DEPT_ID FROM STAFF LIMIT 1").fetchone()[0],
+        "username": conn.execute("SELECT username FROM USER_DATA LIMIT 1").fetchone()[0],
+        "identity": conn.execute("SELECT username FROM USER_DATA WHERE user_type = 'Doctor' LIMIT 1").fetchone()[0],
+        "staff_name": conn.execute("SELECT TRIM(NAME) FROM ADMIN LIMIT 1").fetchone()[0],
+        "pat_id": pat_id,
+        "patient": patient,
+        "short_term": patient[1:3],
+        # A year back: the ranges from here cover appointments and invoices,
+        # which the synthetic feeds spread over the same years
+        "day": date.today() - timedelta(days=364),
+    }
+
+
+def time_queries(samples, iterations, max_seconds):
+    """Latency of every query in queries.planned_queries(), read uncached."""
+    import queries
+    from db import get_db_connection
+
+    results = {}
+    with get_db_connection() as conn:
+        for name, sql, params in queries.planned_queries(samples):
+            # Some queries are planned with several parameter sets
+            key, n = name, 2
+            while key in results:
+                key, n = f"{name} #{n}", n + 1
+            rows = len(conn.execute(sql, params).fetchall())  # warm-up
+            latencies = []
+            deadline = time.perf_counter() + max_seconds
+            while len(latencies) < iterations and time.perf_counter() < deadline:
+                start = time.perf_counter()
+                conn.execute(sql, params).fetchall()
+                latencies.append(time.perf_counter() - start)
+            results[key] = latency_stats(latencies, rows)
+    return results
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    """Print each figure against the baseline; return the regressions."""
+    regressions = []
+    print(f"\n{'compared to ' + baseline.get('label', '?'):<48} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    before, now = baseline["load"]["rows_per_second"], results["load"]["rows_per_second"]
+    change = before / now if now else float("inf")
+    flag = change > ratio
+    print(f"{'load rows/s':<48} {before:>10.0f} {now:>10.0f} {change:>7.2f}{'  REGRESSION' if flag else ''}")
+    if flag:
+        regressions.append("load")
+    for name, stats in results["queries"].items():
+        if name not in baseline["queries"]:
+            continue
+        before, now = baseline["queries"][name]["p95_ms"], stats["p95_ms"]
+        change = now / before if before else 1.0
+        # Sub-millisecond jitter is not a regression
+        flag = change > ratio and now - before > 0.5
+        print(f"{name + ' p95 ms':<48} {before:>10.3f} {now:>10.3f} {change:>7.2f}{'  REGRESSION' if flag else ''}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the loader and page queries over synthetic data.")
+    parser.add_argument("--rows", type=int, default=10000, help="appointments in the dataset (1e4 to 1e8)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="bench_data", help="where datasets are kept (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="loader parser processes")
+    parser.add_argument("--iterations", type=int, default=100, help="runs per query")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="time limit per query")
+    parser.add_argument("--label", default=None, help="name of the results file (default: ROWS-COMMIT)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(os.path.join(args.data_dir, str(args.rows)))
+    db_path = os.path.join(data_dir, "hospital.db")
+    # db.py reads the database path when it is first imported, so the
+    # repo's modules are imported from here on
+    os.environ["HOSPITAL_DB"] = db_path
+    import synthetic
+
+    if not synthetic.dataset_ready(data_dir, args.rows, args.seed):
+        start = time.perf_counter()
+        synthetic.generate(data_dir, args.rows, args.seed)
+        print(f"Generated {args.rows:,}-row dataset in {time.perf_counter() - start:.1f}s")
+
+    commit = git_commit()
+    results = {
+        "label": args.label or f"{args.rows}-{commit or 'local'}",
+        "rows": args.rows,
+        "seed": args.seed,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+    results["load"] = time_load(data_dir, db_path, args.workers)
+    load = results["load"]
+    print(f"Loaded {load['rows']:,} rows in {load['seconds']:.1f}s ({load['rows_per_second']:,.0f} rows/s)")
+
+    from db import get_db_connection
+
+    with get_db_connection() as conn:
+        samples = data_samples(conn)
+    results["samples"] = {name: str(value) for name, value in samples.items()}
+    results["queries"] = time_queries(samples, args.iterations, args.max_seconds)
+    print(f"\n{'query':<40} {'rows':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'q/s':>9}")
+    for name, stats in results["queries"].items():
+        print(f"{name:<40} {stats['rows']:>8} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} "
+              f"{stats['p99_ms']:>9.3f} {stats['queries_per_second']:>9.1f}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, results["label"] + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("rows") != args.rows:
+            print(f"Warning: baseline has {baseline.get('rows'):,} rows, this run {args.rows:,}")
+        regressions = compare(results, baseline)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {REGRESSION_RATIO}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# Synthetic CSV feeds for Hospital.py at any scale. Every feed in
+# Hospital.CSV_FEEDS and SAMPLE_FEEDS is written with the same header as the
+# repo's CSV, plus the BILLED_ON date a real invoice feed would carry (the
+# repo's Billing.csv has none), and every reference (appointment -> doctor/patient, history ->
+# appointment, invoice -> patient, staff -> department, assignment ->
+# nurse/patient) points at a generated row.
+#
+#   python benchmarks/synthetic.py --rows 1000000 --out bench_data/1000000
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Hospital import CSV_FEEDS, SAMPLE_FEEDS  # noqa: E402
+
+# Rows per writerows() call
+WRITE_ROWS = 10000
+
+# First ID of each table. The sample parameters in queries.planned_queries()
+# (doctor 100, patient "Ira") then refer to generated rows.
+FIRST_DEPT_ID = 101
+FIRST_DOC_ID = 100
+FIRST_NURSE_ID = 100000001
+FIRST_PAT_ID = 1
+
+APPOINTMENT_YEARS = 3
+
+MANIFEST = "manifest.json"
+# Version of the feeds' layout, in the manifest; datasets written before a
+# change to it are generated again
+FORMAT = 2
+
+
+def table_sizes(rows):
+    """Rows per table for a dataset of `rows` appointments."""
+    return {
+        "DEPARTMENT": 20,
+        "DOCTOR": max(20, rows // 200),
+        "NURSE": max(20, rows // 200),
+        "STAFF": max(20, rows // 200) * 2 + max(10, rows // 500),
+        "CASHIER": max(5, rows // 2000),
+        "ADMIN": 4,
+        "PATIENT": max(100, rows // 10),
+        "NURSE_ASSIGNMENT": max(100, rows // 10),
+        "APPOINTMENT": rows,
+        "MEDICAL_HISTORY": rows,
+        "BILLING": rows,
+        "USER_DATA": max(10, rows // 100),
+    }
+
+
+def repo_csv(filename):
+    # Header and rows of one of the repo's own CSVs
+    with open(os.path.join(ROOT, filename), newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        return header, [row for row in reader if row]
+
+
+def name_pools():
+    header, rows = repo_csv("Patient.csv")
+    first, last = header.index("fname"), header.index("lname")
+    return sorted({row[first] for row in rows}), sorted({row[last] for row in rows})
+
+
+def write_feed(out_dir, filename, header, rows):
+    path = os.path.join(out_dir, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == WRITE_ROWS:
+                writer.writerows(batch)
+                batch = []
+        writer.writerows(batch)
+
+
+def generate(out_dir, rows, seed=0):
+    """Write every CSV feed for `rows` appointments into out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    sizes = table_sizes(rows)
+    first_names, last_names = name_pools()
+    files = {table: filename for filename, table in CSV_FEEDS + SAMPLE_FEEDS}
+
+    def name():
+        return f"{rng.choice(first_names)} {rng.choice(last_names)}"
+
+    departments = repo_csv("Department.csv")[1]
+    dept_ids = [FIRST_DEPT_ID + i for i in range(sizes["DEPARTMENT"])]
+    write_feed(out_dir, files["DEPARTMENT"], repo_csv(files["DEPARTMENT"])[0],
+               ([dept_id, departments[i % len(departments)][1]] for i, dept_id in enumerate(dept_ids)))
+
+    # Doctors and nurses also have staff records, matched by name, which is
+    # how the dashboard finds a doctor's department
+    specializations = sorted({row[2] for row in repo_csv("Doctor.csv")[1]})
+    doctors = [(FIRST_DOC_ID + i, name(), rng.choice(specializations)) for i in range(sizes["DOCTOR"])]
+    nurses = [(FIRST_NURSE_ID + i, rng.choice(first_names), rng.choice(last_names)) for i in range(sizes["NURSE"])]
+    write_feed(out_dir, files["DOCTOR"], repo_csv(files["DOCTOR"])[0],
+               ([doc_id, doc_name, spec, f"{doc_name.replace(' ', '.')}@example.com"] for doc_id, doc_name, spec in doctors))
+    write_feed(out_dir, files["NURSE"], repo_csv(files["NURSE"])[0], (list(nurse) for nurse in nurses))
+
+    def staff():
+        for doc_id, doc_name, spec in doctors:
+            yield [doc_id, doc_name, spec, rng.choice(dept_ids)]
+        for nurse_id, fname, lname in nurses:
+            yield [nurse_id, f"{fname} {lname}", "Nurse", rng.choice(dept_ids)]
+        first_other = FIRST_NURSE_ID + len(nurses)
+        for i in range(sizes["STAFF"] - len(doctors) - len(nurses)):
+            yield [first_other + i, name(), "Technician", rng.choice(dept_ids)]
+
+    write_feed(out_dir, files["STAFF"], repo_csv(files["STAFF"])[0], staff())
+    write_feed(out_dir, files["CASHIER"], repo_csv(files["CASHIER"])[0],
+               ([f"{i + 1:03d}", rng.choice(first_names), "Cashier"] for i in range(sizes["CASHIER"])))
+    write_feed(out_dir, files["ADMIN"], repo_csv(files["ADMIN"])[0],
+               ([1000 + i, name(), "Admin"] for i in range(sizes["ADMIN"])))
+
+    pat_ids = range(FIRST_PAT_ID, FIRST_PAT_ID + sizes["PATIENT"])
+    patients = [(pat_id, rng.choice(first_names), rng.choice(last_names)) for pat_id in pat_ids]
+    write_feed(out_dir, files["PATIENT"], repo_csv(files["PATIENT"])[0],
+               ([pat_id, fname, lname, f"{fname}.{lname}{pat_id}@example.com", rng.choice(("Inpatient", "Outpatient"))]
+                for pat_id, fname, lname in patients))
+
+    # Appointment.csv's formats: M/D/YYYY dates and an ISO timestamp as the time
+    first_day = date.today() - timedelta(days=365 * APPOINTMENT_YEARS)
+    days = 365 * APPOINTMENT_YEARS + 30
+
+    # Every patient has a nurse for the whole period
+    write_feed(out_dir, files["NURSE_ASSIGNMENT"], repo_csv(files["NURSE_ASSIGNMENT"])[0],
+               ([nurses[rng.randrange(len(nurses))][0], pat_id, first_day.isoformat(), ""] for pat_id in pat_ids))
+
+    def appointments():
+        for appt_id in range(1, rows + 1):
+            day = first_day + timedelta(days=rng.randrange(days))
+            time = f"{day.isoformat()}T{rng.randrange(8, 18):02d}:{rng.choice((0, 15, 30, 45)):02d}:00.000Z"
+            yield [appt_id, f"{day.month}/{day.day}/{day.year}", time,
+                   rng.choice(pat_ids), doctors[rng.randrange(len(doctors))][0]]
+
+    write_feed(out_dir, files["APPOINTMENT"], repo_csv(files["APPOINTMENT"])[0], appointments())
+    write_feed(out_dir, files["MEDICAL_HISTORY"], repo_csv(files["MEDICAL_HISTORY"])[0],
+               ([rng.randrange(1000, 10000), name(), appt_id] for appt_id in range(1, sizes["MEDICAL_HISTORY"] + 1)))
+
+    items = sorted({row[2] for row in repo_csv("Billing.csv")[1] if row[2]})
+    write_feed(out_dir, files["BILLING"], repo_csv(files["BILLING"])[0] + ["BILLED_ON"],
+               ([f"{rng.getrandbits(128):032x}", rng.choice(pat_ids), rng.choice(items), rng.randrange(100, 1000000),
+                 (first_day + timedelta(days=rng.randrange(days))).isoformat()]
+                for _ in range(sizes["BILLING"])))
+
+    # Logins for doctors and nurses, under the names they register with,
+    # and for patients. Usernames are unique, so a repeated name is skipped.
+    def users():
+        used = set()
+        for user_id in range(1, sizes["USER_DATA"] + 1):
+            kind = user_id % 3
+            if kind == 0:
+                username, user_type = doctors[(user_id // 3) % len(doctors)][1], "Doctor"
+            elif kind == 1:
+                nurse = nurses[(user_id // 3) % len(nurses)]
+                username, user_type = f"{nurse[1]} {nurse[2]}", "Nurse"
+            else:
+                username, user_type = f"{rng.choice(patients)[1]}{user_id}", "Patient"
+            if username in used:
+                username, user_type = f"user{user_id}", "Patient"
+            used.add(username)
+            yield [user_id, username, f"pass{user_id}", f"user{user_id}@example.com", user_type]
+
+    write_feed(out_dir, files["USER_DATA"], repo_csv(files["USER_DATA"])[0], users())
+
+    # Written last: a dataset with a manifest is complete
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"rows": rows, "seed": seed, "format": FORMAT, "tables": sizes}, f, indent=2)
+    return sizes
+
+
+def dataset_ready(out_dir, rows, seed=0):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get("rows") == rows and manifest.get("seed") == seed and manifest.get("format") == FORMAT
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic hospital CSV feeds.")
+    parser.add_argument("--rows", type=int, default=10000, help="appointments (and invoices, history rows)")
+    parser.add_argument("--out", default=None, help="directory to write (default: bench_data/ROWS)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    out_dir = args.out or os.path.join("bench_data", str(args.rows))
+    sizes = generate(out_dir, args.rows, args.seed)
+    for table, count in sizes.items():
+        print(f"{table:<16} {count:>12,}")
+    print(f"Written to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
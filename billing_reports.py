@@ -0,0 +1,146 @@
+# Billing reports for the Cashier "Reports" page. Totals are grouped in
+# SQLite (per period from the daily billing summary, per item and per
+# patient from covering indexes); amount percentiles are computed with
+# NumPy over one column fetched in batches. Every result is cached until
+# Billing is next written. Reports that read Billing include the invoices
+# archived in their range (see archive.py); the period totals come from the
+# summary, which still counts them.
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import queries
+from cache import cached_frame, read_sql
+from db import archive_reads, get_db_connection
+
+# strftime() formats of the report periods
+PERIOD_FORMATS = {
+    "Day": "%Y-%m-%d",
+    "Week": "%Y-W%W",
+    "Month": "%Y-%m",
+    "Year": "%Y",
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+TOP_PATIENTS = 10
+
+# Rows per fetchmany() when reading a column into NumPy
+FETCH_ROWS = 65536
+
+
+def billed_days():
+    """(first, last) day with invoices, as dates, or (None, None)."""
+    first, last = read_sql(queries.BILLED_DAYS).iloc[0]
+    if first is None:
+        return None, None
+    return date.fromisoformat(first), date.fromisoformat(last)
+
+
+def undated_invoices():
+    """Invoices without a BILLED_ON date, which the reports leave out."""
+    return int(read_sql(queries.UNDATED_INVOICES)["invoices"].iloc[0])
+
+
+def revenue_by_period(start, end, period="Month"):
+    params = [PERIOD_FORMATS[period], start.isoformat(), end.isoformat()]
+    return read_sql(queries.REVENUE_BY_PERIOD, params).set_index("period")
+
+
+def invoices(start, end):
+    # Reads of the invoices billed from start to end, inclusive
+    return archive_reads(start, end + timedelta(days=1))
+
+
+def revenue_by_item(start, end):
+    with invoices(start, end):
+        return read_sql(queries.REVENUE_BY_ITEM, [start.isoformat(), end.isoformat()]).set_index("item")
+
+
+def revenue_by_patient_type(start, end):
+    with invoices(start, end):
+        df = read_sql(queries.REVENUE_BY_PATIENT_TYPE, [start.isoformat(), end.isoformat()])
+    return df.set_index("patient_type")
+
+
+def top_patients(start, end, limit=TOP_PATIENTS):
+    with invoices(start, end):
+        return read_sql(queries.TOP_PATIENTS, [start.isoformat(), end.isoformat(), limit]).set_index("pat_id")
+
+
+def fetch_column(conn, sql, params=(), dtype=np.float64):
+    """The first column of sql's rows as a NumPy array."""
+    cursor = conn.execute(sql, params)
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        chunks.append(np.fromiter((row[0] for row in rows), dtype=dtype, count=len(rows)))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+
+def run_percentiles(values, starts, counts, q=PERCENTILES):
+    """Percentiles q of each sorted run values[start:start + count].
+
+    Returns a (runs, len(q)) array, interpolated linearly between ranks as
+    np.percentile does, for all runs at once.
+    """
+    starts = starts[:, None]
+    last = starts + counts[:, None] - 1
+    rank = starts + (counts[:, None] - 1) * (np.asarray(q, dtype=np.float64) / 100)
+    below = np.floor(rank).astype(np.int64)
+    above = np.minimum(below + 1, last)
+    return values[below] + (values[above] - values[below]) * (rank - below)
+
+
+def _amount_distribution(start, end):
+    params = [start.isoformat(), end.isoformat()]
+    columns = ["invoices", "mean", "min"] + [f"p{q}" for q in PERCENTILES] + ["max"]
+    # Both reads in one transaction, so the counts match the amounts
+    with get_db_connection() as conn:
+        began = not conn.in_transaction
+        if began:
+            conn.execute("BEGIN")
+        try:
+            groups = conn.execute(queries.ITEM_COUNTS, params).fetchall()
+            amounts = fetch_column(conn, queries.ITEM_AMOUNTS, params)
+        finally:
+            if began:
+                conn.rollback()
+    if not groups:
+        return pd.DataFrame(columns=columns)
+
+    items = ["Unspecified" if item == "" else item for item, count in groups]
+    counts = np.fromiter((count for item, count in groups), dtype=np.int64, count=len(groups))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ends = starts + counts - 1
+
+    # All invoices as one more run, appended after the per-item runs
+    everything = np.sort(amounts)
+    values = np.concatenate((amounts, everything))
+    starts = np.append(starts, len(amounts))
+    counts = np.append(counts, len(amounts))
+    ends = np.append(ends, len(values) - 1)
+
+    table = np.column_stack((
+        counts,
+        np.add.reduceat(values, starts) / counts,
+        values[starts],
+        run_percentiles(values, starts, counts),
+        values[ends],
+    ))
+    df = pd.DataFrame(table, index=items + ["All items"], columns=columns)
+    df["invoices"] = df["invoices"].astype(np.int64)
+    df.index.name = "item"
+    # Overall figures first, then items by invoice count
+    return pd.concat((df.iloc[-1:], df.iloc[:-1].sort_values("invoices", ascending=False)))
+
+
+def amount_distribution(start, end):
+    """Invoice amount statistics and percentiles, per item and overall."""
+    key = ("billing_reports.amount_distribution", start.isoformat(), end.isoformat())
+    with invoices(start, end):
+        return cached_frame(key, ("billing",), lambda: _amount_distribution(start, end))
@@ -0,0 +1,170 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from db import add_commit_listener, get_db_connection, read_source
+from query_stats import add_gauges
+
+# Per-table version counters. A cached result remembers the versions of the
+# tables it read; any commit that writes one of them makes it stale.
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def bump_tables(tables):
+    with _versions_lock:
+        for table in tables:
+            table = table.lower()
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+def table_versions(tables=None):
+    with _versions_lock:
+        if tables is None:
+            return dict(_versions)
+        return {table: _versions.get(table, 0) for table in tables}
+
+
+add_commit_listener(bump_tables)
+
+
+class QueryCache:
+    """LRU cache of query results, bounded by entry count and memory.
+
+    Entries also expire after max_age seconds, which bounds how long a write
+    made outside this process (e.g. a Hospital.py load) can go unnoticed.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=512, max_age=300.0):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            df, versions, size, stored_at = entry
+            if time.monotonic() - stored_at > self.max_age or table_versions(versions) != versions:
+                self._remove(key)
+                self._counters["stale"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return df
+
+    def put(self, key, df, versions):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (df, versions, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+_cache = QueryCache()
+add_gauges("cache", _cache.stats)
+
+# Tables each SQL string reads, found once with an authorizer
+_read_tables = {}
+
+
+def tables_read_by(conn, sql, params=()):
+    tables = _read_tables.get(sql)
+    if tables is not None:
+        return tables
+
+    found = set()
+
+    def authorize(action, arg1, arg2, dbname, source):
+        if action == sqlite3.SQLITE_READ and arg1:
+            found.add(arg1.lower())
+        return sqlite3.SQLITE_OK
+
+    # The authorizer only runs while a statement is prepared, and the
+    # connection may already hold this SQL in its statement cache, so
+    # prepare it afresh as EXPLAIN
+    conn.set_authorizer(authorize)
+    try:
+        conn.execute("EXPLAIN " + sql, params).fetchall()
+    finally:
+        conn.set_authorizer(None)
+    tables = frozenset(found)
+    _read_tables[sql] = tables
+    return tables
+
+
+def read_sql(sql, params=()):
+    """pd.read_sql_query through the result cache.
+
+    The returned DataFrame may be shared with other sessions, so callers
+    must not modify it in place.
+    """
+    params = tuple(params)
+    # Reads from a snapshot or including archived rows (see db.read_source)
+    # are cached apart from those of the primary database alone
+    key = (sql, params, read_source())
+    df = _cache.get(key)
+    if df is not None:
+        return df
+
+    # Take the versions before running the query: a write that commits while
+    # it runs then leaves the entry stale rather than wrongly fresh
+    before = table_versions()
+    with get_db_connection() as conn:
+        tables = tables_read_by(conn, sql, params)
+        df = pd.read_sql_query(sql, conn, params=params)
+    _cache.put(key, df, {table: before.get(table, 0) for table in tables})
+    return df
+
+
+def cached_frame(key, tables, compute):
+    """compute() -> DataFrame through the result cache.
+
+    For results worked out in Python rather than read by one query; tables
+    are the tables compute() reads, and key must not collide with a
+    read_sql() key, which is an (sql, params, source) triple.
+    """
+    key = (key, read_source())
+    df = _cache.get(key)
+    if df is not None:
+        return df
+    before = table_versions()
+    df = compute()
+    _cache.put(key, df, {table.lower(): before.get(table.lower(), 0) for table in tables})
+    return df
+
+
+def get_cache():
+    return _cache
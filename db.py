@@ -0,0 +1,545 @@
+import contextvars
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from functools import partial
+
+from migrations import apply_migrations
+from query_stats import InstrumentedConnection, add_gauges, set_page
+
+# Path of the hospital database, overridable for test copies of the data
+DB_PATH = os.environ.get("HOSPITAL_DB", "hospital.db")
+
+# Seconds a page waits for its write to commit before giving up on it
+WRITE_TIMEOUT = float(os.environ.get("HOSPITAL_WRITE_TIMEOUT", "30"))
+
+# PRAGMAs applied once, when a pooled connection is first opened.
+# WAL lets readers keep going while the writer commits, and with WAL
+# synchronous=NORMAL only syncs at checkpoints without risking corruption.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -32000",  # 32 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # map up to 256 MB of the file
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+# Called with the set of (lower-case) table names after every writer commit
+_commit_listeners = []
+
+
+def add_commit_listener(fn):
+    _commit_listeners.append(fn)
+
+
+# Authorizer action codes that modify a table
+_WRITE_ACTIONS = (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE)
+
+
+# journal_mode is stored in the database file, so this only needs to run
+# once per database rather than on every connection
+def configure_storage(conn):
+    mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    return mode
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    pass
+
+
+class WriteTimeout(sqlite3.OperationalError):
+    pass
+
+
+# sqlite3.Connection has no __dict__, so pooled connections use a subclass
+# that can carry the bookkeeping the pool needs. Its statements are timed
+# by query_stats.
+class PooledConnection(InstrumentedConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Process-wide pool of long-lived SQLite connections.
+
+    A thread holds at most one connection at a time: nested checkouts on the
+    same thread share it, so helpers can open a connection without caring
+    whether their caller already has one.
+    """
+
+    def __init__(self, path=DB_PATH, max_size=8, timeout=10.0, health_check_interval=30.0, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._setup_lock = threading.Lock()
+        self._storage_ready = False
+        self._local = threading.local()
+        self._size = 0
+        self._in_use = 0
+        self._counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _connect(self):
+        if self.read_only:
+            # A snapshot file (see replica.py) never changes once written, so
+            # SQLite can skip locking it altogether
+            uri = pathlib.Path(self.path).absolute().as_uri() + "?mode=ro&immutable=1"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=PooledConnection)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False, factory=PooledConnection)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._setup_lock:
+            # A read-only pool reads a copy that is already set up
+            if not self._storage_ready and not self.read_only:
+                configure_storage(conn)
+                apply_migrations(conn)
+                self._storage_ready = True
+        with self._lock:
+            self._counters["created"] += 1
+        return conn
+
+    def _healthy(self, conn):
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._counters["discarded"] += 1
+
+    def _acquire(self):
+        start = time.perf_counter()
+        waited = False
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    create = self._size < self.max_size
+                    if create:
+                        self._size += 1
+                if create:
+                    try:
+                        conn = self._connect()
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._size -= 1
+                        raise
+                else:
+                    # Pool is saturated: block until another thread releases
+                    waited = True
+                    remaining = self.timeout - (time.perf_counter() - start)
+                    try:
+                        conn = self._idle.get(timeout=max(remaining, 0))
+                    except queue.Empty:
+                        with self._lock:
+                            self._counters["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+            if self._healthy(conn):
+                break
+            self._discard(conn)
+
+        wait = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._counters["checkouts"] += 1
+            if waited:
+                self._counters["waits"] += 1
+            self._counters["wait_seconds_total"] += wait
+            self._counters["wait_seconds_max"] = max(self._counters["wait_seconds_max"], wait)
+        return conn
+
+    def _release(self, conn):
+        # Never hand an open transaction to the next borrower
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                with self._lock:
+                    self._in_use -= 1
+                self._discard(conn)
+                return
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = self._size
+            stats["in_use"] = self._in_use
+            stats["max_size"] = self.max_size
+        stats["idle"] = stats["size"] - stats["in_use"]
+        stats["saturation"] = stats["in_use"] / self.max_size
+        checkouts = stats["checkouts"]
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / checkouts if checkouts else 0.0
+        return stats
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+class WriterQueue:
+    """Single serialized writer for the database.
+
+    All writes are submitted as jobs, fn(conn) -> result, and executed on one
+    background thread. Jobs that queue up while a transaction is running are
+    committed together (group commit), each inside its own savepoint so one
+    failing job does not roll back the others. A batch that fails outside
+    its jobs, e.g. in COMMIT or a commit listener, fails every job in it
+    and the writer goes on with the next batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path=DB_PATH, max_batch=64, foreign_keys=True, timeout=WRITE_TIMEOUT):
+        self.path = path
+        self.max_batch = max_batch
+        self.foreign_keys = foreign_keys
+        self.timeout = timeout
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._counters = {"jobs": 0, "failed": 0, "commits": 0, "largest_batch": 0, "failed_batches": 0, "restarts": 0}
+        self._written = set()
+        self._closed = False
+        self._thread = None
+        self._start()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="hospital-db-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        # isolation_level=None: the writer issues BEGIN/COMMIT itself.
+        # The authorizer only runs when a statement is prepared, so the
+        # statement cache is off to see the tables every job writes to.
+        conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, cached_statements=0,
+            factory=InstrumentedConnection,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if not self.foreign_keys:
+            conn.execute("PRAGMA foreign_keys = OFF")
+        configure_storage(conn)
+        conn.set_authorizer(self._authorize)
+        return conn
+
+    def _authorize(self, action, arg1, arg2, dbname, source):
+        if action in _WRITE_ACTIONS and arg1:
+            self._written.add(arg1.lower())
+        return sqlite3.SQLITE_OK
+
+    def _run(self):
+        # Jobs run under their submitter's page; BEGIN/COMMIT count as the writer's
+        set_page("writer")
+        conn = None
+        stopping = False
+        while not stopping:
+            batch = [self._jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            if self._STOP in batch:
+                stopping = True
+                batch = [job for job in batch if job is not self._STOP]
+            if not batch:
+                continue
+            try:
+                if conn is None:
+                    conn = self._connect()
+                self._commit_batch(conn, batch)
+            except BaseException as e:
+                for fn, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                with self._lock:
+                    self._counters["failed_batches"] += 1
+                conn = self._reset(conn)
+                # KeyboardInterrupt and the like still end the thread; the
+                # next submit() starts another
+                if not isinstance(e, Exception):
+                    raise
+        if conn is not None:
+            conn.close()
+
+    def _reset(self, conn):
+        # A batch that failed outside its jobs may have left its transaction
+        # open; if it cannot be rolled back, the next batch reconnects
+        if conn is None:
+            return None
+        try:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return conn
+        except sqlite3.Error:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return None
+
+    def _commit_batch(self, conn, batch):
+        done = []
+        self._written = set()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            for fn, future in batch:
+                future.set_exception(e)
+            return
+
+        for fn, future in batch:
+            conn.execute("SAVEPOINT job")
+            try:
+                result = fn(conn)
+            except Exception as e:
+                conn.execute("ROLLBACK TO job")
+                conn.execute("RELEASE job")
+                future.set_exception(e)
+                with self._lock:
+                    self._counters["failed"] += 1
+                continue
+            conn.execute("RELEASE job")
+            done.append((future, result))
+
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            for future, result in done:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._counters["jobs"] += len(batch)
+            self._counters["commits"] += 1
+            self._counters["largest_batch"] = max(self._counters["largest_batch"], len(batch))
+        # Listeners run before any caller is released, so a caller that reads
+        # straight after its write never sees a stale cached result
+        for listener in _commit_listeners:
+            listener(self._written)
+        for future, result in done:
+            future.set_result(result)
+
+    def submit(self, fn):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The writer is closed")
+            # Queued jobs wait for a thread that has died, so start another
+            if not self._thread.is_alive():
+                self._counters["restarts"] += 1
+                self._start()
+        # Run the job in the submitter's context, so query_stats knows its page
+        self._jobs.put((partial(contextvars.copy_context().run, fn), future))
+        return future
+
+    def call(self, fn):
+        """Run fn(conn) on the writer and return its result once committed.
+
+        Raises WriteTimeout if that takes longer than timeout seconds; the
+        job may still commit later.
+        """
+        future = self.submit(fn)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise WriteTimeout(f"Write not committed after {self.timeout}s") from None
+
+    # Run one statement on the writer and wait for it to commit
+    def execute(self, sql, params=()):
+        return self.call(lambda conn: conn.execute(sql, params).rowcount)
+
+    def executemany(self, sql, rows):
+        return self.call(lambda conn: conn.executemany(sql, rows).rowcount)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["queued"] = self._jobs.qsize()
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._jobs.put(self._STOP)
+        self._thread.join()
+
+
+_pool = None
+_writer = None
+_pool_lock = threading.Lock()
+
+
+# Modules imported by the Streamlit script survive reruns, so this pool is
+# shared by every session and every rerun of the process
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+                add_gauges("pool", _pool.stats)
+    return _pool
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _pool_lock:
+            if _writer is None:
+                _writer = WriterQueue()
+                add_gauges("writer", _writer.stats)
+    return _writer
+
+
+# Page functions that only read can run inside snapshot_reads(): their
+# connections then come from the registered snapshot source (see
+# replica.py) while its snapshot is fresh enough, and from the pool
+# otherwise. Writes always go through the writer to the primary.
+_snapshot_source = None
+_snapshot_reads = contextvars.ContextVar("snapshot_reads", default=False)
+
+
+def set_snapshot_source(source):
+    global _snapshot_source
+    _snapshot_source = source
+
+
+@contextmanager
+def snapshot_reads(enabled=True):
+    token = _snapshot_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _snapshot_reads.reset(token)
+
+
+# For reads inside snapshot_reads() that must see the latest commits, e.g.
+# of the user who just registered
+def primary_reads():
+    return snapshot_reads(False)
+
+
+# Reads inside archive_reads(start, end) also see the rows moved to the
+# archive from start to end (either may be None, for no bound): the
+# registered archive source (see archive.py) attaches the archive files
+# they need to the connection for the duration.
+_archive_source = None
+_archive_range = contextvars.ContextVar("archive_range", default=None)
+
+
+def set_archive_source(source):
+    global _archive_source
+    _archive_source = source
+
+
+@contextmanager
+def archive_reads(start=None, end=None):
+    token = _archive_range.set((start, end))
+    try:
+        yield
+    finally:
+        _archive_range.reset(token)
+
+
+def archive_range():
+    if _archive_source is None:
+        return None
+    return _archive_range.get()
+
+
+def read_source():
+    """What reads here see, for telling cached results apart.
+
+    None for the primary database alone; otherwise the snapshot generation
+    they read, or None, with the archived range when there is one.
+    """
+    generation = None
+    if _snapshot_reads.get() and _snapshot_source is not None:
+        generation = _snapshot_source.current_generation()
+    span = archive_range()
+    return generation if span is None else (generation, span)
+
+
+def _read_connection():
+    if _snapshot_reads.get() and _snapshot_source is not None:
+        conn = _snapshot_source.connection()
+        if conn is not None:
+            return conn
+    return get_pool().connection()
+
+
+def get_db_connection():
+    span = archive_range()
+    if span is not None:
+        return _archive_source.including(_read_connection(), *span)
+    return _read_connection()
+
+
+def execute_write(sql, params=()):
+    return get_writer().execute(sql, params)
+
+
+# Queue a write without waiting for it; returns the Future of its rowcount
+def submit_write(sql, params=()):
+    return get_writer().submit(lambda conn: conn.execute(sql, params).rowcount)
@@ -0,0 +1,250 @@
+# Exports of the tables and views defined in Hospital.py, and of the tables
+# migrations.py adds, for auditors.
+# Rows are read from one cursor in fetchmany() batches and written out as
+# they arrive, so memory use stays flat however large the table is.
+# Exports of archived tables include their archived rows (see archive.py).
+# History notes are written as text, however they are stored (see history.py).
+#
+#   python export.py Billing APPOINTMENT --format parquet --compression zstd
+#   python export.py --all
+
+import argparse
+import csv
+import gzip
+import io
+import os
+import re
+import sys
+from contextlib import contextmanager
+
+import archive  # noqa: F401 (makes archived rows readable through archive_reads)
+import history
+from Hospital import SCHEMA
+from db import archive_reads, get_db_connection
+from migrations import APPOINTMENT_AGGREGATES
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd compression of CSV exports
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: Parquet exports
+    pa = pq = None
+
+# Rows per fetchmany(), and per Parquet row group
+EXPORT_ROWS = 50000
+
+EXPORT_DIR = "exports"
+
+# Tables created by migrations.py rather than Hospital.py. LOAD_ROW_HASH is
+# left out: it holds nothing but hashes of loaded rows (see load_state.py).
+MIGRATION_TABLES = (
+    "PATIENT_HISTORY",
+    "USER_IDENTITY",
+    "LOAD_STATE",
+    "ARCHIVE_STATE",
+    *(table for table, key, expr in APPOINTMENT_AGGREGATES),
+    "AGG_BILLING_DAILY",
+)
+
+# Columns left out of every export
+EXCLUDED_COLUMNS = {
+    "USER_DATA": {"password"},
+    # BODY is exported decoded, so its encoding no longer applies
+    "PATIENT_HISTORY": {"ENCODING"},
+}
+
+# Columns exported as an expression over the stored row, by (table, column)
+EXPORTED_AS = {
+    ("PATIENT_HISTORY", "BODY"): "history_body(ENCODING, BODY)",
+}
+
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def exportable_objects():
+    """Tables and views created by Hospital.py, in schema order, then migrations.py's tables."""
+    return re.findall(r"CREATE (?:TABLE|VIEW) (?:IF NOT EXISTS )?(\w+)", SCHEMA, re.IGNORECASE) + list(MIGRATION_TABLES)
+
+
+def export_name(name):
+    # Names are matched case-insensitively, as SQLite does
+    for known in exportable_objects():
+        if known.lower() == name.lower():
+            return known
+    raise ValueError(f"{name} is not a table or view defined in Hospital.py or migrations.py")
+
+
+def available_formats():
+    return ["csv"] + (["parquet"] if pa is not None else [])
+
+
+def available_compressions(fmt):
+    # CSV is compressed as a whole stream; Parquet compresses each column chunk
+    if fmt == "parquet":
+        return [None, "snappy", "gzip", "zstd"]
+    return [None, "gzip"] + (["zstd"] if zstandard is not None else [])
+
+
+def export_filename(name, fmt="csv", compression=None):
+    filename = name + EXTENSIONS[fmt]
+    if fmt == "csv" and compression:
+        filename += COMPRESSION_EXTENSIONS[compression]
+    return filename
+
+
+def export_columns(conn, name):
+    """(column, declared type) of each exported column of table or view name."""
+    excluded = {column.lower() for column in EXCLUDED_COLUMNS.get(name.upper(), ())}
+    return [
+        (row[1], row[2].upper())
+        for row in conn.execute(f"PRAGMA table_info({name})")
+        if row[1].lower() not in excluded
+    ]
+
+
+def batches(cursor, size=EXPORT_ROWS):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+@contextmanager
+def compressed(out, compression):
+    """A binary stream that writes compressed into out, leaving out open."""
+    if compression is None:
+        yield out
+    elif compression == "gzip":
+        with gzip.GzipFile(fileobj=out, mode="wb") as stream:
+            yield stream
+    elif compression == "zstd":
+        with zstandard.ZstdCompressor().stream_writer(out, closefd=False) as stream:
+            yield stream
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+
+
+def write_csv(cursor, columns, out, compression=None, progress=None):
+    done = 0
+    with compressed(out, compression) as stream:
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow([column for column, declared in columns])
+        for rows in batches(cursor):
+            writer.writerows(rows)
+            done += len(rows)
+            if progress:
+                progress(done)
+        text.flush()
+        # Leave the stream open for the compressor to finish
+        text.detach()
+    return done
+
+
+def arrow_type(declared):
+    # SQLite column affinity of the declared type; everything else is text
+    if "INT" in declared:
+        return pa.int64()
+    if any(name in declared for name in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    return pa.string()
+
+
+def write_parquet(cursor, columns, out, compression=None, progress=None):
+    schema = pa.schema([(column, arrow_type(declared)) for column, declared in columns])
+    done = 0
+    with pq.ParquetWriter(out, schema, compression=compression or "none") as writer:
+        for rows in batches(cursor):
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            done += len(rows)
+            if progress:
+                progress(done)
+    return done
+
+
+def select_sql(name, columns, fmt):
+    # Text columns can hold numbers in SQLite; a Parquet string column cannot
+    selected = []
+    for column, declared in columns:
+        expr = EXPORTED_AS.get((name.upper(), column.upper()), f'"{column}"')
+        if fmt == "parquet" and arrow_type(declared) == pa.string():
+            selected.append(f'CAST({expr} AS TEXT) AS "{column}"')
+        elif expr != f'"{column}"':
+            selected.append(f'{expr} AS "{column}"')
+        else:
+            selected.append(expr)
+    return f"SELECT {', '.join(selected)} FROM {name}"
+
+
+def export(name, out, fmt="csv", compression=None, progress=None):
+    """Write table or view name to the binary file object out.
+
+    progress, if given, is called as progress(rows written, total rows)
+    after every batch. Returns the number of rows written.
+    """
+    name = export_name(name)
+    if fmt not in available_formats():
+        raise ValueError(f"Export format {fmt} is not available")
+    if compression not in available_compressions(fmt):
+        raise ValueError(f"Compression {compression} is not available for {fmt}")
+
+    with archive_reads(), get_db_connection() as conn:
+        conn.create_function("history_body", 2, history.decode, deterministic=True)
+        columns = export_columns(conn, name)
+        total = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        report = (lambda done: progress(done, total)) if progress else None
+        cursor = conn.execute(select_sql(name, columns, fmt))
+        try:
+            if fmt == "parquet":
+                return write_parquet(cursor, columns, out, compression, report)
+            return write_csv(cursor, columns, out, compression, report)
+        finally:
+            cursor.close()
+
+
+def export_to_file(name, path, fmt="csv", compression=None, progress=None):
+    # Written under a temporary name, so a failed export leaves no partial file
+    partial = path + ".part"
+    try:
+        with open(partial, "wb") as out:
+            rows = export(name, out, fmt, compression, progress)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export hospital tables and views to CSV or Parquet.")
+    parser.add_argument("names", nargs="*", help="tables or views to export")
+    parser.add_argument("--all", action="store_true", help="export every table and view")
+    parser.add_argument("--format", choices=list(EXTENSIONS), default="csv")
+    parser.add_argument("--compression", choices=["snappy", "gzip", "zstd"], default=None)
+    parser.add_argument("--out-dir", default=EXPORT_DIR, help="directory to write to (default: %(default)s)")
+    args = parser.parse_args()
+
+    names = exportable_objects() if args.all else args.names
+    if not names:
+        parser.error("name at least one table or view, or pass --all")
+    os.makedirs(args.out_dir, exist_ok=True)
+    for name in names:
+        name = export_name(name)
+        path = os.path.join(args.out_dir, export_filename(name, args.format, args.compression))
+
+        def progress(done, total):
+            print(f"\r{name}: {done:,}/{total:,} rows", end="", file=sys.stderr, flush=True)
+
+        rows = export_to_file(name, path, args.format, args.compression, progress)
+        print(f"\r{name}: {rows:,} rows -> {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
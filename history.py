@@ -0,0 +1,74 @@
+# Patients' medical history: an append-only timeline of entries per PAT_ID
+# (PATIENT_HISTORY, see migrations.py). Entries are read newest first, one
+# page at a time, from the (PAT_ID, TS) index, so a page costs the same
+# however long the patient's history has grown.
+#
+# Note bodies of COMPRESS_BYTES or more are stored zlib-compressed when that
+# makes them smaller; HOSPITAL_HISTORY_COMPRESS_BYTES=0 turns this off.
+
+import os
+import zlib
+from datetime import datetime
+
+import pandas as pd
+
+import queries
+from cache import cached_frame
+from db import get_db_connection, get_writer
+
+COMPRESS_BYTES = int(os.environ.get("HOSPITAL_HISTORY_COMPRESS_BYTES", "1024"))
+COMPRESS_LEVEL = 6
+
+# Entries per page of a timeline
+ENTRIES_PAGE = 20
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def encode(text):
+    """(ENCODING, BODY) to store a note as."""
+    data = text.encode("utf-8")
+    if COMPRESS_BYTES and len(data) >= COMPRESS_BYTES:
+        packed = zlib.compress(data, COMPRESS_LEVEL)
+        if len(packed) < len(data):
+            return "zlib", packed
+    return None, text
+
+
+def decode(encoding, body):
+    if encoding == "zlib":
+        return zlib.decompress(body).decode("utf-8")
+    return body
+
+
+def add_entry(pat_id, author, text, ts=None):
+    """Append a note to the patient's history; return its ENTRY_ID.
+
+    Raises sqlite3.IntegrityError if there is no patient pat_id.
+    """
+    encoding, body = encode(text)
+    ts = ts or datetime.now().strftime(TS_FORMAT)
+    params = (pat_id, ts, author, encoding, body)
+    return get_writer().call(lambda conn: conn.execute(queries.INSERT_PATIENT_HISTORY, params).lastrowid)
+
+
+def entries(pat_id, before=None, limit=ENTRIES_PAGE):
+    """A page of the patient's history, newest first: entry_id, ts, author, note.
+
+    before is the (ts, entry_id) of the last entry of the previous page.
+    The result is shared through the query cache; do not modify it.
+    """
+    def read():
+        if before is None:
+            sql, params = queries.PATIENT_HISTORY_LATEST, (pat_id, limit)
+        else:
+            sql, params = queries.PATIENT_HISTORY_BEFORE, (pat_id, *before, limit)
+        with get_db_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return pd.DataFrame(
+            [(entry_id, ts, author, decode(encoding, body)) for entry_id, ts, author, encoding, body in rows],
+            columns=["entry_id", "ts", "author", "note"],
+        )
+
+    key = ("patient_history", pat_id, tuple(before) if before else None, limit)
+    return cached_frame(key, ["PATIENT_HISTORY"], read)
@@ -0,0 +1,6 @@
+# HospitalApp.py's pages, one module per user type (doctor, nurse, cashier,
+# admin), plus the dashboard every signed-in user sees and the pages shown
+# before signing in (public). HospitalApp.py only routes: a module is
+# imported the first time one of its pages is shown, so a rerun of the
+# script no longer defines every page, and a session only loads the
+# modules of the pages it uses.
@@ -0,0 +1,178 @@
+# Admins' pages: data export and the System page's statistics
+import os
+import sqlite3
+from datetime import datetime
+from functools import partial
+
+import pandas as pd
+import streamlit as st
+
+import archive
+import export
+import profiling
+import queries
+import query_stats
+import replica
+from cache import get_cache, read_sql
+from db import get_pool, get_writer
+
+# Exports up to this size can be downloaded from the page; Streamlit holds a
+# download in memory, so larger ones are left on disk for the admin to fetch
+DOWNLOAD_MAX_BYTES = int(os.environ.get("HOSPITAL_EXPORT_DOWNLOAD_MB", "100")) * 1024 * 1024
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@profiling.profiled
+def admin_export():
+    st.markdown("## Export Data")
+
+    # ✅ Any table or view from Hospital.py, streamed to a file in batches
+    name = st.selectbox("Table or view", export.exportable_objects(), key="admin_export_name")
+    cols = st.columns(2)
+    with cols[0]:
+        fmt = st.radio("Format", export.available_formats(), horizontal=True, key="admin_export_format")
+    with cols[1]:
+        compression = st.selectbox("Compression", export.available_compressions(fmt),
+                                   format_func=lambda c: c or "none", key="admin_export_compression")
+
+    if st.button("Export"):
+        os.makedirs(export.EXPORT_DIR, exist_ok=True)
+        path = os.path.join(export.EXPORT_DIR, export.export_filename(name, fmt, compression))
+        bar = st.progress(0.0, text=f"Exporting {name}...")
+
+        def progress(done, total):
+            bar.progress(min(done / total, 1.0) if total else 1.0, text=f"Exporting {name}: {done:,} of {total:,} rows")
+
+        try:
+            rows = export.export_to_file(name, path, fmt, compression, progress)
+        except (ValueError, sqlite3.Error) as e:
+            bar.empty()
+            st.error(f"Export failed: {e}")
+        else:
+            bar.progress(1.0, text=f"Exported {rows:,} rows")
+            st.session_state["admin_export_file"] = path
+
+    # ✅ The finished file stays downloadable across reruns; it is only read
+    # when the button is clicked, and only if it is small enough
+    path = st.session_state.get("admin_export_file")
+    if path and os.path.exists(path):
+        filename, size = os.path.basename(path), os.path.getsize(path)
+        if size <= DOWNLOAD_MAX_BYTES:
+            st.download_button(f"Download {filename} ({size / 1024 / 1024:,.1f} MB)", partial(read_file, path),
+                               file_name=filename)
+        else:
+            st.info(f"{filename} is {size / 1024 / 1024:,.0f} MB, too large to download here. "
+                    f"It was saved on the server as {os.path.abspath(path)}.")
+
+
+@profiling.profiled
+def admin_system():
+    st.markdown("## System")
+
+    stats = query_stats.get_stats()
+    since = datetime.fromtimestamp(stats.since())
+    st.caption(f"Query timings since {since:%Y-%m-%d %H:%M:%S}; statements slower than "
+               f"{stats.slow_seconds * 1000:.0f} ms are logged with their plan.")
+
+    # ✅ Connection pool, writer and result cache
+    pool, writer, cache = get_pool().stats(), get_writer().stats(), get_cache().stats()
+    lookups = cache["hits"] + cache["misses"]
+    cols = st.columns(4)
+    cols[0].metric("Connections in use", f"{pool['in_use']} / {pool['max_size']}")
+    cols[1].metric("Pool wait (avg)", f"{pool['wait_seconds_avg'] * 1000:.1f} ms")
+    cols[2].metric("Writes queued", writer["queued"])
+    cols[3].metric("Cache hit rate", f"{cache['hits'] / lookups:.0%}" if lookups else "–")
+
+    # ✅ The read snapshot used by the dashboard, nurse and billing pages
+    st.markdown("### Read Snapshot")
+    if not replica.ENABLED:
+        st.info("Snapshots are off (HOSPITAL_REPLICA=0); every page reads the primary database.")
+    else:
+        snapshot = replica.get_replica().stats()
+        cols = st.columns(4)
+        cols[0].metric("Lag", f"{snapshot['lag_seconds']:.1f} s" if "lag_seconds" in snapshot else "–")
+        cols[1].metric("Serving", "Snapshot" if snapshot["fresh"] else "Primary")
+        cols[2].metric("Snapshot", snapshot["generation"])
+        cols[3].metric("Last copy", f"{snapshot['copy_seconds'] * 1000:.0f} ms")
+        st.caption(f"Reads fall back to the primary when the snapshot is more than "
+                   f"{snapshot['max_staleness_seconds']:.0f} s behind.")
+        if replica.get_replica().last_error:
+            st.warning(f"The last snapshot failed: {replica.get_replica().last_error}")
+
+    # ✅ Old appointments, procedures and invoices moved to per-year files
+    st.markdown("### Archive")
+    archiver = archive.get_archive()
+    archived = read_sql(queries.ARCHIVE_STATE)
+    years = archiver.years()
+    if archived.empty or not years:
+        st.info("Nothing has been archived yet.")
+    else:
+        st.caption(f"Archive files for {years[0]}–{years[-1]} in {archiver.directory}")
+        st.dataframe(archived)
+    if st.button(f"Archive rows older than {archiver.horizon_days} days"):
+        with st.spinner("Archiving..."):
+            moved = archiver.archive()
+        if moved:
+            st.success("Archived " + "; ".join(
+                f"{year}: " + ", ".join(f"{count:,} {table}" for table, count in counts.items())
+                for year, counts in moved.items()
+            ))
+        else:
+            st.info("Nothing to archive.")
+
+    # ✅ Per query and page, the most total time first
+    st.markdown("### Queries")
+    rows = stats.snapshot()
+    if rows:
+        columns = ["query", "page", "calls", "rows", "total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "slow"]
+        st.dataframe(pd.DataFrame(rows, columns=columns + ["sql"]))
+    else:
+        st.info("No queries recorded yet.")
+
+    st.markdown("### Slow Queries")
+    slow = stats.slow_queries()
+    if not slow:
+        st.info("No slow queries recorded.")
+    for entry in slow:
+        with st.expander(f"{entry['ms']:.1f} ms · {entry['query']} · {entry['page']} · {entry['at']}"):
+            st.code(entry["sql"], language="sql")
+            if entry["params"] is not None:
+                st.write("Parameters:", entry["params"])
+            st.code("\n".join(entry["plan"]) or "(no plan)", language="text")
+
+    cols = st.columns(2)
+    with cols[0]:
+        if st.button("Write metrics file"):
+            try:
+                st.success(f"Metrics written to {query_stats.write_metrics()}")
+            except OSError as e:
+                st.error(f"Could not write the metrics file: {e}")
+    with cols[1]:
+        if st.button("Reset statistics"):
+            stats.reset()
+            profiling.get_profiler().reset()
+            st.rerun()
+
+    # ✅ Render times per page, when the app runs with HOSPITAL_PROFILE set
+    st.markdown("### Render Profile")
+    if not profiling.ENABLED:
+        st.info("Profiling is off. Start the app with HOSPITAL_PROFILE=1, or =cprofile to also collect cProfile stats.")
+        return
+    profile = profiling.get_profiler().snapshot()
+    if profile:
+        st.dataframe(pd.DataFrame(profile))
+    if st.button("Dump profiles"):
+        paths = profiling.get_profiler().dump()
+        st.success(f"Wrote {len(paths)} files to {profiling.PROFILE_DIR}/")
+
+
+# The Admin navigation's pages besides the dashboard
+def show(page, identity):
+    if page == "Export":
+        admin_export()
+    elif page == "System":
+        admin_system()
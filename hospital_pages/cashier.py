@@ -0,0 +1,72 @@
+# Cashiers' pages
+import streamlit as st
+
+import archive
+import billing_reports
+import profiling
+from db import snapshot_reads
+
+
+@profiling.profiled
+@snapshot_reads()
+def cashier_reports():
+    st.markdown("## Billing Reports")
+
+    first, last = billing_reports.billed_days()
+    undated = billing_reports.undated_invoices()
+    if first is None:
+        if undated:
+            st.info(f"None of the {undated:,} invoices has a billing date yet, so there is nothing to report by date.")
+        else:
+            st.info("No invoices have been billed yet.")
+        return
+    if undated:
+        st.caption(f"{undated:,} invoices have no billing date and are left out of these reports.")
+
+    # ✅ Reports cover the invoices billed in the chosen days
+    days = st.date_input("Billed between", value=(first, last), key="cashier_reports_days")
+    if len(days) != 2:
+        st.warning("Please choose the last day of the range.")
+        return
+    start, end = days
+
+    # ✅ Archived invoices in the range are read too (see archive.py)
+    try:
+        archive.get_archive().check_range(start, end)
+    except archive.ArchiveTooWide as e:
+        st.warning(f"{e}. Please choose a shorter range.")
+        return
+
+    # ✅ Each report is shown as soon as it is ready
+    st.markdown("### Revenue by Period")
+    period = st.selectbox("Period", list(billing_reports.PERIOD_FORMATS), index=2, key="cashier_reports_period")
+    with st.spinner("Totalling revenue..."):
+        by_period = billing_reports.revenue_by_period(start, end, period)
+    if by_period.empty:
+        st.warning("No invoices in this range.")
+        return
+    st.bar_chart(by_period["revenue"])
+
+    st.markdown("### Revenue by Item")
+    with st.spinner("Grouping invoices by item..."):
+        st.dataframe(billing_reports.revenue_by_item(start, end))
+
+    st.markdown("### Revenue by Patient Type")
+    with st.spinner("Grouping invoices by patient type..."):
+        by_type = billing_reports.revenue_by_patient_type(start, end)
+    st.bar_chart(by_type["revenue"])
+    st.dataframe(by_type)
+
+    st.markdown(f"### Top {billing_reports.TOP_PATIENTS} Patients")
+    with st.spinner("Finding top patients..."):
+        st.dataframe(billing_reports.top_patients(start, end))
+
+    st.markdown("### Invoice Amounts")
+    with st.spinner("Computing amount percentiles..."):
+        st.dataframe(billing_reports.amount_distribution(start, end))
+
+
+# The Cashier navigation's pages besides the dashboard
+def show(page, identity):
+    if page == "Reports":
+        cashier_reports()
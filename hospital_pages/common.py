@@ -0,0 +1,72 @@
+# Helpers shared by the page modules, and the theme's CSS
+import os
+
+import streamlit as st
+
+import history
+import profiling
+import queries
+from cache import read_sql
+from db import primary_reads
+from identity import resolve_identity
+
+CSS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
+
+# Custom CSS for enhanced UI with blue and sea green theme, read once per
+# process; HospitalApp.main() sends it with every rerun
+with open(CSS_FILE, encoding="utf-8") as f:
+    CUSTOM_CSS = f"<style>\n{f.read()}</style>"
+
+
+def pick_patient(term, state_key):
+    # Patients sharing a name are told apart by ID; returns the chosen PAT_ID
+    query, params = queries.patients_by_name(term)
+    patients = read_sql(query, params)
+    if patients.empty:
+        return None
+    labels = {
+        int(p.PAT_ID): f"{p.FNAME} {p.LNAME} (ID {p.PAT_ID}, {p.PATIENT_TYPE})"
+        for p in patients.itertuples()
+    }
+    return st.selectbox("Patient", list(labels), format_func=labels.get, key=state_key)
+
+
+def patient_history_timeline(pat_id, state_key):
+    # ✅ Newest entries first, a page at a time; older pages start below the last entry shown
+    state = st.session_state.get(state_key)
+    if state is None or state["pat_id"] != pat_id:
+        state = {"pat_id": pat_id, "cursors": [None]}
+        st.session_state[state_key] = state
+    cursors = state["cursors"]
+
+    entries = history.entries(pat_id, cursors[-1], history.ENTRIES_PAGE + 1)
+    more = len(entries) > history.ENTRIES_PAGE
+    entries = entries.iloc[:history.ENTRIES_PAGE]
+    if entries.empty:
+        st.info("No medical history recorded for this patient.")
+        return
+
+    for entry in entries.itertuples():
+        st.markdown(f"**{entry.ts or 'Undated'}** · {entry.author}")
+        st.text(entry.note)
+    first = (len(cursors) - 1) * history.ENTRIES_PAGE
+    st.caption(f"Entries {first + 1}–{first + len(entries)}, newest first")
+    cols = st.columns(2)
+    with cols[0]:
+        if st.button("◀ Newer", key=f"{state_key}_newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with cols[1]:
+        if st.button("Older ▶", key=f"{state_key}_older", disabled=not more):
+            last = entries.iloc[-1]
+            cursors.append((last["ts"], int(last["entry_id"])))
+            st.rerun()
+
+
+# Doctor/nurse/staff IDs of the logged-in user, resolved once per session
+@profiling.profiled
+@primary_reads()
+def session_identity():
+    if st.session_state.get("identity") is None:
+        st.session_state["identity"] = resolve_identity(st.session_state["username"]) or {}
+    return st.session_state["identity"]
@@ -0,0 +1,307 @@
+# The dashboard every signed-in user lands on, and its appointment booking card
+import sqlite3
+from datetime import datetime
+
+import streamlit as st
+
+import metrics
+import profiling
+import queries
+import scheduling
+from cache import read_sql
+from db import WriteTimeout, primary_reads, snapshot_reads
+from hospital_pages.common import session_identity
+
+# Staff, who see the hospital-wide figures and may book appointments
+STAFF_USER_TYPES = ("Admin", "Doctor", "Nurse", "Cashier")
+
+
+# "↑ 2 from yesterday" style change between two figures
+def delta_text(current, previous, period, fmt="{:,}"):
+    change = current - previous
+    if change > 0:
+        return f"↑ {fmt.format(change)} from {period}"
+    if change < 0:
+        return f"↓ {fmt.format(-change)} from {period}"
+    return f"No change from {period}"
+
+
+# Figures come from the daily summary tables
+def metric_cards(doc_id=None):
+    summary = metrics.dashboard_summary(doc_id=doc_id)
+    today_count, yesterday_count = summary["appointments_today"]
+    week_count, last_week_count = summary["appointments_week"]
+    invoices_today, invoices_yesterday = summary["invoices_today"]
+    billed_today, billed_yesterday = summary["billed_today"]
+
+    # Display enhanced metrics based on user type with animation delay
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card fade-in" style="animation-delay: 0.1s; background: linear-gradient(135deg, #0066cc 0%, #0099ff 100%);">
+            <div class="metric-label">Today's Appointments</div>
+            <div class="metric-value">{today_count:,}</div>
+            <div class="metric-delta">{delta_text(today_count, yesterday_count, "yesterday")}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card fade-in" style="animation-delay: 0.2s; background: linear-gradient(135deg, #2E8B57 0%, #3cb371 100%);">
+            <div class="metric-label">Appointments This Week</div>
+            <div class="metric-value">{week_count:,}</div>
+            <div class="metric-delta">{delta_text(week_count, last_week_count, "last week")}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card fade-in" style="animation-delay: 0.3s; background: linear-gradient(135deg, #1a75ff 0%, #00b3b3 100%);">
+            <div class="metric-label">Invoices Today</div>
+            <div class="metric-value">{invoices_today:,}</div>
+            <div class="metric-delta">{delta_text(invoices_today, invoices_yesterday, "yesterday")}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+        <div class="metric-card fade-in" style="animation-delay: 0.4s; background: linear-gradient(135deg, #007399 0%, #2E8B57 100%);">
+            <div class="metric-label">Billed Today</div>
+            <div class="metric-value">${billed_today:,.0f}</div>
+            <div class="metric-delta">{delta_text(billed_today, billed_yesterday, "yesterday", "${:,.0f}")}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+def analytics_overview():
+    st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+    st.markdown('<h3>Analytics Overview</h3>', unsafe_allow_html=True)
+
+    start, end = metrics.chart_window()
+    st.caption(f"{start:%b %d, %Y} – {end:%b %d, %Y}")
+    
+    # Tabs for different charts
+    tab1, tab2, tab3 = st.tabs(["Patient Flow", "Department Stats", "Resource Utilization"])
+    
+    with tab1:
+        # ✅ Daily appointments by patient type
+        flow = metrics.patient_flow(start, end)
+        if flow.empty:
+            st.info("No appointments in this period.")
+        else:
+            st.line_chart(flow)
+        
+    with tab2:
+        # ✅ Appointments per department
+        departments = metrics.department_stats(start, end)
+        if departments.empty:
+            st.info("No appointments in this period.")
+        else:
+            st.bar_chart(departments)
+        
+    with tab3:
+        # ✅ Busiest doctors by appointments
+        load = metrics.doctor_load(start, end)
+        if load.empty:
+            st.info("No appointments in this period.")
+        else:
+            st.bar_chart(load)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+# Enhanced Dashboard components
+@profiling.profiled
+@snapshot_reads()
+def show_dashboard(user_type):
+    st.markdown('<h2 class="subheader">Dashboard</h2>', unsafe_allow_html=True)
+    
+    # Welcome banner
+    st.markdown(f"""
+    <div class="card fade-in" style="background: linear-gradient(135deg, #e6f7ff 0%, #e6ffee 100%);">
+        <h3>Welcome back, {st.session_state["username"]}!</h3>
+        <p>Today is {datetime.now().strftime("%A, %B %d, %Y")}. Here's your daily overview.</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Hospital-wide figures are for staff; doctors see their own appointments
+    staff = is_staff()
+    doc_id = session_identity().get("doc_id") if user_type == "Doctor" else None
+    if staff:
+        metric_cards(doc_id)
+
+    # Two column layout for charts and activity
+    col_left, col_right = st.columns([2, 1])
+    
+    with col_left:
+        if staff:
+            analytics_overview()
+
+        # Quick action buttons
+        st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+        st.markdown('<h3>Quick Actions</h3>', unsafe_allow_html=True)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            # ✅ Opens the booking card below, for staff only
+            if can_book() and st.button("Schedule Appointment", use_container_width=True):
+                st.session_state["scheduling"] = not st.session_state.get("scheduling", False)
+        with col2:
+            st.button("Patient Lookup", use_container_width=True)
+        with col3:
+            st.button("Create Report", use_container_width=True)
+        with col4:
+            st.button("System Settings", use_container_width=True)
+            
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        if st.session_state.get("scheduling") and can_book():
+            schedule_appointment()
+    
+    with col_right:
+        # Recent activity
+        st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+        st.markdown('<h3>Recent Activity</h3>', unsafe_allow_html=True)
+        
+        # Sample activities based on user type
+        activities = {
+            "Patient": [
+                {"time": "10:30 AM", "text": "Appointment scheduled with Dr. Smith for March 20, 2025"},
+                {"time": "Yesterday", "text": "Medical report uploaded"},
+                {"time": "Mar 10", "text": "Payment completed for prescription"}
+            ],
+            "Doctor": [
+                {"time": "1 hour ago", "text": "Patient consultation with John Doe"},
+                {"time": "3 hours ago", "text": "Lab results received for patient #12345"},
+                {"time": "Yesterday", "text": "Treatment plan updated for patient #54321"}
+            ],
+            "Admin": [
+                {"time": "2 hours ago", "text": "New doctor onboarded: Dr. Johnson"},
+                {"time": "Yesterday", "text": "System maintenance scheduled for March 25"},
+                {"time": "Mar 15", "text": "Monthly patient statistics generated"}
+            ],
+            "Nurse": [
+                {"time": "30 mins ago", "text": "Medication administered to room 302"},
+                {"time": "2 hours ago", "text": "Vital signs recorded for patient #67890"},
+                {"time": "Yesterday", "text": "Shift handover completed"}
+            ],
+            "Cashier": [
+                {"time": "1 hour ago", "text": "Payment received from patient #12345"},
+                {"time": "3 hours ago", "text": "Insurance claim submitted for patient #54321"},
+                {"time": "Yesterday", "text": "Monthly billing report generated"}
+            ]
+        }
+        
+        default_activities = [
+            {"time": datetime.now().strftime("%H:%M"), "text": "Login detected"},
+            {"time": "Today", "text": "System accessed"},
+            {"time": "Today", "text": "Welcome to Hospital Management System"}
+        ]
+        
+        for activity in activities.get(user_type, default_activities):
+            st.markdown(f"""
+            <div class="activity-item">
+                <div class="activity-time">{activity['time']}</div>
+                <div class="activity-text">{activity['text']}</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Upcoming appointments, for staff only: the list names patients
+        if staff:
+            st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+            st.markdown('<h3>Upcoming Appointments</h3>', unsafe_allow_html=True)
+        
+            # ✅ The next week's appointments, by start time
+            upcoming = metrics.upcoming_appointments(doc_id=doc_id)
+            if upcoming.empty:
+                st.info(f"No appointments in the next {metrics.UPCOMING_DAYS} days.")
+        
+            for appt in upcoming.itertuples():
+                start_time = datetime.fromisoformat(appt.start_ts)
+                text = f"{appt.fname} {appt.lname}"
+                if getattr(appt, "doc_name", None):
+                    text += f" with Dr. {appt.doc_name}"
+                st.markdown(f"""
+                <div class="activity-item" style="border-left-color: #0066cc;">
+                    <div class="activity-time">{start_time:%b %d, %H:%M}</div>
+                    <div class="activity-text">{text}</div>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            st.markdown('</div>', unsafe_allow_html=True)
+
+
+# The user type comes from the signed-in session, which the browser cannot change
+def is_staff():
+    return bool(st.session_state.get("logged_in")) and st.session_state.get("user_type") in STAFF_USER_TYPES
+
+
+# Staff may book appointments for any patient; patients may not
+def can_book():
+    return is_staff()
+
+
+@profiling.profiled
+@primary_reads()
+def schedule_appointment():
+    if not can_book():
+        return
+    st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+    st.markdown('<h3>Schedule Appointment</h3>', unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        pat_id = st.number_input("Patient ID", min_value=1, step=1, key="schedule_pat_id")
+        by = st.radio("Find a doctor by", ["Specialization", "Department"], horizontal=True, key="schedule_by")
+        if by == "Specialization":
+            specializations = read_sql(queries.SPECIALIZATIONS)["SPECIALIZATION"].tolist()
+            specialization = st.selectbox("Specialization", specializations, key="schedule_specialization")
+            dept_id = None
+        else:
+            departments = read_sql(queries.DEPARTMENTS)
+            names = {int(dept): name for dept, name in zip(departments["DEPT_ID"], departments["DEPT_NAME"])}
+            dept_id = st.selectbox("Department", list(names), format_func=names.get, key="schedule_dept")
+            specialization = None
+    with col2:
+        minutes = st.selectbox("Duration (minutes)", [15, 30, 45, 60, 90, 120], index=1, key="schedule_minutes")
+        day = st.date_input("Earliest date", datetime.now().date(), key="schedule_day")
+
+    # ✅ Earliest free slots across the doctors, from the in-memory schedule
+    if st.button("Find Slots"):
+        doctors = scheduling.doctors_for(specialization=specialization, dept_id=dept_id)
+        after = max(datetime.now(), datetime.combine(day, datetime.min.time()))
+        st.session_state["schedule_slots"] = scheduling.free_slots(doctors, after, minutes)
+        if not doctors:
+            st.warning("No doctors found.")
+
+    slots = st.session_state.get("schedule_slots")
+    if slots is not None:
+        if not slots:
+            st.info(f"No free slots in the next {scheduling.SEARCH_DAYS} days.")
+        else:
+            slot = st.selectbox(
+                "Available slots", slots, key="schedule_slot",
+                format_func=lambda slot: f"{slot[0]:%a %b %d, %H:%M}–{slot[1]:%H:%M} with Dr. {slot[3]}",
+            )
+            if st.button("Book Appointment"):
+                start, end, doc_id, doc_name = slot
+                # ✅ The role is checked again right before the write
+                if not can_book():
+                    st.error("Only staff can book appointments.")
+                else:
+                    try:
+                        appt_id = scheduling.book(doc_id, int(pat_id), start, int((end - start).total_seconds() // 60))
+                    except scheduling.SlotTaken:
+                        st.error("That slot was just taken. Please search again.")
+                    except sqlite3.IntegrityError:
+                        st.error(f"No patient with ID {int(pat_id)}.")
+                    except WriteTimeout:
+                        st.error("The booking is taking longer than usual. Check the patient's appointments before booking again.")
+                    else:
+                        st.success(f"Appointment {appt_id} booked with Dr. {doc_name} on {start:%b %d at %H:%M}.")
+                st.session_state.pop("schedule_slots", None)
+
+    st.markdown('</div>', unsafe_allow_html=True)
@@ -0,0 +1,119 @@
+# Doctors' pages: their appointments, assigned patients and medical records
+from datetime import timedelta
+
+import streamlit as st
+
+import archive
+import history
+import profiling
+import queries
+from db import WriteTimeout, archive_reads
+from hospital_pages.common import patient_history_timeline, pick_patient
+from pagination import paginated_dataframe
+
+
+@profiling.profiled
+def doctor_appointments(doctor_id):
+    st.markdown('<div class="centered">', unsafe_allow_html=True)
+    st.markdown("## Appointments")
+
+    # ✅ `doc_id` was resolved from the login once, at sign-in
+    if doctor_id is None:
+        st.error("No doctor ID found for this user!")
+        return
+    
+    st.write("Doctor ID →", doctor_id)
+
+    # ✅ Optional date range; either end may be left blank
+    cols = st.columns(2)
+    with cols[0]:
+        start_day = st.date_input("From", value=None, key="doctor_appointments_from")
+    with cols[1]:
+        end_day = st.date_input("To", value=None, key="doctor_appointments_to")
+    end = end_day + timedelta(days=1) if end_day else None
+
+    # ✅ Fetch appointments a page at a time using the correct `doc_id`,
+    # archived ones included (see archive.py)
+    query, params = queries.doctor_appointments(doctor_id, start_day, end)
+    try:
+        with archive_reads(start_day, end):
+            total = paginated_dataframe(query, params, "appt_id", "doctor_appointments_page",
+                                        sort_options=["start_ts", "appt_id", "lname", "fname"])
+    except archive.ArchiveTooWide as e:
+        st.error(f"{e}. Please choose a shorter date range.")
+        return
+
+    if total == 0:
+        st.warning("No appointments found.")
+
+
+@profiling.profiled
+def doctor_patients(doctor_id):
+    st.markdown('<div class="centered">', unsafe_allow_html=True)
+    st.markdown("## Assigned Patients")
+
+    # ✅ `doc_id` was resolved from the login once, at sign-in
+    if doctor_id is None:
+        st.error("No doctor ID found for this user!")
+        return
+    
+    st.write("Doctor ID →", doctor_id)
+
+    # ✅ Fetch assigned patients a page at a time (DISTINCT in SQL keeps them unique),
+    # from archived appointments too
+    try:
+        with archive_reads():
+            total = paginated_dataframe(queries.DOCTOR_PATIENTS, [doctor_id], "pat_id", "doctor_patients_page",
+                                        sort_options=["pat_id", "lname", "fname"])
+    except archive.ArchiveTooWide as e:
+        st.error(str(e))
+        return
+
+    if total == 0:
+        st.warning("No assigned patients found.")
+
+
+@profiling.profiled
+def medical_records(doctor_id):
+    st.markdown('<div class="centered">', unsafe_allow_html=True)
+    st.markdown("## Medical Records", unsafe_allow_html=True)
+
+    patient_name = st.text_input("Search Patient by Name", key=f"patient_search_{doctor_id}")
+    if st.button("Search"):
+        st.session_state["records_search"] = patient_name.strip() or None
+    patient_name = st.session_state.get("records_search")
+    if not patient_name:
+        return
+
+    # ✅ The patient, by ID: same-named patients keep separate histories
+    pat_id = pick_patient(patient_name, "records_patient")
+    if pat_id is None:
+        st.warning("No matching patient found in records.")
+        return
+
+    updated_notes = st.text_area("Add to Medical History")
+    if st.button("Save Entry"):
+        if not updated_notes.strip():
+            st.warning("Cannot save empty notes!")
+        else:
+            # ✅ Appended to the patient's history with its author and time
+            try:
+                history.add_entry(pat_id, st.session_state["username"], updated_notes)
+            except WriteTimeout:
+                st.error("Saving is taking longer than usual. Check the history below before saving again.")
+            else:
+                st.session_state.pop("records_history", None)
+                st.success("Medical record updated successfully!")
+
+    st.subheader("Medical History")
+    patient_history_timeline(pat_id, "records_history")
+
+
+# The Doctor navigation's pages besides the dashboard
+def show(page, identity):
+    if page == "Appointments":
+        doctor_appointments(identity.get("doc_id"))
+    elif page == "Medical Records":
+        medical_records(st.session_state["username"])
+    elif page == "Patients":
+        doctor_patients(identity.get("doc_id"))
@@ -0,0 +1,129 @@
+# Nurses' pages, over the patients assigned to them, or over every patient
+# for a nurse with none assigned
+import streamlit as st
+
+import profiling
+import queries
+from cache import read_sql
+from db import snapshot_reads
+from hospital_pages.common import patient_history_timeline, pick_patient
+from pagination import paginated_dataframe
+
+# Until the hospital sends a feed of assignments, NURSE_ASSIGNMENT is only
+# filled by the loader's --sample-data; a nurse with no assigned patients
+# searches all patients by name, as these pages did before assignments
+UNASSIGNED_NOTE = (
+    "No patients are assigned to you. Assignments are loaded into NURSE_ASSIGNMENT "
+    "(for now only by `python Hospital.py --sample-data`); until then, search any patient by name."
+)
+
+
+def has_assignments(nurse_id):
+    return not read_sql(queries.NURSE_HAS_ASSIGNMENTS, (nurse_id,)).empty
+
+
+@profiling.profiled
+@snapshot_reads()
+def nurse_appointments(nurse_id):
+    st.markdown("## 🏥 My Patients’ Appointments")
+    if nurse_id is None:
+        return
+
+    assigned = has_assignments(nurse_id)
+    if not assigned:
+        st.info(UNASSIGNED_NOTE)
+
+    # 🔍 Filter by patient name, optional for a nurse with assigned patients
+    search_name = st.text_input("Enter Patient's Name")
+
+    # ✅ Keep the search across reruns so the result pages can be flipped
+    if st.button("Search"):
+        st.session_state["nurse_appointments_search"] = search_name
+    search_name = st.session_state.get("nurse_appointments_search")
+
+    if assigned:
+        # ✅ Appointments of the patients assigned to this nurse
+        query, params = queries.nurse_appointments(nurse_id, search_name)
+    elif search_name and search_name.strip():
+        query, params = queries.patient_appointments(search_name)
+    else:
+        return
+    total = paginated_dataframe(query, params, "appt_id", "nurse_appointments_page",
+                                sort_options=["appt_id", "start_ts", "patient_name"])
+
+    if total == 0:
+        if search_name:
+            st.warning("⚠️ No appointments found for this patient.")
+        else:
+            st.info("No appointments for your assigned patients.")
+
+
+@profiling.profiled
+@snapshot_reads()
+def nurse_patient_history():
+    st.markdown("## Search Patient History")
+
+    # ✅ Input field for searching by patient name
+    search_name = st.text_input("Enter Patient's Name")
+
+    # ✅ Search button
+    if st.button("Search"):
+        if search_name.strip():  # Ensures the input is not empty
+            st.session_state["nurse_history_search"] = search_name
+        else:
+            st.session_state["nurse_history_search"] = None
+            st.warning("Please enter a patient's name before searching.")
+    search_name = st.session_state.get("nurse_history_search")
+
+    if search_name is not None:
+        pat_id = pick_patient(search_name, "nurse_history_patient")
+        if pat_id is None:
+            st.warning("No matching patient found.")
+        else:
+            patient_history_timeline(pat_id, "nurse_history_page")
+
+
+@profiling.profiled
+@snapshot_reads()
+def nurse_search_doctor(nurse_id):
+    st.markdown("## My Patients’ Doctors")
+    if nurse_id is None:
+        return
+
+    assigned = has_assignments(nurse_id)
+    if not assigned:
+        st.info(UNASSIGNED_NOTE)
+
+    # ✅ Filter by patient name, optional for a nurse with assigned patients
+    search_name = st.text_input("Enter Patient's Name")
+
+    if st.button("Search"):
+        st.session_state["nurse_doctor_search"] = search_name
+    search_name = st.session_state.get("nurse_doctor_search")
+
+    if assigned:
+        query, params = queries.nurse_search_doctor(nurse_id, search_name)
+    elif search_name and search_name.strip():
+        query, params = queries.patient_doctors(search_name)
+    else:
+        return
+    total = paginated_dataframe(query, params, ("pat_id", "doc_id"), "nurse_doctor_page",
+                                sort_options=["pat_id", "doc_name"])
+
+    if total == 0:
+        st.warning("No doctor found for this patient." if search_name else "No doctors for your assigned patients.")
+
+
+# The Nurse navigation's pages besides the dashboard
+def show(page, identity):
+    nurse_id = identity.get("nurse_id")
+
+    if nurse_id is None:
+        st.error("❌ No matching Nurse found!")
+
+    if page == "Assigned Doctor":
+        nurse_search_doctor(nurse_id)  # ✅ Doctors of the nurse's assigned patients
+    elif page == "Appointments":
+        nurse_appointments(nurse_id)  # ✅ Appointments of the nurse's assigned patients
+    elif page == "Medical Records":
+        nurse_patient_history()
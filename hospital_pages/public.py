@@ -0,0 +1,184 @@
+# Pages shown before signing in: login and registration, About and Contact Us
+import sqlite3
+
+import streamlit as st
+
+import profiling
+import queries
+from db import WriteTimeout, execute_write, get_db_connection, submit_write
+from identity import is_staff_member, resolve_identity
+from passwords import PasswordPoolBusy, get_password_pool, needs_rehash
+
+
+# Hash password with salted scrypt on the shared password pool
+def hash_password(password):
+    return get_password_pool().hash(password)
+
+
+# Replace a legacy or outdated hash once the password is known to be right
+def rehash_password(username, password, stored):
+    def save(future):
+        if future.exception() is None:
+            # Only if the hash has not changed in the meantime
+            submit_write(queries.UPDATE_PASSWORD, (future.result(), username, stored))
+
+    try:
+        get_password_pool().hash_async(password).add_done_callback(save)
+    except PasswordPoolBusy:
+        pass  # Try again at the next login
+
+
+# Authenticate login credentials
+@profiling.profiled
+def login(username, password):
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute(queries.LOGIN, (username,))
+        result = c.fetchone()
+
+    stored = result[0] if result is not None else None
+    if get_password_pool().verify(password, stored):
+        if needs_rehash(stored):
+            rehash_password(username, password, stored)
+        return True, result[1]  # Return True and user_type
+    return False, None
+
+
+# User Authentication Page
+@profiling.profiled
+def user_authentication_page():
+    st.markdown('<h1 class="main-header">User Authentication</h1>', unsafe_allow_html=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+        st.markdown('<h2 class="subheader">Login</h2>', unsafe_allow_html=True)
+        
+        with st.form("login_form"):
+            username = st.text_input("Username", placeholder="Enter your username")
+            password = st.text_input("Password", type="password", placeholder="Enter your password")
+            col_btn1, col_btn2 = st.columns([1, 2])
+            with col_btn1:
+                submitted = st.form_submit_button("Login", use_container_width=True)
+
+            if submitted:
+                try:
+                    success, user_type = login(username, password)
+                except PasswordPoolBusy:
+                    st.markdown('<div class="warning-box">Too many people are signing in right now. Please try again in a moment.</div>', unsafe_allow_html=True)
+                    success, user_type = None, None
+                if success:
+                    st.session_state.update({
+                        "logged_in": True, 
+                        "username": username,
+                        "user_type": user_type,
+                        "identity": resolve_identity(username) or {}
+                    })
+                    st.markdown('<div class="success-box">Login successful!</div>', unsafe_allow_html=True)
+                    st.rerun()
+                elif success is not None:
+                    st.markdown('<div class="warning-box">Invalid credentials. Please try again.</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+        st.markdown('<h2 class="subheader">Register</h2>', unsafe_allow_html=True)
+        
+        with st.form("register_form"):
+            username = st.text_input("Username", placeholder="Choose a username", key="reg_username")
+            email = st.text_input("Email", placeholder="Enter your email address")
+            password = st.text_input("Password", type="password", placeholder="Create a password", key="reg_password")
+            confirm_password = st.text_input("Confirm Password", type="password", placeholder="Confirm your password")
+            user_type = st.selectbox("User Type", ("Patient", "Admin", "Doctor", "Nurse", "Cashier"))
+            col_btn1, col_btn2 = st.columns([1, 2])
+            with col_btn1:
+                submitted = st.form_submit_button("Sign Up", use_container_width=True)
+
+            if submitted:
+                if password != confirm_password:
+                    st.markdown('<div class="warning-box">Passwords do not match.</div>', unsafe_allow_html=True)
+                else:
+                    register_newuser(username, password, email, user_type)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+
+# Register new user in the database
+def register_newuser(username, password, email, user_type):
+    if not username or not email or not password:
+        st.markdown('<div class="warning-box">All fields are required.</div>', unsafe_allow_html=True)
+        return
+
+    # If user is not a Patient, check if they exist in Admin or Staff table
+    if user_type != "Patient":
+        if not is_staff_member(username):
+            st.markdown(f'<div class="warning-box">{user_type}s must already exist in the system. Contact Admin.</div>', unsafe_allow_html=True)
+            return
+
+    # Insert user through the serialized writer
+    try:
+        execute_write(queries.INSERT_USER, (username, hash_password(password), email, user_type))
+        st.markdown('<div class="success-box">User registered successfully! Please log in.</div>', unsafe_allow_html=True)
+    except sqlite3.IntegrityError:
+        st.markdown('<div class="warning-box">Username already exists. Try a different one.</div>', unsafe_allow_html=True)
+    except PasswordPoolBusy:
+        st.markdown('<div class="warning-box">Too many people are signing up right now. Please try again in a moment.</div>', unsafe_allow_html=True)
+    except WriteTimeout:
+        st.markdown('<div class="warning-box">Registration is taking longer than usual. Try logging in shortly before registering again.</div>', unsafe_allow_html=True)
+
+
+@profiling.profiled
+def about_page():
+    st.markdown('<h2 class="subheader">About Us</h2>', unsafe_allow_html=True)
+    st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+    st.markdown("""
+    ### Welcome to Our Hospital Management System
+    
+    Our Hospital Management System is designed to streamline healthcare operations and improve patient care through efficient digital management of hospital resources, appointments, and records.
+    
+    **Key Features:**
+    - Patient record management
+    - Appointment scheduling
+    - Billing and payment processing
+    - Staff management
+    - Report generation
+    """)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+@profiling.profiled
+def contact_page():
+    st.markdown('<h2 class="subheader">Contact Us</h2>', unsafe_allow_html=True)
+    st.markdown('<div class="card fade-in">', unsafe_allow_html=True)
+    st.markdown("""
+    ### Get in Touch
+    
+    **Email:** support@hospital.com  
+    **Phone:** (555) 123-4567  
+    **Address:** 123 Medical Center Blvd, Healthcare City
+    
+    **Hours of Operation:**  
+    Monday - Friday: 8:00 AM - 6:00 PM  
+    Saturday: 9:00 AM - 1:00 PM  
+    Sunday: Closed
+    """)
+    
+    with st.form("contact_form"):
+        name = st.text_input("Your Name")
+        email = st.text_input("Your Email")
+        message = st.text_area("Message")
+        submitted = st.form_submit_button("Send Message")
+        
+        if submitted:
+            st.success("Message sent! We'll get back to you soon.")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+# The signed-out navigation's pages
+def show(page):
+    if page == "User Authentication":
+        user_authentication_page()
+    elif page == "About":
+        about_page()
+    elif page == "Contact Us":
+        contact_page()
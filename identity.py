@@ -0,0 +1,31 @@
+import queries
+from db import get_db_connection
+from migrations import IDENTITY_COLUMNS, IDENTITY_SELECT
+
+
+def resolve_identity(username):
+    """Return the doc_id, nurse_id and staff_id mapped to a login.
+
+    Any of them is None when the user has no such record; the result is
+    None when the user is not in USER_IDENTITY at all.
+    """
+    with get_db_connection() as conn:
+        row = conn.execute(queries.IDENTITY_BY_USERNAME, (username,)).fetchone()
+    if row is None:
+        return None
+    return {"doc_id": row[0], "nurse_id": row[1], "staff_id": row[2]}
+
+
+# Staff and admins may only register under a name already on file. Names
+# are compared trimmed and case-insensitively, through expression indexes.
+def is_staff_member(username):
+    with get_db_connection() as conn:
+        row = conn.execute(queries.STAFF_MEMBER, (username, username)).fetchone()
+    return row is not None
+
+
+# Rebuild the whole mapping, e.g. after a load changed DOCTOR, NURSE or STAFF.
+# Registrations keep it current on their own through the USER_DATA trigger.
+def refresh_identity_map(conn):
+    conn.execute("DELETE FROM USER_IDENTITY")
+    conn.execute(f"INSERT OR REPLACE INTO USER_IDENTITY ({IDENTITY_COLUMNS}) {IDENTITY_SELECT}")
@@ -0,0 +1,159 @@
+# Change detection for incremental loads of the CSV feeds.
+#
+# LOAD_STATE records how many bytes of each file have been loaded and a
+# checksum of those bytes. A file whose checksum is unchanged is skipped, and
+# a file that only grew past the loaded bytes is read from that offset on.
+# Any other file is read in full, and LOAD_ROW_HASH, a content hash per row
+# key, limits the writes to the rows that are new or changed.
+#
+# As in a full load, which inserts with INSERT OR IGNORE, the first row of a
+# key in the file is the one kept: later rows with the same key are skipped
+# rather than written over it.
+
+import hashlib
+from datetime import datetime, timezone
+
+READ_BLOCK = 1024 * 1024
+
+# Keys looked up per query, well below SQLite's limit on host parameters
+LOOKUP_BATCH = 500
+
+# Joins a row's fields for hashing
+_FIELD_SEP = "\x1f"
+
+SAVE_STATE = """
+INSERT INTO LOAD_STATE (file, table_name, byte_offset, checksum, loaded_at, rows_inserted, rows_updated)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (file) DO UPDATE SET
+    table_name = excluded.table_name, byte_offset = excluded.byte_offset,
+    checksum = excluded.checksum, loaded_at = excluded.loaded_at,
+    rows_inserted = excluded.rows_inserted, rows_updated = excluded.rows_updated
+"""
+
+SAVE_ROW_HASH = """
+INSERT INTO LOAD_ROW_HASH (table_name, row_key, hash) VALUES (?, ?, ?)
+ON CONFLICT (table_name, row_key) DO UPDATE SET hash = excluded.hash
+"""
+
+
+def file_checksum(path, prefix_bytes=None):
+    """Return (size, checksum of the file, checksum of its first prefix_bytes).
+
+    The prefix checksum is None when the file is shorter than prefix_bytes.
+    """
+    digest = hashlib.sha256()
+    prefix = digest.hexdigest() if prefix_bytes == 0 else None
+    size = 0
+    with open(path, "rb") as file:
+        while True:
+            want = READ_BLOCK
+            if prefix is None and prefix_bytes is not None:
+                want = min(want, prefix_bytes - size)
+            block = file.read(want)
+            if not block:
+                break
+            digest.update(block)
+            size += len(block)
+            if prefix is None and size == prefix_bytes:
+                prefix = digest.hexdigest()
+    return size, digest.hexdigest(), prefix
+
+
+def plan_load(conn, path):
+    """Decide how much of a feed to read.
+
+    Returns (offset, size, checksum): offset is None when the file has not
+    changed since it was last loaded, the loaded byte count when it has only
+    been appended to, and 0 when it has to be read in full.
+    """
+    state = conn.execute("SELECT byte_offset, checksum FROM LOAD_STATE WHERE file = ?", (path,)).fetchone()
+    if state is None:
+        size, checksum, _ = file_checksum(path)
+        return 0, size, checksum
+    loaded_bytes, loaded_checksum = state
+    size, checksum, prefix = file_checksum(path, loaded_bytes)
+    if size == loaded_bytes and checksum == loaded_checksum:
+        return None, size, checksum
+    if size > loaded_bytes and prefix == loaded_checksum:
+        return loaded_bytes, size, checksum
+    return 0, size, checksum
+
+
+def save_state(conn, path, table_name, size, checksum, inserted=0, updated=0):
+    loaded_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    conn.execute(SAVE_STATE, (path, table_name, size, checksum, loaded_at, inserted, updated))
+
+
+def table_key(conn, table_name):
+    """Columns of the table's primary key, or else of its first UNIQUE constraint."""
+    info = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+    key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    if key:
+        return key
+    for seq, name, unique, origin, partial in conn.execute(f"PRAGMA index_list({table_name})").fetchall():
+        if unique and origin == "u":
+            return [row[2] for row in conn.execute(f"PRAGMA index_info({name})")]
+    return None
+
+
+def update_sql(table_name, columns, key):
+    """UPDATE of a row by its key that only writes a row whose values differ.
+
+    Returns (sql, positions): the statement, and the positions in a row of
+    its parameters. sql is None when every column is part of the key.
+    """
+    updates = [column for column in columns if column not in key]
+    if not updates:
+        return None, []
+    sql = (
+        f"UPDATE {table_name} SET {', '.join(f'{column} = ?' for column in updates)} "
+        f"WHERE {' AND '.join(f'{column} = ?' for column in key)} "
+        f"AND ({' OR '.join(f'{column} IS NOT ?' for column in updates)})"
+    )
+    positions = [columns.index(column) for column in updates + list(key) + updates]
+    return sql, positions
+
+
+def hash_rows(key_positions, rows):
+    # (row, key, hash) for each parsed row; runs in the parser processes
+    keyed = []
+    for row in rows:
+        key = _FIELD_SEP.join(row[i] if i < len(row) else "" for i in key_positions)
+        digest = hashlib.blake2b(_FIELD_SEP.join(row).encode("utf-8"), digest_size=16).digest()
+        keyed.append((row, key, digest))
+    return keyed
+
+
+def first_rows(keyed, seen):
+    """Keep the (row, key, hash) entries whose key is not in seen, adding theirs.
+
+    seen holds the keys read so far from the file, one entry per distinct key.
+    """
+    first = []
+    for entry in keyed:
+        if entry[1] not in seen:
+            seen.add(entry[1])
+            first.append(entry)
+    return first
+
+
+def changed_rows(conn, table_name, keyed, appended=False):
+    """Split (row, key, hash) entries into (changed, unchanged, earlier).
+
+    changed are the entries whose hash differs from the stored one, and
+    unchanged counts the others. In a tail appended to a loaded file, a key
+    with a stored hash came earlier in the file, so its row is skipped and
+    counted in earlier instead.
+    """
+    stored = {}
+    for i in range(0, len(keyed), LOOKUP_BATCH):
+        keys = [key for row, key, digest in keyed[i:i + LOOKUP_BATCH]]
+        stored.update(conn.execute(
+            f"SELECT row_key, hash FROM LOAD_ROW_HASH WHERE table_name = ? AND row_key IN ({', '.join(['?' for _ in keys])})",
+            [table_name, *keys],
+        ))
+    if appended:
+        changed = [entry for entry in keyed if entry[1] not in stored]
+        return changed, 0, len(keyed) - len(changed)
+    changed = [entry for entry in keyed if stored.get(entry[1]) != entry[2]]
+    return changed, len(keyed) - len(changed), 0
@@ -0,0 +1,101 @@
+# Dashboard figures, read from the daily summary tables that triggers keep
+# current (see migrations.create_aggregates). Every call reads a few summary
+# rows, however large APPOINTMENT and Billing grow.
+
+from datetime import date, datetime, timedelta
+
+import queries
+from cache import read_sql
+
+# Days shown in the dashboard charts
+CHART_DAYS = 30
+
+# How far ahead, and how many, upcoming appointments the dashboard lists
+UPCOMING_DAYS = 7
+UPCOMING_LIMIT = 5
+
+
+def appointment_count(start, end, doc_id=None):
+    """Appointments from start to end (dates, inclusive), for one doctor or all."""
+    if doc_id is None:
+        df = read_sql(queries.APPOINTMENTS_BETWEEN, [start.isoformat(), end.isoformat()])
+    else:
+        df = read_sql(queries.DOCTOR_APPOINTMENTS_BETWEEN, [doc_id, start.isoformat(), end.isoformat()])
+    return int(df.iloc[0, 0])
+
+
+def billing_totals(start, end):
+    """(invoices, amount billed) from start to end, inclusive."""
+    df = read_sql(queries.BILLING_BETWEEN, [start.isoformat(), end.isoformat()])
+    return int(df.iloc[0, 0]), float(df.iloc[0, 1])
+
+
+def dashboard_summary(today=None, doc_id=None):
+    """Today's and this week's figures, each paired with the period before.
+
+    Returns {name: (current, previous)}. With doc_id, appointment figures
+    are for that doctor only.
+    """
+    today = today or date.today()
+    yesterday = today - timedelta(days=1)
+    week_start = today - timedelta(days=6)
+    last_week_start = week_start - timedelta(days=7)
+    invoices_today, billed_today = billing_totals(today, today)
+    invoices_yesterday, billed_yesterday = billing_totals(yesterday, yesterday)
+    return {
+        "appointments_today": (appointment_count(today, today, doc_id), appointment_count(yesterday, yesterday, doc_id)),
+        "appointments_week": (
+            appointment_count(week_start, today, doc_id),
+            appointment_count(last_week_start, week_start - timedelta(days=1), doc_id),
+        ),
+        "invoices_today": (invoices_today, invoices_yesterday),
+        "billed_today": (billed_today, billed_yesterday),
+    }
+
+
+def chart_window(today=None, days=CHART_DAYS):
+    """(start, end) of the charted period: the last `days` days with activity.
+
+    It ends today, or on the latest earlier day with appointments when
+    there are none this period, so the charts are not empty after a quiet
+    spell or for historical data.
+    """
+    today = today or date.today()
+    latest = read_sql(queries.LATEST_APPOINTMENT_DAY, [today.isoformat()]).iloc[0, 0]
+    end = date.fromisoformat(latest) if latest else today
+    if (today - end).days < days:
+        end = today
+    return end - timedelta(days=days - 1), end
+
+
+def patient_flow(start, end):
+    """Daily appointments by patient type, one column per type."""
+    df = read_sql(queries.PATIENT_FLOW, [start.isoformat(), end.isoformat()])
+    if df.empty:
+        return df
+    flow = df.pivot(index="day", columns="patient_type", values="appointments").fillna(0)
+    flow.index = flow.index.astype("datetime64[ns]")
+    return flow
+
+
+def department_stats(start, end):
+    return read_sql(queries.DEPARTMENT_STATS, [start.isoformat(), end.isoformat()]).set_index("department")
+
+
+def doctor_load(start, end):
+    return read_sql(queries.DOCTOR_LOAD, [start.isoformat(), end.isoformat()]).set_index("doctor")
+
+
+def upcoming_appointments(now=None, doc_id=None, days=UPCOMING_DAYS, limit=UPCOMING_LIMIT):
+    """The next appointments from now, soonest first, for one doctor or all.
+
+    Reads APPOINTMENT directly, by START_TS, rather than a summary table.
+    """
+    # Whole minutes, so reruns within a minute share a cached result
+    now = (now or datetime.now()).replace(second=0, microsecond=0)
+    end = now + timedelta(days=days)
+    if doc_id is None:
+        sql, params = queries.appointments_in_range(now, end)
+    else:
+        sql, params = queries.doctor_appointments(doc_id, now, end)
+    return read_sql(*queries.page_sql(sql, params, "appt_id", sort="start_ts", limit=limit))
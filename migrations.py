@@ -0,0 +1,623 @@
+# Secondary indexes for the access paths used by HospitalApp.py.
+# (table, index name, indexed columns)
+INDEXES = (
+    # doctor_appointments / doctor_patients: WHERE doc_id = ? joined to PATIENT
+    ("APPOINTMENT", "idx_appointment_doc_pat", "DOC_ID, PAT_ID"),
+    # Paged doctor appointments: (DOC_ID, APPT_ID) order, so a page is a range seek
+    ("APPOINTMENT", "idx_appointment_doc", "DOC_ID"),
+    # Appointment date ranges, for one doctor and for everyone (START_TS below)
+    ("APPOINTMENT", "idx_appointment_doc_start", "DOC_ID, START_TS"),
+    ("APPOINTMENT", "idx_appointment_start", "START_TS"),
+    # Patient -> Appointment joins in the nurse pages
+    ("APPOINTMENT", "idx_appointment_pat", "PAT_ID"),
+    # Nurses of a patient (a nurse's patients are the primary key)
+    ("NURSE_ASSIGNMENT", "idx_nurse_assignment_pat", "PAT_ID, ASSIGNED_FROM"),
+    ("DOCTOR", "idx_doctor_name", "DOC_NAME"),
+    # Scheduling: the doctors of a specialization, or of a department
+    # (through their staff record, matched by name)
+    ("DOCTOR", "idx_doctor_specialization", "SPECIALIZATION"),
+    ("DOCTOR", "idx_doctor_name_nocase", "DOC_NAME COLLATE NOCASE"),
+    ("STAFF", "idx_staff_dept", "DEPT_ID"),
+    # A patient's history timeline, newest first (ENTRY_ID, the rowid, breaks ties)
+    ("PATIENT_HISTORY", "idx_patient_history_pat_ts", "PAT_ID, TS"),
+    ("Billing", "idx_billing_pat", "pat_id"),
+    # Archival picks invoices by day (see archive.py)
+    ("Billing", "idx_billing_billed_on", "BILLED_ON"),
+    # Billing reports: covering indexes, so grouping by item or patient reads
+    # the index alone, already in group order (see billing_reports.py)
+    ("Billing", "idx_billing_items_amount", "items, amount, BILLED_ON"),
+    ("Billing", "idx_billing_pat_amount", "pat_id, amount, BILLED_ON"),
+    ("Medical_History", "idx_medical_history_appt", "appt_id"),
+    # Case-insensitive name matching and prefix search (see search.py)
+    ("PATIENT", "idx_patient_fname_nocase", "FNAME COLLATE NOCASE"),
+    ("PATIENT", "idx_patient_lname_nocase", "LNAME COLLATE NOCASE"),
+    ("USER_DATA", "idx_user_data_username_nocase", "username COLLATE NOCASE"),
+    # Identity resolution: staff and nurses register under their full name
+    ("STAFF", "idx_staff_name_nocase", "NAME COLLATE NOCASE"),
+    ("NURSE", "idx_nurse_fullname_nocase", "(FNAME || ' ' || LNAME) COLLATE NOCASE"),
+    ("NURSE", "idx_nurse_fname_nocase", "FNAME COLLATE NOCASE"),
+    # Registration eligibility: names on file, trimmed and lower-cased
+    ("ADMIN", "idx_admin_name_norm", "LOWER(TRIM(NAME))"),
+    ("STAFF", "idx_staff_name_norm", "LOWER(TRIM(NAME))"),
+)
+
+# Trigram FTS5 indexes over names, as external-content tables kept in sync
+# with their source table by triggers.
+# (fts table, source table, source rowid column, indexed columns)
+SEARCH_INDEXES = (
+    ("patient_name_fts", "PATIENT", "PAT_ID", ("FNAME", "LNAME")),
+)
+
+
+def table_exists(conn, table):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE",
+        (table,),
+    ).fetchone()
+    return row is not None
+
+
+def index_exists(conn, name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def create_indexes(conn):
+    for table, name, columns in INDEXES:
+        # The app can start against a database the loader has not fully built yet
+        if not table_exists(conn, table) or index_exists(conn, name):
+            continue
+        conn.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+        # Give the planner row counts for the new index
+        conn.execute(f"ANALYZE {table}")
+
+
+def trigger_exists(conn, name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def create_search_indexes(conn):
+    for fts, table, rowid, columns in SEARCH_INDEXES:
+        if not table_exists(conn, table):
+            continue
+        # Hospital.py drops the sync triggers during a bulk load; if a load
+        # died before putting them back, recreate them and rebuild the index
+        triggers = (f"{fts}_ai", f"{fts}_ad", f"{fts}_au")
+        if table_exists(conn, fts) and all(trigger_exists(conn, name) for name in triggers):
+            continue
+        cols = ", ".join(columns)
+        new = ", ".join(f"new.{c}" for c in columns)
+        old = ", ".join(f"old.{c}" for c in columns)
+        conn.executescript(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {cols}, content='{table}', content_rowid='{rowid}', tokenize='trigram'
+            );
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.{rowid}, {new});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{rowid}, {old});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{rowid}, {old});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.{rowid}, {new});
+            END;
+            INSERT INTO {fts}({fts}) VALUES ('rebuild');
+        """)
+
+
+# Maps a USER_DATA login to the doctor, nurse and staff records it belongs to.
+# Doctors log in under DOC_NAME; nurses under their staff name, which is the
+# nurse's full name, or under their first name.
+IDENTITY_SELECT = """
+SELECT U.username, U.user_type,
+    (SELECT D.DOC_ID FROM DOCTOR D WHERE D.DOC_NAME = U.username ORDER BY D.DOC_ID LIMIT 1),
+    COALESCE(
+        (SELECT N.NURSE_ID FROM NURSE N WHERE N.FNAME || ' ' || N.LNAME = U.username COLLATE NOCASE
+         ORDER BY N.NURSE_ID LIMIT 1),
+        (SELECT N.NURSE_ID FROM NURSE N WHERE N.FNAME = U.username COLLATE NOCASE
+         ORDER BY N.NURSE_ID LIMIT 1)
+    ),
+    (SELECT S.STAFF_ID FROM STAFF S WHERE S.NAME = U.username COLLATE NOCASE ORDER BY S.STAFF_ID LIMIT 1)
+FROM USER_DATA U
+"""
+
+IDENTITY_COLUMNS = "username, user_type, doc_id, nurse_id, staff_id"
+
+
+def create_identity_map(conn):
+    required = ("USER_DATA", "DOCTOR", "NURSE", "STAFF")
+    if not all(table_exists(conn, table) for table in required):
+        return
+    if table_exists(conn, "USER_IDENTITY") and trigger_exists(conn, "user_identity_ai"):
+        return
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS USER_IDENTITY (
+            username TEXT PRIMARY KEY COLLATE NOCASE,
+            user_type TEXT NOT NULL,
+            doc_id INTEGER,
+            nurse_id INTEGER,
+            staff_id INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_user_identity_doc ON USER_IDENTITY (doc_id);
+        CREATE INDEX IF NOT EXISTS idx_user_identity_nurse ON USER_IDENTITY (nurse_id);
+
+        -- New registrations are mapped as they are inserted
+        CREATE TRIGGER IF NOT EXISTS user_identity_ai AFTER INSERT ON USER_DATA BEGIN
+            INSERT OR REPLACE INTO USER_IDENTITY ({IDENTITY_COLUMNS})
+            {IDENTITY_SELECT} WHERE U.user_id = new.user_id;
+        END;
+
+        INSERT OR REPLACE INTO USER_IDENTITY ({IDENTITY_COLUMNS}) {IDENTITY_SELECT};
+    """)
+
+
+# Appointment times in one sortable column, START_TS, as ISO-8601 text
+# ('YYYY-MM-DD HH:MM:SS'), so date ranges and ordering by time use an index.
+# Appointment.csv has M/D/YYYY dates and an ISO timestamp as the time; the
+# time of day is taken from it as written. Triggers keep START_TS in step
+# with DATE and TIME; loads that run without triggers fill it afterwards.
+def appointment_date(row):
+    date = f"{row}.DATE"
+    rest = f"substr({date}, instr({date}, '/') + 1)"
+    return (
+        f"CASE WHEN {date} LIKE '____-__-__%' THEN substr({date}, 1, 10) "
+        f"ELSE printf('%04d-%02d-%02d', CAST(substr({rest}, instr({rest}, '/') + 1) AS INTEGER), "
+        f"CAST({date} AS INTEGER), CAST({rest} AS INTEGER)) END"
+    )
+
+
+def appointment_time(row):
+    time = f"{row}.TIME"
+    return (
+        f"CASE WHEN {time} LIKE '____-__-__T__:__:__%' THEN substr({time}, 12, 8) "
+        f"WHEN {time} LIKE '__:__:__%' THEN substr({time}, 1, 8) "
+        f"WHEN {time} LIKE '__:__' THEN {time} || ':00' "
+        f"ELSE '00:00:00' END"
+    )
+
+
+def appointment_start(row):
+    return f"{appointment_date(row)} || ' ' || {appointment_time(row)}"
+
+
+def fill_start_times(conn):
+    conn.execute(f"UPDATE APPOINTMENT SET START_TS = {appointment_start('APPOINTMENT')} WHERE START_TS IS NULL")
+
+
+def create_appointment_times(conn):
+    if not table_exists(conn, "APPOINTMENT"):
+        return
+    if not column_exists(conn, "APPOINTMENT", "START_TS"):
+        # The summary triggers predate START_TS; create_aggregates rebuilds them
+        for name in AGGREGATE_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        # Loads before CSV headers were mapped to columns inserted
+        # Appointment.csv by position: date in DOC_ID, time in DATE, pat_id
+        # in TIME and doc_id in PAT_ID. Put them back first. Foreign keys are
+        # off for this, as for a load, whose report lists any violations.
+        foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute(
+            "UPDATE APPOINTMENT SET DOC_ID = PAT_ID, DATE = DOC_ID, TIME = DATE, PAT_ID = TIME "
+            "WHERE DOC_ID LIKE '%/%/%'"
+        )
+        conn.execute("ALTER TABLE APPOINTMENT ADD COLUMN START_TS TEXT")
+        fill_start_times(conn)
+        conn.commit()
+        conn.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+    if trigger_exists(conn, "appointment_start_ai") and trigger_exists(conn, "appointment_start_au"):
+        return
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS appointment_start_ai AFTER INSERT ON APPOINTMENT
+        WHEN new.START_TS IS NULL BEGIN
+            UPDATE APPOINTMENT SET START_TS = {appointment_start('new')} WHERE APPT_ID = new.APPT_ID;
+        END;
+        CREATE TRIGGER IF NOT EXISTS appointment_start_au AFTER UPDATE OF DATE, TIME ON APPOINTMENT BEGIN
+            UPDATE APPOINTMENT SET START_TS = {appointment_start('new')} WHERE APPT_ID = new.APPT_ID;
+        END;
+    """)
+    fill_start_times(conn)
+
+
+# Appointment end times, END_TS, in START_TS's format. Appointment.csv has
+# no durations, so its appointments last APPOINTMENT_MINUTES; bookings made
+# through scheduling.py store their own end. Moving an appointment's start
+# moves its end with it.
+APPOINTMENT_MINUTES = 30
+
+
+def default_end(start):
+    return f"datetime({start}, '+{APPOINTMENT_MINUTES} minutes')"
+
+
+def fill_end_times(conn):
+    conn.execute(f"UPDATE APPOINTMENT SET END_TS = {default_end('START_TS')} WHERE END_TS IS NULL AND START_TS IS NOT NULL")
+
+
+def create_appointment_ends(conn):
+    if not table_exists(conn, "APPOINTMENT"):
+        return
+    if not column_exists(conn, "APPOINTMENT", "END_TS"):
+        conn.execute("ALTER TABLE APPOINTMENT ADD COLUMN END_TS TEXT")
+        fill_end_times(conn)
+    if trigger_exists(conn, "appointment_end_ai") and trigger_exists(conn, "appointment_end_au"):
+        return
+    # appointment_start_ai sets START_TS with an UPDATE, which fires appointment_end_au
+    shifted = (
+        "datetime(old.END_TS, printf('%+d seconds', "
+        "CAST(round((julianday(new.START_TS) - julianday(old.START_TS)) * 86400) AS INTEGER)))"
+    )
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS appointment_end_ai AFTER INSERT ON APPOINTMENT
+        WHEN new.END_TS IS NULL AND new.START_TS IS NOT NULL BEGIN
+            UPDATE APPOINTMENT SET END_TS = {default_end('new.START_TS')} WHERE APPT_ID = new.APPT_ID;
+        END;
+        CREATE TRIGGER IF NOT EXISTS appointment_end_au AFTER UPDATE OF START_TS ON APPOINTMENT
+        WHEN new.START_TS IS NOT NULL AND new.END_TS IS old.END_TS BEGIN
+            UPDATE APPOINTMENT SET END_TS = COALESCE({shifted}, {default_end('new.START_TS')})
+            WHERE APPT_ID = new.APPT_ID;
+        END;
+    """)
+    fill_end_times(conn)
+
+
+# Which nurse looks after which patient, and from when to when. A nurse's
+# appointments are those of their patients that start within the
+# assignment, [ASSIGNED_FROM, ASSIGNED_TO); an empty or NULL ASSIGNED_TO is
+# open-ended. Dates are ISO-8601 text, compared with START_TS as text.
+NURSE_ASSIGNMENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS NURSE_ASSIGNMENT (
+    NURSE_ID INTEGER NOT NULL,
+    PAT_ID INTEGER NOT NULL,
+    ASSIGNED_FROM TEXT NOT NULL,
+    ASSIGNED_TO TEXT,
+    PRIMARY KEY (NURSE_ID, PAT_ID, ASSIGNED_FROM),
+    FOREIGN KEY (NURSE_ID) REFERENCES NURSE(NURSE_ID) ON DELETE CASCADE,
+    FOREIGN KEY (PAT_ID) REFERENCES PATIENT(PAT_ID) ON DELETE CASCADE
+);
+
+DROP VIEW IF EXISTS Nurse_Appointments;
+CREATE VIEW Nurse_Appointments AS
+SELECT
+    A.appt_id,
+    P.pat_id,
+    P.fname AS patient_fname,
+    P.lname AS patient_lname,
+    A.date,
+    A.time,
+    A.start_ts,
+    D.doc_id,
+    D.doc_name AS doctor_name,
+    N.nurse_id,
+    N.fname || ' ' || N.lname AS nurse_name
+FROM NURSE_ASSIGNMENT NA
+JOIN Nurse N ON N.nurse_id = NA.nurse_id
+JOIN Appointment A ON A.pat_id = NA.pat_id
+    AND A.start_ts >= NA.assigned_from
+    AND (A.start_ts < NA.assigned_to OR NULLIF(NA.assigned_to, '') IS NULL)
+JOIN Patient P ON P.pat_id = A.pat_id
+JOIN Doctor D ON D.doc_id = A.doc_id;
+"""
+
+
+def create_nurse_assignments(conn):
+    # Databases built before NURSE_ASSIGNMENT have the old view, which
+    # matched Staff.staff_id against Patient.pat_id
+    if not table_exists(conn, "APPOINTMENT"):
+        return
+    view = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'Nurse_Appointments'").fetchone()
+    if table_exists(conn, "NURSE_ASSIGNMENT") and view and "NURSE_ASSIGNMENT" in view[0]:
+        return
+    conn.executescript(NURSE_ASSIGNMENT_SCHEMA)
+
+
+# Daily summaries for the dashboard, kept current by triggers so it reads a
+# handful of rows instead of grouping APPOINTMENT and Billing on each rerun.
+# Appointments are counted per doctor, per department and per patient type.
+# Invoices are dated by BILLED_ON. Billing.csv carries no invoice date, so
+# its invoices have none: they are left out of the summary, and so of the
+# dashboard and the billing period reports, until a feed supplies one.
+
+# Calendar day (YYYY-MM-DD) of an APPOINTMENT row
+def appointment_day(row):
+    return f"substr({row}.START_TS, 1, 10)"
+
+
+# (summary table, key column, key of an APPOINTMENT row)
+APPOINTMENT_AGGREGATES = (
+    ("AGG_APPT_DOCTOR_DAILY", "doc_id", "{row}.DOC_ID"),
+    # A doctor's department is that of their staff record; 0 when they have none
+    ("AGG_APPT_DEPT_DAILY", "dept_id",
+     "COALESCE((SELECT S.DEPT_ID FROM DOCTOR D JOIN STAFF S ON S.NAME = D.DOC_NAME COLLATE NOCASE "
+     "WHERE D.DOC_ID = {row}.DOC_ID ORDER BY S.STAFF_ID LIMIT 1), 0)"),
+    ("AGG_APPT_TYPE_DAILY", "patient_type",
+     "COALESCE((SELECT P.PATIENT_TYPE FROM PATIENT P WHERE P.PAT_ID = {row}.PAT_ID), 'Unknown')"),
+)
+
+AGGREGATE_TRIGGERS = (
+    "agg_appointment_ai", "agg_appointment_ad", "agg_appointment_au",
+    "agg_billing_ai", "agg_billing_ad", "agg_billing_au",
+)
+
+
+def column_exists(conn, table, column):
+    return any(row[1].upper() == column.upper() for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _count_appointment(table, key, expr, row, delta):
+    if delta > 0:
+        # The WHERE clause also keeps ON CONFLICT from parsing as a join constraint.
+        # Rows without START_TS yet are counted when the trigger above sets it.
+        return (
+            f"INSERT INTO {table} (day, {key}, appointments) "
+            f"SELECT {appointment_day(row)}, {expr.format(row=row)}, 1 WHERE {row}.START_TS IS NOT NULL "
+            f"ON CONFLICT (day, {key}) DO UPDATE SET appointments = appointments + 1;"
+        )
+    return (
+        f"UPDATE {table} SET appointments = appointments - 1 "
+        f"WHERE day = {appointment_day(row)} AND {key} = {expr.format(row=row)};"
+    )
+
+
+BILLING_ADD = """
+INSERT INTO AGG_BILLING_DAILY (day, invoices, amount)
+SELECT new.BILLED_ON, 1, new.amount WHERE new.BILLED_ON IS NOT NULL
+ON CONFLICT (day) DO UPDATE SET invoices = invoices + 1, amount = amount + excluded.amount;
+"""
+
+BILLING_SUBTRACT = """
+UPDATE AGG_BILLING_DAILY SET invoices = invoices - 1, amount = amount - old.amount WHERE day = old.BILLED_ON;
+"""
+
+
+def rebuild_aggregates(conn):
+    """Recompute every summary table from its source tables.
+
+    The triggers keep the summaries current row by row; this is for bulk
+    loads, which run with the triggers dropped, and for changes to DOCTOR,
+    STAFF or PATIENT that move existing appointments between departments
+    or patient types. Rows loaded without triggers get their START_TS and
+    END_TS here first.
+
+    Days whose rows have been archived (see archive.py) keep the counts
+    they had: those rows are no longer in APPOINTMENT and Billing.
+    """
+    fill_start_times(conn)
+    fill_end_times(conn)
+    # '' when nothing is archived, which every day sorts after
+    appointments_from = archived_before(conn, "APPOINTMENT")
+    billing_from = archived_before(conn, "Billing")
+    for table, key, expr in APPOINTMENT_AGGREGATES:
+        conn.execute(f"DELETE FROM {table} WHERE day >= ?", (appointments_from,))
+        conn.execute(
+            f"INSERT INTO {table} (day, {key}, appointments) "
+            f"SELECT {appointment_day('A')}, {expr.format(row='A')}, COUNT(*) FROM APPOINTMENT A "
+            f"WHERE A.START_TS >= ? GROUP BY 1, 2",
+            (appointments_from,),
+        )
+    conn.execute("DELETE FROM AGG_BILLING_DAILY WHERE day >= ?", (billing_from,))
+    conn.execute(
+        "INSERT INTO AGG_BILLING_DAILY (day, invoices, amount) "
+        "SELECT BILLED_ON, COUNT(*), SUM(amount) FROM Billing WHERE BILLED_ON >= ? GROUP BY BILLED_ON",
+        (billing_from,),
+    )
+
+
+def create_billing_dates(conn):
+    if table_exists(conn, "Billing") and not column_exists(conn, "Billing", "BILLED_ON"):
+        conn.execute("ALTER TABLE Billing ADD COLUMN BILLED_ON TEXT")
+
+
+def create_aggregates(conn):
+    required = ("APPOINTMENT", "Billing", "PATIENT", "DOCTOR", "STAFF")
+    if not all(table_exists(conn, table) for table in required):
+        return
+    # Earlier versions dated undated invoices by the day they were inserted
+    trigger = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'agg_billing_ai'").fetchone()
+    if trigger and "date('now')" in trigger[0]:
+        conn.execute("DROP TRIGGER agg_billing_ai")
+    if all(trigger_exists(conn, name) for name in AGGREGATE_TRIGGERS):
+        return
+
+    for table, key, expr in APPOINTMENT_AGGREGATES:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                day TEXT NOT NULL,
+                {key} NOT NULL,
+                appointments INTEGER NOT NULL,
+                PRIMARY KEY (day, {key})
+            ) WITHOUT ROWID
+        """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_agg_appt_doctor_doc ON AGG_APPT_DOCTOR_DAILY (doc_id, day)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS AGG_BILLING_DAILY (
+            day TEXT PRIMARY KEY,
+            invoices INTEGER NOT NULL,
+            amount REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+    add = "\n".join(_count_appointment(table, key, expr, "new", 1) for table, key, expr in APPOINTMENT_AGGREGATES)
+    subtract = "\n".join(_count_appointment(table, key, expr, "old", -1) for table, key, expr in APPOINTMENT_AGGREGATES)
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS agg_appointment_ai AFTER INSERT ON APPOINTMENT BEGIN
+            {add}
+        END;
+        CREATE TRIGGER IF NOT EXISTS agg_appointment_ad AFTER DELETE ON APPOINTMENT BEGIN
+            {subtract}
+        END;
+        CREATE TRIGGER IF NOT EXISTS agg_appointment_au AFTER UPDATE OF DOC_ID, START_TS, PAT_ID ON APPOINTMENT BEGIN
+            {subtract}
+            {add}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS agg_billing_ai AFTER INSERT ON Billing BEGIN
+            {BILLING_ADD}
+        END;
+        CREATE TRIGGER IF NOT EXISTS agg_billing_ad AFTER DELETE ON Billing BEGIN
+            {BILLING_SUBTRACT}
+        END;
+        CREATE TRIGGER IF NOT EXISTS agg_billing_au AFTER UPDATE OF amount, BILLED_ON ON Billing BEGIN
+            {BILLING_SUBTRACT}
+            {BILLING_ADD}
+        END;
+    """)
+    rebuild_aggregates(conn)
+
+
+# Patients' medical history, one row per entry, keyed by PAT_ID (see
+# history.py). TS is local time, 'YYYY-MM-DD HH:MM:SS', or '' for notes
+# copied from updated_history, which never recorded when they were written
+# ('' sorts before any time, so they come last). BODY is the note's
+# text, or its zlib-compressed UTF-8 when ENCODING is 'zlib'. Entries are
+# never changed or removed, and a patient with history cannot be deleted.
+PATIENT_HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS PATIENT_HISTORY (
+    ENTRY_ID INTEGER PRIMARY KEY,
+    PAT_ID INTEGER NOT NULL,
+    TS TEXT NOT NULL,
+    AUTHOR TEXT NOT NULL,
+    ENCODING TEXT,
+    BODY NOT NULL,
+    FOREIGN KEY (PAT_ID) REFERENCES PATIENT(PAT_ID)
+);
+
+CREATE TRIGGER IF NOT EXISTS patient_history_no_update BEFORE UPDATE ON PATIENT_HISTORY BEGIN
+    SELECT RAISE(ABORT, 'PATIENT_HISTORY is append-only');
+END;
+
+CREATE TRIGGER IF NOT EXISTS patient_history_no_delete BEFORE DELETE ON PATIENT_HISTORY BEGIN
+    SELECT RAISE(ABORT, 'PATIENT_HISTORY is append-only');
+END;
+"""
+
+# Notes written to updated_history were keyed by name alone. Those whose
+# name is one patient's first or full name move to that patient's history,
+# in the order they were written, undated; the rest stay where they are.
+LEGACY_HISTORY_COPY = """
+WITH matches AS (
+    SELECT UH.ID, MIN(P.PAT_ID) AS PAT_ID, COUNT(*) AS patients
+    FROM updated_history UH
+    JOIN PATIENT P ON P.FNAME = UH.pat_name COLLATE NOCASE
+        OR (P.FNAME || ' ' || P.LNAME) = UH.pat_name COLLATE NOCASE
+    GROUP BY UH.ID
+)
+INSERT INTO PATIENT_HISTORY (PAT_ID, TS, AUTHOR, BODY)
+SELECT M.PAT_ID, '', 'updated_history', UH.history
+FROM matches M
+JOIN updated_history UH ON UH.ID = M.ID
+WHERE M.patients = 1
+ORDER BY UH.ID
+"""
+
+
+def create_patient_history(conn):
+    if not table_exists(conn, "PATIENT"):
+        return
+    created = not table_exists(conn, "PATIENT_HISTORY")
+    conn.executescript(PATIENT_HISTORY_SCHEMA)
+    if created and table_exists(conn, "updated_history"):
+        conn.execute(LEGACY_HISTORY_COPY)
+
+
+# Notes copied from updated_history used to be dated with the day of the
+# copy. They are the first entries of the table, so only a database where
+# the first one is dated needs fixing; the append-only trigger is dropped
+# for the fix and put back by PATIENT_HISTORY_SCHEMA.
+def undate_legacy_history(conn):
+    if not table_exists(conn, "PATIENT_HISTORY"):
+        return
+    first = conn.execute("SELECT AUTHOR, TS FROM PATIENT_HISTORY ORDER BY ENTRY_ID LIMIT 1").fetchone()
+    if first is None or first[0] != "updated_history" or first[1] == "":
+        return
+    conn.execute("DROP TRIGGER IF EXISTS patient_history_no_update")
+    conn.execute("UPDATE PATIENT_HISTORY SET TS = '' WHERE AUTHOR = 'updated_history' AND TS <> ''")
+    conn.executescript(PATIENT_HISTORY_SCHEMA)
+
+
+# Nothing reads updated_history since its notes moved to PATIENT_HISTORY, so
+# its search index and name indexes only slow down writes to it
+def drop_legacy_history_indexes(conn):
+    for trigger in ("history_fts_ai", "history_fts_ad", "history_fts_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS history_fts")
+    for index in ("idx_updated_history_pat_name", "idx_updated_history_pat_name_nocase"):
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+    # Its Nurse_Patient_History view is no longer created by Hospital.py
+    conn.execute("DROP VIEW IF EXISTS Nurse_Patient_History")
+
+
+# Bookkeeping for incremental loads (see load_state.py): how much of each
+# CSV feed has been loaded and the rows the last load inserted and updated,
+# and a content hash of every row loaded by key
+def create_load_state(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS LOAD_STATE (
+            file TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            checksum TEXT NOT NULL,
+            loaded_at TEXT NOT NULL,
+            rows_inserted INTEGER NOT NULL DEFAULT 0,
+            rows_updated INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS LOAD_ROW_HASH (
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            hash BLOB NOT NULL,
+            PRIMARY KEY (table_name, row_key)
+        ) WITHOUT ROWID;
+    """)
+    for column in ("rows_inserted", "rows_updated"):
+        if not column_exists(conn, "LOAD_STATE", column):
+            conn.execute(f"ALTER TABLE LOAD_STATE ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+
+
+# Bookkeeping for archival (see archive.py): per archived table, the day
+# before which its rows have been moved to the archive files
+def create_archive_state(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ARCHIVE_STATE (
+            table_name TEXT PRIMARY KEY COLLATE NOCASE,
+            archived_before TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            archived_at TEXT NOT NULL
+        )
+    """)
+
+
+def archived_before(conn, table):
+    """The day before which table's rows are archived, or '' if none are."""
+    if not table_exists(conn, "ARCHIVE_STATE"):
+        return ""
+    row = conn.execute("SELECT archived_before FROM ARCHIVE_STATE WHERE table_name = ?", (table,)).fetchone()
+    return row[0] if row else ""
+
+
+# Every step is idempotent, so the whole list runs on each startup
+MIGRATIONS = (
+    # Before create_indexes, which indexes START_TS, END_TS, BILLED_ON,
+    # NURSE_ASSIGNMENT and PATIENT_HISTORY
+    create_appointment_times,
+    create_appointment_ends,
+    create_billing_dates,
+    create_nurse_assignments,
+    create_patient_history,
+    undate_legacy_history,
+    drop_legacy_history_indexes,
+    create_indexes,
+    create_search_indexes,
+    create_identity_map,
+    # Before create_aggregates, whose rebuild leaves archived days alone
+    create_archive_state,
+    create_aggregates,
+    create_load_state,
+)
+
+
+def apply_migrations(conn):
+    for migration in MIGRATIONS:
+        migration(conn)
+    conn.commit()
@@ -0,0 +1,57 @@
+# Paged result tables for HospitalApp.py. Only one page of rows is fetched
+# (see queries.page_sql), so render time does not grow with the result.
+
+import streamlit as st
+
+from cache import read_sql
+from queries import PAGE_SIZE, count_sql, page_columns, page_sql
+
+
+def paginated_dataframe(sql, params, key, state_key, sort_options=None, page_size=PAGE_SIZE):
+    """Show sql's rows one page at a time, with previous/next buttons.
+
+    Returns the total row count, so the caller can report an empty result.
+    """
+    params = list(params)
+    total = int(read_sql(count_sql(sql), params).iloc[0, 0])
+    if total == 0:
+        return 0
+
+    sort = None
+    descending = False
+    if sort_options:
+        cols = st.columns([2, 1])
+        with cols[0]:
+            sort = st.selectbox("Sort by", sort_options, key=f"{state_key}_sort")
+        with cols[1]:
+            descending = st.checkbox("Descending", key=f"{state_key}_desc")
+
+    # Ordering by the key itself needs no separate sort column
+    if sort in page_columns(key):
+        sort = None
+
+    # Cursors of the pages visited so far; a new query or order starts over
+    state = st.session_state.get(state_key)
+    query = (sql, tuple(params), sort, descending)
+    if state is None or state["query"] != query:
+        state = {"query": query, "cursors": [None]}
+        st.session_state[state_key] = state
+    cursors = state["cursors"]
+
+    df = read_sql(*page_sql(sql, params, key, sort, descending, cursors[-1], page_size))
+    st.dataframe(df)
+
+    first = (len(cursors) - 1) * page_size
+    st.caption(f"Rows {first + 1}–{first + len(df)} of {total}")
+    cols = st.columns(2)
+    with cols[0]:
+        if st.button("◀ Previous", key=f"{state_key}_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with cols[1]:
+        if st.button("Next ▶", key=f"{state_key}_next", disabled=first + len(df) >= total):
+            # sqlite3 binds numpy scalars as BLOBs, so unwrap them to Python values
+            last = df.iloc[-1][page_columns(key, sort)].tolist()
+            cursors.append([value.item() if hasattr(value, "item") else value for value in last])
+            st.rerun()
+    return total
@@ -0,0 +1,163 @@
+# Password hashing for USER_DATA.password.
+#
+# Hashes are stored as "scrypt$<version>$<salt>$<hash>" (base64 salt and
+# hash). The version selects a parameter set from PARAMETERS, so the cost
+# can be raised later: hashes made with an older version still verify and
+# are replaced with a current one at the next successful login. Hashes from
+# before this scheme are unsalted SHA-256 hex digests and are treated the
+# same way.
+#
+# scrypt takes tens of milliseconds and releases the GIL, so hashing runs on
+# a small thread pool. The pool also limits how many hashes can be waiting,
+# which keeps a burst of logins from piling up unbounded CPU and memory.
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# version -> scrypt parameters. Never change an existing entry: add a new
+# version and point CURRENT_VERSION at it.
+PARAMETERS = {
+    1: {"n": 2 ** 14, "r": 8, "p": 1, "dklen": 32},
+}
+CURRENT_VERSION = 1
+
+SALT_BYTES = 16
+SCHEME = "scrypt"
+
+
+class PasswordPoolBusy(RuntimeError):
+    pass
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, params):
+    # maxmem covers 128 * n * r bytes plus OpenSSL's overhead
+    maxmem = 128 * params["n"] * params["r"] * 2 + 1024 * 1024
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=params["n"], r=params["r"], p=params["p"],
+        dklen=params["dklen"], maxmem=maxmem,
+    )
+
+
+def hash_password(password, version=CURRENT_VERSION):
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, PARAMETERS[version])
+    return f"{SCHEME}${version}${_b64(salt)}${_b64(digest)}"
+
+
+def is_legacy_hash(stored):
+    # Unsalted SHA-256 hex digest
+    return len(stored) == 64 and all(c in "0123456789abcdef" for c in stored)
+
+
+def verify_password(password, stored):
+    if stored is None:
+        return False
+    if is_legacy_hash(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    try:
+        scheme, version, salt, digest = stored.split("$")
+        params = PARAMETERS[int(version)]
+    except (ValueError, KeyError):
+        return False
+    if scheme != SCHEME:
+        return False
+    return hmac.compare_digest(_scrypt(password, base64.b64decode(salt), params), base64.b64decode(digest))
+
+
+def needs_rehash(stored):
+    return is_legacy_hash(stored) or not stored.startswith(f"{SCHEME}${CURRENT_VERSION}$")
+
+
+# Checked against when the username does not exist, so a login for an
+# unknown user takes as long as one with a wrong password
+_DUMMY_HASH = None
+
+
+def _dummy_hash():
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password("")
+    return _DUMMY_HASH
+
+
+class PasswordPool:
+    """Bounded pool for hashing and verifying passwords.
+
+    At most max_workers hashes run at once and at most max_queued more wait
+    for a worker; past that, submissions fail fast with PasswordPoolBusy
+    instead of queueing behind a backlog the user would time out on.
+    """
+
+    def __init__(self, max_workers=None, max_queued=32):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hospital-password")
+        self._slots = threading.BoundedSemaphore(self.max_workers + max_queued)
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "rejected": 0, "in_flight": 0}
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise PasswordPoolBusy("Too many password checks in progress")
+        with self._lock:
+            self._counters["submitted"] += 1
+            self._counters["in_flight"] += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self._counters["in_flight"] -= 1
+        self._slots.release()
+
+    def hash_async(self, password):
+        return self.submit(hash_password, password)
+
+    def hash(self, password, timeout=None):
+        return self.hash_async(password).result(timeout)
+
+    def verify(self, password, stored, timeout=None):
+        if stored is None:
+            # Spend the same time as a real check, then fail
+            self.submit(verify_password, password, _dummy_hash()).result(timeout)
+            return False
+        return self.submit(verify_password, password, stored).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["max_workers"] = self.max_workers
+        stats["max_queued"] = self.max_queued
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Shared by every Streamlit session, like the connection pool in db.py
+def get_password_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordPool()
+    return _pool
@@ -0,0 +1,203 @@
+# Opt-in render profiling for HospitalApp.py. Streamlit reruns the whole
+# script on every interaction; with HOSPITAL_PROFILE set, each rerun of
+# main() and the page functions inside it are timed as nested spans and
+# aggregated per page across reruns. HOSPITAL_PROFILE=cprofile also runs
+# every rerun under cProfile.
+#
+# dump() writes, per page, the spans as folded stacks (for flamegraph.pl or
+# speedscope) and the merged cProfile stats (.prof, for pstats or snakeviz).
+# With profiling off, profiled() returns the function unchanged.
+
+import contextvars
+import cProfile
+import functools
+import os
+import pstats
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from query_stats import current_page
+
+MODE = os.environ.get("HOSPITAL_PROFILE", "").lower()
+ENABLED = MODE not in ("", "0", "false", "off")
+CPROFILE = MODE == "cprofile"
+
+PROFILE_DIR = os.environ.get("HOSPITAL_PROFILE_DIR", "profiles")
+
+# Durations kept per span for the percentiles
+RECENT = 500
+
+# Names of the spans open on this thread, outermost first
+_stack = contextvars.ContextVar("profiling_stack", default=())
+# Spans finished during the current rerun, as (stack, seconds)
+_rerun = contextvars.ContextVar("profiling_rerun", default=None)
+
+
+class Profiler:
+    """Span timings and cProfile stats of reruns, per page."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._profiles = {}
+        self._reruns = {}
+
+    def add_rerun(self, page, spans, profile=None):
+        with self._lock:
+            self._reruns[page] = self._reruns.get(page, 0) + 1
+            by_stack = self._spans.setdefault(page, {})
+            for stack, seconds in spans:
+                entry = by_stack.get(stack)
+                if entry is None:
+                    entry = by_stack[stack] = {"calls": 0, "seconds": 0.0, "max": 0.0, "recent": deque(maxlen=RECENT)}
+                entry["calls"] += 1
+                entry["seconds"] += seconds
+                entry["max"] = max(entry["max"], seconds)
+                entry["recent"].append(seconds)
+            if profile is not None:
+                profile.create_stats()
+                if page in self._profiles:
+                    self._profiles[page].add(profile)
+                else:
+                    self._profiles[page] = pstats.Stats(profile)
+
+    def snapshot(self):
+        """One dict per page and span, the slowest pages first."""
+        with self._lock:
+            reruns = dict(self._reruns)
+            spans = {
+                page: {stack: dict(entry, recent=list(entry["recent"])) for stack, entry in by_stack.items()}
+                for page, by_stack in self._spans.items()
+            }
+        rows = []
+        for page, by_stack in spans.items():
+            # The share of the page's render time is out of the outermost spans
+            rendered = sum(entry["seconds"] for stack, entry in by_stack.items() if len(stack) == 1)
+            for stack, entry in by_stack.items():
+                rows.append(({
+                    "page": page,
+                    "span": " > ".join(stack),
+                    "reruns": reruns[page],
+                    "calls": entry["calls"],
+                    "total_ms": round(entry["seconds"] * 1000, 3),
+                    "mean_ms": round(entry["seconds"] * 1000 / entry["calls"], 3),
+                    "p95_ms": round(float(np.percentile(entry["recent"], 95)) * 1000, 3),
+                    "max_ms": round(entry["max"] * 1000, 3),
+                    "share": round(entry["seconds"] / rendered, 3) if rendered else 0.0,
+                }, (-rendered, page, stack)))
+        rows.sort(key=lambda row: row[1])
+        return [row for row, order in rows]
+
+    def folded(self, page):
+        """The page's spans as folded stacks: 'main;show_dashboard 1234' lines.
+
+        Each line carries the span's own time in microseconds, less the time
+        of the spans inside it, as flame graph tools expect.
+        """
+        with self._lock:
+            totals = {stack: entry["seconds"] for stack, entry in self._spans.get(page, {}).items()}
+        own = dict(totals)
+        for stack, seconds in totals.items():
+            if len(stack) > 1 and stack[:-1] in own:
+                own[stack[:-1]] -= seconds
+        return [
+            f"{';'.join(stack)} {max(round(seconds * 1e6), 0)}"
+            for stack, seconds in sorted(own.items())
+        ]
+
+    def dump(self, directory=PROFILE_DIR):
+        """Write <page>.folded, and <page>.prof when there are cProfile stats; return the paths."""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            pages = list(self._spans)
+            profiles = dict(self._profiles)
+        paths = []
+        for page in pages:
+            base = os.path.join(directory, re.sub(r"[^\w.-]+", "_", page).strip("_") or "page")
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                f.write("\n".join(self.folded(page)) + "\n")
+            paths.append(base + ".folded")
+            if page in profiles:
+                profiles[page].dump_stats(base + ".prof")
+                paths.append(base + ".prof")
+        return paths
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._profiles.clear()
+            self._reruns.clear()
+
+
+_profiler = Profiler()
+
+
+def get_profiler():
+    return _profiler
+
+
+@contextmanager
+def span(name):
+    if not ENABLED:
+        yield
+        return
+    stack = _stack.get() + (name,)
+    token = _stack.set(stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _stack.reset(token)
+        spans = _rerun.get()
+        if spans is not None:
+            spans.append((stack, seconds))
+
+
+def profiled(fn):
+    """Time every call of fn as a span named after it."""
+    if not ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def profile_rerun(fn):
+    """Wrap the script's main(): one call is one rerun, filed under its page.
+
+    The page is the one main() attributed its queries to (see
+    query_stats.set_page), so it is known by the time the rerun ends.
+    """
+    if not ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        spans = []
+        token = _rerun.set(spans)
+        profile = cProfile.Profile() if CPROFILE else None
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is active on this thread
+                profile = None
+        try:
+            with span(fn.__name__):
+                return fn(*args, **kwargs)
+        finally:
+            # st.rerun() and st.stop() end a rerun with an exception; it still counts
+            if profile is not None:
+                profile.disable()
+            _rerun.reset(token)
+            _profiler.add_rerun(current_page(), spans, profile)
+    return wrapper
@@ -0,0 +1,537 @@
+import re
+import sys
+from datetime import date, datetime, time, timedelta
+
+from search import patient_id_filter
+
+# SQL used by the page functions in HospitalApp.py. Keeping it in one place
+# lets check_query_plans() below run EXPLAIN QUERY PLAN over all of it.
+# Name searches use the ID subqueries built by search.py for the term
+# being searched, through a {patient_ids} placeholder or an added filter.
+
+LOGIN = "SELECT password, user_type FROM USER_DATA WHERE username = ?"
+
+INSERT_USER = "INSERT INTO USER_DATA (username, password, email, user_type) VALUES (?, ?, ?, ?)"
+
+# Replaces a password hash only if it is still the one that was checked
+UPDATE_PASSWORD = "UPDATE USER_DATA SET password = ? WHERE username = ? AND password = ?"
+
+IDENTITY_BY_USERNAME = "SELECT doc_id, nurse_id, staff_id FROM USER_IDENTITY WHERE username = ?"
+
+STAFF_MEMBER = """
+SELECT 1 FROM ADMIN WHERE LOWER(TRIM(NAME)) = LOWER(TRIM(?))
+UNION ALL
+SELECT 1 FROM STAFF WHERE LOWER(TRIM(NAME)) = LOWER(TRIM(?))
+LIMIT 1
+"""
+
+DOCTOR_APPOINTMENTS = """
+SELECT A.appt_id, P.fname, P.lname, A.start_ts
+FROM Appointment A
+JOIN Patient P ON A.pat_id = P.pat_id
+WHERE A.doc_id = ?
+"""
+
+DOCTOR_PATIENTS = """
+SELECT DISTINCT P.pat_id, P.fname, P.lname
+FROM Patient P
+JOIN Appointment A ON P.pat_id = A.pat_id
+WHERE A.doc_id = ?
+"""
+
+# Patients whose first or last name matches term (see search.py), for
+# picking one patient among those sharing a name
+PATIENTS_BY_NAME = """
+SELECT PAT_ID, FNAME, LNAME, PATIENT_TYPE
+FROM PATIENT
+WHERE PAT_ID IN ({patient_ids})
+ORDER BY FNAME, LNAME, PAT_ID
+LIMIT 100
+"""
+
+
+def patients_by_name(term):
+    ids, params = patient_id_filter(term)
+    return PATIENTS_BY_NAME.format(patient_ids=ids), params
+
+
+# A patient's history, newest first (see history.py). A page after the first
+# starts below the (TS, ENTRY_ID) of the previous page's last entry.
+PATIENT_HISTORY_LATEST = """
+SELECT ENTRY_ID, TS, AUTHOR, ENCODING, BODY FROM PATIENT_HISTORY
+WHERE PAT_ID = ?
+ORDER BY TS DESC, ENTRY_ID DESC
+LIMIT ?
+"""
+
+PATIENT_HISTORY_BEFORE = """
+SELECT ENTRY_ID, TS, AUTHOR, ENCODING, BODY FROM PATIENT_HISTORY
+WHERE PAT_ID = ? AND (TS, ENTRY_ID) < (?, ?)
+ORDER BY TS DESC, ENTRY_ID DESC
+LIMIT ?
+"""
+
+INSERT_PATIENT_HISTORY = """
+INSERT INTO PATIENT_HISTORY (PAT_ID, TS, AUTHOR, ENCODING, BODY) VALUES (?, ?, ?, ?, ?)
+"""
+
+# A nurse's worklist: appointments of the patients assigned to them (see
+# NURSE_ASSIGNMENT in migrations.py), looked up by nurse_id
+NURSE_APPOINTMENTS = """
+SELECT appt_id, pat_id, patient_fname || ' ' || patient_lname AS patient_name, start_ts, doctor_name
+FROM Nurse_Appointments
+WHERE nurse_id = ?
+"""
+
+# Doctors seeing the nurse's patients during the assignment
+NURSE_SEARCH_DOCTOR = """
+SELECT DISTINCT pat_id, patient_fname AS fname, patient_lname AS lname, doc_id, doctor_name AS doc_name
+FROM Nurse_Appointments
+WHERE nurse_id = ?
+"""
+
+
+def _nurse_patients(sql, nurse_id, term=None):
+    # Optionally narrowed to the nurse's patients whose name matches term
+    params = [nurse_id]
+    if term and term.strip():
+        ids, term_params = patient_id_filter(term)
+        sql += f"AND pat_id IN ({ids})\n"
+        params += term_params
+    return sql, params
+
+
+def nurse_appointments(nurse_id, term=None):
+    return _nurse_patients(NURSE_APPOINTMENTS, nurse_id, term)
+
+
+def nurse_search_doctor(nurse_id, term=None):
+    return _nurse_patients(NURSE_SEARCH_DOCTOR, nurse_id, term)
+
+
+# Whether any patient has ever been assigned to the nurse
+NURSE_HAS_ASSIGNMENTS = "SELECT 1 FROM NURSE_ASSIGNMENT WHERE NURSE_ID = ? LIMIT 1"
+
+# For a nurse with no assignments: the appointments and doctors of any
+# patient whose name matches the term searched, with the columns of the
+# two queries above
+PATIENT_APPOINTMENTS = """
+SELECT A.appt_id, A.pat_id, P.fname || ' ' || P.lname AS patient_name, A.start_ts, D.doc_name AS doctor_name
+FROM Appointment A
+JOIN Patient P ON P.pat_id = A.pat_id
+JOIN Doctor D ON D.doc_id = A.doc_id
+WHERE A.pat_id IN ({patient_ids})
+"""
+
+PATIENT_DOCTORS = """
+SELECT DISTINCT P.pat_id, P.fname, P.lname, D.doc_id, D.doc_name
+FROM Patient P
+JOIN Appointment A ON A.pat_id = P.pat_id
+JOIN Doctor D ON D.doc_id = A.doc_id
+WHERE P.pat_id IN ({patient_ids})
+"""
+
+
+def patient_appointments(term):
+    ids, params = patient_id_filter(term)
+    return PATIENT_APPOINTMENTS.format(patient_ids=ids), params
+
+
+def patient_doctors(term):
+    ids, params = patient_id_filter(term)
+    return PATIENT_DOCTORS.format(patient_ids=ids), params
+
+
+# Appointments by start time (APPOINTMENT.START_TS, ISO-8601 text). Ranges
+# are half-open, [start, end), and either bound may be left open.
+APPOINTMENTS_IN_RANGE = """
+SELECT A.appt_id, A.start_ts, P.fname, P.lname, D.doc_name
+FROM Appointment A
+JOIN Patient P ON A.pat_id = P.pat_id
+LEFT JOIN Doctor D ON A.doc_id = D.doc_id
+WHERE A.start_ts IS NOT NULL
+"""
+
+
+# Bounds may be dates, datetimes or ISO strings; a bare date sorts before
+# every time on that day, so it bounds from midnight
+def time_bound(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _start_range(sql, params, start, end):
+    params = list(params)
+    if start is not None:
+        sql += "  AND A.start_ts >= ?\n"
+        params.append(time_bound(start))
+    if end is not None:
+        sql += "  AND A.start_ts < ?\n"
+        params.append(time_bound(end))
+    return sql, params
+
+
+def doctor_appointments(doc_id, start=None, end=None):
+    return _start_range(DOCTOR_APPOINTMENTS, [doc_id], start, end)
+
+
+def appointments_in_range(start=None, end=None):
+    return _start_range(APPOINTMENTS_IN_RANGE, [], start, end)
+
+
+# Scheduling (see scheduling.py). Times are START_TS/END_TS text,
+# 'YYYY-MM-DD HH:MM:SS'; an appointment occupies [START_TS, END_TS).
+SPECIALIZATIONS = "SELECT DISTINCT SPECIALIZATION FROM DOCTOR ORDER BY SPECIALIZATION"
+
+DEPARTMENTS = "SELECT DEPT_ID, DEPT_NAME FROM DEPARTMENT ORDER BY DEPT_NAME"
+
+DOCTORS_BY_SPECIALIZATION = """
+SELECT DOC_ID, DOC_NAME FROM DOCTOR WHERE SPECIALIZATION = ? ORDER BY DOC_ID
+"""
+
+# A doctor's department is that of their staff record, matched by name
+DOCTORS_BY_DEPARTMENT = """
+SELECT DISTINCT D.DOC_ID, D.DOC_NAME
+FROM STAFF S
+JOIN DOCTOR D ON D.DOC_NAME = S.NAME COLLATE NOCASE
+WHERE S.DEPT_ID = ?
+ORDER BY D.DOC_ID
+"""
+
+DOCTOR_SCHEDULE = """
+SELECT APPT_ID, START_TS, END_TS FROM APPOINTMENT
+WHERE DOC_ID = ? AND START_TS IS NOT NULL AND END_TS IS NOT NULL
+ORDER BY START_TS, APPT_ID
+"""
+
+# Any appointment of the doctor overlapping [start, end). Starts are
+# indexed, ends are not, so the range is bounded below by start less the
+# longest appointment: (doc_id, start - longest, end, start).
+APPOINTMENT_CONFLICT = """
+SELECT APPT_ID FROM APPOINTMENT
+WHERE DOC_ID = ? AND START_TS > ? AND START_TS < ? AND END_TS > ?
+LIMIT 1
+"""
+
+INSERT_APPOINTMENT = """
+INSERT INTO APPOINTMENT (DOC_ID, DATE, TIME, PAT_ID, START_TS, END_TS) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+# Dashboard figures, read from the daily summary tables (see migrations.py).
+# Days are YYYY-MM-DD strings; ranges are inclusive.
+APPOINTMENTS_BETWEEN = """
+SELECT COALESCE(SUM(appointments), 0) FROM AGG_APPT_TYPE_DAILY WHERE day BETWEEN ? AND ?
+"""
+
+DOCTOR_APPOINTMENTS_BETWEEN = """
+SELECT COALESCE(SUM(appointments), 0) FROM AGG_APPT_DOCTOR_DAILY WHERE doc_id = ? AND day BETWEEN ? AND ?
+"""
+
+BILLING_BETWEEN = """
+SELECT COALESCE(SUM(invoices), 0), COALESCE(SUM(amount), 0) FROM AGG_BILLING_DAILY WHERE day BETWEEN ? AND ?
+"""
+
+LATEST_APPOINTMENT_DAY = "SELECT MAX(day) FROM AGG_APPT_TYPE_DAILY WHERE day <= ?"
+
+PATIENT_FLOW = """
+SELECT day, patient_type, appointments
+FROM AGG_APPT_TYPE_DAILY
+WHERE day BETWEEN ? AND ?
+ORDER BY day
+"""
+
+DEPARTMENT_STATS = """
+SELECT COALESCE(D.DEPT_NAME, 'Unassigned') AS department, SUM(A.appointments) AS appointments
+FROM AGG_APPT_DEPT_DAILY A
+LEFT JOIN DEPARTMENT D ON D.DEPT_ID = A.dept_id
+WHERE A.day BETWEEN ? AND ?
+GROUP BY A.dept_id
+ORDER BY appointments DESC
+"""
+
+DOCTOR_LOAD = """
+SELECT D.DOC_NAME AS doctor, SUM(A.appointments) AS appointments
+FROM AGG_APPT_DOCTOR_DAILY A
+JOIN DOCTOR D ON D.DOC_ID = A.doc_id
+WHERE A.day BETWEEN ? AND ?
+GROUP BY A.doc_id
+ORDER BY appointments DESC
+LIMIT 10
+"""
+
+# Billing reports (see billing_reports.py). Invoices are dated by BILLED_ON;
+# ranges are inclusive YYYY-MM-DD days.
+BILLED_DAYS = "SELECT (SELECT MIN(day) FROM AGG_BILLING_DAILY), (SELECT MAX(day) FROM AGG_BILLING_DAILY)"
+
+REVENUE_BY_PERIOD = """
+SELECT strftime(?, day) AS period, SUM(invoices) AS invoices, SUM(amount) AS revenue
+FROM AGG_BILLING_DAILY
+WHERE day BETWEEN ? AND ?
+GROUP BY period
+ORDER BY period
+"""
+
+REVENUE_BY_ITEM = """
+SELECT CASE WHEN items = '' THEN 'Unspecified' ELSE items END AS item,
+       COUNT(*) AS invoices, SUM(amount) AS revenue, AVG(amount) AS average
+FROM Billing
+WHERE BILLED_ON BETWEEN ? AND ?
+GROUP BY items
+ORDER BY revenue DESC
+"""
+
+# Invoices are grouped per patient first, so PATIENT is looked up once per
+# patient rather than once per invoice
+REVENUE_BY_PATIENT_TYPE = """
+SELECT COALESCE(P.PATIENT_TYPE, 'Unknown') AS patient_type,
+       SUM(B.invoices) AS invoices, SUM(B.revenue) AS revenue
+FROM (
+    SELECT pat_id, COUNT(*) AS invoices, SUM(amount) AS revenue
+    FROM Billing
+    WHERE BILLED_ON BETWEEN ? AND ?
+    GROUP BY pat_id
+) B
+LEFT JOIN PATIENT P ON P.PAT_ID = B.pat_id
+GROUP BY 1
+ORDER BY revenue DESC
+"""
+
+TOP_PATIENTS = """
+SELECT B.pat_id, P.FNAME AS fname, P.LNAME AS lname, B.invoices, B.revenue
+FROM (
+    SELECT pat_id, COUNT(*) AS invoices, SUM(amount) AS revenue
+    FROM Billing
+    WHERE BILLED_ON BETWEEN ? AND ?
+    GROUP BY pat_id
+    ORDER BY revenue DESC
+    LIMIT ?
+) B
+LEFT JOIN PATIENT P ON P.PAT_ID = B.pat_id
+ORDER BY B.revenue DESC
+"""
+
+# Invoice counts per item and every amount, both in (items, amount) order,
+# for percentiles computed over the sorted runs
+ITEM_COUNTS = """
+SELECT items, COUNT(*) FROM Billing WHERE BILLED_ON BETWEEN ? AND ? GROUP BY items ORDER BY items
+"""
+
+ITEM_AMOUNTS = "SELECT amount FROM Billing WHERE BILLED_ON BETWEEN ? AND ? ORDER BY items, amount"
+
+# Invoices without a date, which no report covers
+UNDATED_INVOICES = "SELECT COUNT(*) AS invoices FROM Billing WHERE BILLED_ON IS NULL"
+
+# What has been moved to the archive files (see archive.py), per table
+ARCHIVE_STATE = """
+SELECT table_name, archived_before, rows, archived_at FROM ARCHIVE_STATE ORDER BY table_name
+"""
+
+# Keyset pagination (see pagination.py): a page after the first is fetched
+# with WHERE (sort, key) > (values of the previous page's last row), so the
+# database seeks straight to it instead of stepping over OFFSET rows
+PAGE_SIZE = 50
+
+
+def _base(sql):
+    return sql.strip().rstrip(";")
+
+
+def count_sql(sql):
+    return f"SELECT COUNT(*) FROM ({_base(sql)})"
+
+
+def page_sql(sql, params, key, sort=None, descending=False, after=None, limit=PAGE_SIZE):
+    """Return (sql, params) for the page of sql's rows that follows `after`.
+
+    key is the column, or tuple of columns, that identifies a row of the
+    result; sort is an optional non-NULL column to order by first. after
+    holds the sort and key values of the last row of the previous page.
+    """
+    columns = page_columns(key, sort)
+    params = list(params)
+    where = ""
+    if after is not None:
+        marks = ", ".join("?" for _ in columns)
+        where = f"WHERE ({', '.join(columns)}) {'<' if descending else '>'} ({marks})"
+        params += list(after)
+    order = ", ".join(f"{column} DESC" if descending else column for column in columns)
+    return f"SELECT * FROM ({_base(sql)}) {where} ORDER BY {order} LIMIT ?", params + [limit]
+
+
+def page_columns(key, sort=None):
+    return ([sort] if sort else []) + list(key if isinstance(key, tuple) else (key,))
+
+
+# Sample parameters for planned_queries(): a doctor, a nurse, logins, a patient
+# and their name and two letters of it, the first day of the sampled date ranges, and a
+# specialization and department to schedule in
+SAMPLES = {
+    "doc_id": 100,
+    "nurse_id": 301,
+    "username": "john_doe",
+    "identity": "Thalia",
+    "staff_name": "fatima",
+    "pat_id": 970,
+    "patient": "Ira",
+    "short_term": "ra",
+    "day": date(2021, 1, 1),
+    "specialization": "Oncologist",
+    "dept_id": 101,
+}
+
+
+# Read queries checked by check_query_plans(), with sample parameters.
+# Name searches are checked with a trigram term and a shorter one, named
+# " short term" (see search.py).
+# samples overrides entries of SAMPLES, e.g. with values from other data.
+def planned_queries(samples=None):
+    samples = {**SAMPLES, **(samples or {})}
+    doc_id, patient, day = samples["doc_id"], samples["patient"], samples["day"]
+    week = (day.isoformat(), (day + timedelta(days=6)).isoformat())
+    month = (day.isoformat(), (day + timedelta(days=29)).isoformat())
+    year = (day.isoformat(), (day + timedelta(days=364)).isoformat())
+    planned = [
+        ("LOGIN", LOGIN, (samples["username"],)),
+        ("IDENTITY_BY_USERNAME", IDENTITY_BY_USERNAME, (samples["identity"],)),
+        ("STAFF_MEMBER", STAFF_MEMBER, (samples["staff_name"], samples["staff_name"])),
+        ("APPOINTMENTS_BETWEEN", APPOINTMENTS_BETWEEN, week),
+        ("DOCTOR_APPOINTMENTS_BETWEEN", DOCTOR_APPOINTMENTS_BETWEEN, (doc_id, *week)),
+        ("BILLING_BETWEEN", BILLING_BETWEEN, week),
+        ("LATEST_APPOINTMENT_DAY", LATEST_APPOINTMENT_DAY, week[1:]),
+        ("PATIENT_FLOW", PATIENT_FLOW, month),
+        ("DEPARTMENT_STATS", DEPARTMENT_STATS, month),
+        ("DOCTOR_LOAD", DOCTOR_LOAD, month),
+        ("BILLED_DAYS", BILLED_DAYS, ()),
+        ("REVENUE_BY_PERIOD", REVENUE_BY_PERIOD, ("%Y-%m", *year)),
+        ("REVENUE_BY_ITEM", REVENUE_BY_ITEM, year),
+        ("REVENUE_BY_PATIENT_TYPE", REVENUE_BY_PATIENT_TYPE, year),
+        ("TOP_PATIENTS", TOP_PATIENTS, (*year, 10)),
+        ("ITEM_COUNTS", ITEM_COUNTS, year),
+        ("ITEM_AMOUNTS", ITEM_AMOUNTS, year),
+        ("UNDATED_INVOICES", UNDATED_INVOICES, ()),
+        ("DOCTOR_APPOINTMENTS", DOCTOR_APPOINTMENTS, (doc_id,)),
+        ("DOCTOR_APPOINTMENTS range", *doctor_appointments(doc_id, day, day + timedelta(days=31))),
+        ("APPOINTMENTS_IN_RANGE", *appointments_in_range(datetime.combine(day, time(9)), day + timedelta(days=7))),
+        ("DOCTOR_PATIENTS", DOCTOR_PATIENTS, (doc_id,)),
+        ("PATIENT_HISTORY_LATEST", PATIENT_HISTORY_LATEST, (samples["pat_id"], 20)),
+        ("PATIENT_HISTORY_BEFORE", PATIENT_HISTORY_BEFORE, (samples["pat_id"], f"{day} 12:00:00", 1, 20)),
+        ("SPECIALIZATIONS", SPECIALIZATIONS, ()),
+        ("DOCTORS_BY_SPECIALIZATION", DOCTORS_BY_SPECIALIZATION, (samples["specialization"],)),
+        ("DOCTORS_BY_DEPARTMENT", DOCTORS_BY_DEPARTMENT, (samples["dept_id"],)),
+        ("DOCTOR_SCHEDULE", DOCTOR_SCHEDULE, (doc_id,)),
+        ("APPOINTMENT_CONFLICT", APPOINTMENT_CONFLICT,
+         (doc_id, f"{day} 05:00:00", f"{day} 09:30:00", f"{day} 09:00:00")),
+    ]
+    nurse_id = samples["nurse_id"]
+    short = samples["short_term"]
+    for term, suffix in ((None, ""), (patient.lower(), ""), (short, " short term")):
+        planned.append(("NURSE_APPOINTMENTS" + suffix, *nurse_appointments(nurse_id, term)))
+        planned.append(("NURSE_SEARCH_DOCTOR" + suffix, *nurse_search_doctor(nurse_id, term)))
+    planned.append(("NURSE_HAS_ASSIGNMENTS", NURSE_HAS_ASSIGNMENTS, (nurse_id,)))
+    for term, suffix in ((patient.lower(), ""), (short, " short term")):
+        planned.append(("PATIENTS_BY_NAME" + suffix, *patients_by_name(term)))
+        planned.append(("PATIENT_APPOINTMENTS" + suffix, *patient_appointments(term)))
+        planned.append(("PATIENT_DOCTORS" + suffix, *patient_doctors(term)))
+    # Pages after the first, as fetched by pagination.py
+    for name, sql, params, key in (
+        ("DOCTOR_APPOINTMENTS page", DOCTOR_APPOINTMENTS, (doc_id,), "appt_id"),
+        ("DOCTOR_APPOINTMENTS range page", *doctor_appointments(doc_id, day), "appt_id"),
+        ("DOCTOR_PATIENTS page", DOCTOR_PATIENTS, (doc_id,), "pat_id"),
+        ("NURSE_APPOINTMENTS page", *nurse_appointments(nurse_id), "appt_id"),
+        ("NURSE_SEARCH_DOCTOR page", *nurse_search_doctor(nurse_id), ("pat_id", "doc_id")),
+        ("PATIENT_APPOINTMENTS page", *patient_appointments(patient.lower()), "appt_id"),
+        ("PATIENT_DOCTORS page", *patient_doctors(patient.lower()), ("pat_id", "doc_id")),
+    ):
+        after = [1] * (len(key) if isinstance(key, tuple) else 1)
+        planned.append((name, *page_sql(sql, params, key, after=after)))
+    return planned
+
+
+# Tables that grow with hospital activity; a full scan of any of them is a regression
+LARGE_TABLES = {
+    "APPOINTMENT", "PATIENT", "DOCTOR", "STAFF", "NURSE", "NURSE_ASSIGNMENT", "ADMIN",
+    "BILLING", "MEDICAL_HISTORY", "UPDATED_HISTORY", "PATIENT_HISTORY", "USER_DATA", "USER_IDENTITY",
+    "AGG_APPT_DOCTOR_DAILY", "AGG_APPT_DEPT_DAILY", "AGG_APPT_TYPE_DAILY", "AGG_BILLING_DAILY",
+}
+
+# Scans that are known and accepted for now, per query. Billing reports
+# aggregate every invoice in the range; they scan a covering index, as does
+# the list of specializations.
+ALLOWED_SCANS = {
+    name: {"BILLING"}
+    for name in ("REVENUE_BY_ITEM", "REVENUE_BY_PATIENT_TYPE", "TOP_PATIENTS", "ITEM_COUNTS", "ITEM_AMOUNTS")
+}
+ALLOWED_SCANS["SPECIALIZATIONS"] = {"DOCTOR"}
+# Name terms too short for trigrams scan the patient name indexes
+ALLOWED_SCANS.update({
+    name + " short term": {"PATIENT"}
+    for name in ("NURSE_APPOINTMENTS", "NURSE_SEARCH_DOCTOR", "PATIENTS_BY_NAME", "PATIENT_APPOINTMENTS", "PATIENT_DOCTORS")
+})
+
+_SQL_KEYWORDS = {
+    "ON", "WHERE", "JOIN", "LEFT", "RIGHT", "FULL", "INNER", "OUTER", "CROSS",
+    "GROUP", "ORDER", "LIMIT", "UNION", "USING", "NATURAL",
+}
+
+
+def _table_aliases(conn, sql, aliases=None):
+    # Map each alias (and bare table name) in sql to its table, expanding views
+    if aliases is None:
+        aliases = {}
+    sql = re.sub(r"--[^\n]*", "", sql)
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.IGNORECASE):
+        if alias.upper() in _SQL_KEYWORDS:
+            alias = ""
+        aliases[table.upper()] = table.upper()
+        if alias:
+            aliases[alias.upper()] = table.upper()
+        view = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ? COLLATE NOCASE", (table,)
+        ).fetchone()
+        if view:
+            _table_aliases(conn, view[0], aliases)
+    return aliases
+
+
+def full_scans(conn, sql, params=()):
+    """Return the tables a query reads with a full table or index scan."""
+    aliases = _table_aliases(conn, sql)
+    scanned = set()
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+        detail = row[3]
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and "VIRTUAL TABLE" not in detail:
+            name = match.group(1).upper()
+            scanned.add(aliases.get(name, name))
+    return scanned
+
+
+def check_query_plans(conn):
+    """Return (query name, table) for every unexpected scan of a large table."""
+    problems = []
+    for name, sql, params in planned_queries():
+        bad = (full_scans(conn, sql, params) & LARGE_TABLES) - ALLOWED_SCANS.get(name, set())
+        problems.extend((name, table) for table in sorted(bad) if (name, table) not in problems)
+    return problems
+
+
+# Checks the database as it is, read-only: missing indexes show up as scans.
+# tests/test_query_plans.py runs the same check on a freshly migrated database.
+if __name__ == "__main__":
+    import pathlib
+    import sqlite3
+
+    from db import DB_PATH
+
+    conn = sqlite3.connect(pathlib.Path(DB_PATH).absolute().as_uri() + "?mode=ro", uri=True)
+    problems = check_query_plans(conn)
+    conn.close()
+    for name, table in problems:
+        print(f"{name}: full scan of {table}")
+    if problems:
+        sys.exit(1)
+    print(f"All {len(planned_queries())} query plans use indexes on large tables.")
@@ -0,0 +1,478 @@
+# Timing of every statement run on the app's and the loader's connections
+# (see db.py): latency histograms and row counts per query and calling page,
+# a log of slow statements with their query plan, and the same figures as a
+# Prometheus text file for node_exporter's textfile collector.
+
+import contextvars
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Statements slower than this are logged with their query plan
+SLOW_QUERY_SECONDS = float(os.environ.get("HOSPITAL_SLOW_QUERY_MS", "100")) / 1000
+SLOW_QUERY_LOG = os.environ.get("HOSPITAL_SLOW_QUERY_LOG", "slow_queries.log")
+# Slow statements kept in memory for the Admin System page
+RECENT_SLOW = 50
+
+METRICS_FILE = os.environ.get("HOSPITAL_METRICS_FILE", "hospital_metrics.prom")
+# Once enabled, the metrics file is rewritten at most this often
+METRICS_INTERVAL = 15.0
+
+# Page (or job) that statements are attributed to, e.g. "Doctor/Appointments"
+_page = contextvars.ContextVar("hospital_page", default="-")
+
+# Statements with a query plan and, for reads, parameters worth logging
+_PLANNED = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+_READS = ("SELECT", "WITH")
+
+# Schema statements and PRAGMAs, named after the object or setting they act
+# on: "CREATE INDEX idx_appointment_doc_pat", "PRAGMA journal_mode"
+_SCHEMA_OBJECT = re.compile(
+    r"(CREATE|DROP)\s+(?:(?:UNIQUE|TEMP|TEMPORARY|VIRTUAL)\s+)*(TABLE|INDEX|TRIGGER|VIEW)\s+"
+    r"(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([\w.]+)",
+    re.IGNORECASE,
+)
+_ACTS_ON = re.compile(r"(ALTER\s+TABLE|ANALYZE|REINDEX|PRAGMA)\s+([\w.]+)", re.IGNORECASE)
+
+
+def current_page():
+    return _page.get()
+
+
+def set_page(name):
+    _page.set(name)
+
+
+@contextmanager
+def page(name):
+    token = _page.set(name)
+    try:
+        yield
+    finally:
+        _page.reset(token)
+
+
+def normalize(sql):
+    return " ".join(sql.split()).rstrip(";").strip()
+
+
+def statement_kind(text):
+    match = re.match(r"\w+", text)
+    return match.group(0).upper() if match else ""
+
+
+_known = None
+_names = {}
+
+
+def query_name(sql):
+    """Name of the queries.py constant sql comes from, or a label for it.
+
+    SQL built around a constant (a page of it, or a name filter added) is
+    named after the constant with " (variant)"; other statements by kind,
+    table and a short hash of their text, and schema statements and
+    PRAGMAs after what they act on.
+    """
+    global _known
+    name = _names.get(sql)
+    if name is not None:
+        return name
+    text = normalize(sql)
+    if _known is None:
+        import queries
+        _known = {
+            normalize(value): key for key, value in vars(queries).items()
+            if key.isupper() and isinstance(value, str) and statement_kind(normalize(value)) in _PLANNED
+        }
+    kind = statement_kind(text)
+    name = None if kind in _PLANNED else schema_name(text)
+    if name is None:
+        name = _known.get(text)
+    if name is None:
+        contained = [known for known in _known if known in text]
+        if contained:
+            name = _known[max(contained, key=len)] + " (variant)"
+    if name is None and kind in _PLANNED:
+        table = re.search(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", text, re.IGNORECASE)
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:6]
+        name = f"{kind} {table.group(1) if table else '?'} #{digest}"
+    if name is None:
+        # BEGIN, COMMIT, SAVEPOINT, EXPLAIN, ...
+        name = kind or "?"
+    if len(_names) < 10000:
+        _names[sql] = name
+    return name
+
+
+def schema_name(text):
+    """"CREATE INDEX idx_x", "PRAGMA journal_mode", ... for text, or None."""
+    match = _SCHEMA_OBJECT.match(text)
+    if match:
+        return f"{match.group(1).upper()} {match.group(2).upper()} {match.group(3)}"
+    match = _ACTS_ON.match(text)
+    if match:
+        return f"{' '.join(match.group(1).upper().split())} {match.group(2)}"
+    return None
+
+
+def histogram_quantile(q, counts, maximum):
+    """Estimate quantile q (0-1) from per-bucket counts over BUCKETS.
+
+    Interpolates linearly within the bucket, as Prometheus does; values
+    past the last bucket are taken as the largest one seen.
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    lower = 0.0
+    for upper, count in zip(BUCKETS + (maximum,), counts):
+        if count and seen + count >= rank:
+            return min(lower + (upper - lower) * (rank - seen) / count, maximum)
+        seen += count
+        lower = upper
+    return maximum
+
+
+class QueryStats:
+    """Latency histograms, row counts and slow statements, per query and page."""
+
+    def __init__(self, slow_seconds=SLOW_QUERY_SECONDS, slow_log=SLOW_QUERY_LOG):
+        self.slow_seconds = slow_seconds
+        self.slow_log = slow_log
+        self._lock = threading.Lock()
+        self._series = {}
+        self._sql = {}
+        self._slow = deque(maxlen=RECENT_SLOW)
+        self._since = time.time()
+
+    def record(self, conn, sql, params, seconds, rows, page_name):
+        name = query_name(sql)
+        with self._lock:
+            series = self._series.get((name, page_name))
+            if series is None:
+                series = {"calls": 0, "rows": 0, "seconds": 0.0, "max": 0.0, "slow": 0,
+                          "buckets": [0] * (len(BUCKETS) + 1)}
+                self._series[(name, page_name)] = series
+                self._sql.setdefault(name, normalize(sql))
+            series["calls"] += 1
+            series["rows"] += rows
+            series["seconds"] += seconds
+            series["max"] = max(series["max"], seconds)
+            series["buckets"][_bucket(seconds)] += 1
+            slow = seconds >= self.slow_seconds
+            if slow:
+                series["slow"] += 1
+        if slow:
+            self._log_slow(conn, name, sql, params, seconds, rows, page_name)
+
+    def _log_slow(self, conn, name, sql, params, seconds, rows, page_name):
+        kind = statement_kind(normalize(sql))
+        entry = {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "page": page_name,
+            "query": name,
+            "ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "sql": normalize(sql),
+            # Writes can carry password hashes, so only reads log their values
+            "params": _loggable(params) if kind in _READS else None,
+            "plan": explain(conn, sql, params) if kind in _PLANNED else [],
+        }
+        with self._lock:
+            self._slow.append(entry)
+        if self.slow_log:
+            try:
+                with open(self.slow_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError:
+                pass
+
+    def snapshot(self):
+        """One dict per (query, page), the most total time first."""
+        with self._lock:
+            series = {key: dict(value, buckets=list(value["buckets"])) for key, value in self._series.items()}
+            sql = dict(self._sql)
+        rows = []
+        for (name, page_name), s in series.items():
+            rows.append({
+                "query": name,
+                "page": page_name,
+                "calls": s["calls"],
+                "rows": s["rows"],
+                "total_ms": round(s["seconds"] * 1000, 3),
+                "mean_ms": round(s["seconds"] * 1000 / s["calls"], 3),
+                "p50_ms": round(histogram_quantile(0.50, s["buckets"], s["max"]) * 1000, 3),
+                "p95_ms": round(histogram_quantile(0.95, s["buckets"], s["max"]) * 1000, 3),
+                "p99_ms": round(histogram_quantile(0.99, s["buckets"], s["max"]) * 1000, 3),
+                "max_ms": round(s["max"] * 1000, 3),
+                "slow": s["slow"],
+                "sql": sql[name],
+                "buckets": s["buckets"],
+                "seconds": s["seconds"],
+            })
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def since(self):
+        return self._since
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._slow.clear()
+            self._since = time.time()
+
+
+def _bucket(seconds):
+    for i, upper in enumerate(BUCKETS):
+        if seconds <= upper:
+            return i
+    return len(BUCKETS)
+
+
+def _loggable(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: _loggable_value(value) for key, value in params.items()}
+    return [_loggable_value(value) for value in params]
+
+
+def _loggable_value(value):
+    if isinstance(value, str) and len(value) > 100:
+        return value[:100] + "..."
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    return value
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN of sql, one line per step, or [] if it cannot run."""
+    try:
+        # A plain cursor, so the EXPLAIN itself is not timed
+        cursor = sqlite3.Cursor(conn)
+        try:
+            plan = cursor.execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+        finally:
+            cursor.close()
+    except sqlite3.Error:
+        return []
+    depth = {0: -1}
+    lines = []
+    for node, parent, unused, detail in plan:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+class StatsCursor(sqlite3.Cursor):
+    """Cursor that times its statements and counts the rows they return.
+
+    A statement's time is spent in execute() and in the fetches of its
+    rows; it is recorded once the rows run out, or when the cursor is
+    closed, runs another statement or is dropped.
+    """
+
+    _open = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._open = [sql, parameters, 0.0, 0, _page.get()]
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._open[2] += time.perf_counter() - start
+        if self.description is None:
+            # No result rows (a write, DDL, BEGIN/COMMIT): done once it has run
+            self._open[3] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._open = [sql, None, 0.0, 0, _page.get()]
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self._open[2] += time.perf_counter() - start
+        self._open[3] = max(self.rowcount, 0)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _fetched(self, start, rows, done):
+        if self._open is None:
+            return
+        self._open[2] += time.perf_counter() - start
+        self._open[3] += rows
+        if done:
+            self._finish()
+
+    def _finish(self):
+        statement, self._open = self._open, None
+        if statement is None:
+            return
+        sql, params, seconds, rows, page_name = statement
+        _stats.record(self.connection, sql, params, seconds, rows, page_name)
+        maybe_write_metrics()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors are StatsCursors, for connect(factory=...)."""
+
+    def cursor(self, factory=StatsCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute() makes its cursor without calling cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+_stats = QueryStats()
+
+
+def get_stats():
+    return _stats
+
+
+# Other figures exported with the query metrics: (prefix, fn() -> dict of numbers)
+_gauges = []
+
+
+def add_gauges(prefix, fn):
+    _gauges.append((prefix, fn))
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """The query statistics and registered gauges in Prometheus text format."""
+    series = _stats.snapshot()
+    lines = [
+        "# HELP hospital_query_duration_seconds Time spent running SQLite statements and fetching their rows.",
+        "# TYPE hospital_query_duration_seconds histogram",
+    ]
+    for s in series:
+        labels = f'query="{_label(s["query"])}",page="{_label(s["page"])}"'
+        cumulative = 0
+        for upper, count in zip(BUCKETS, s["buckets"]):
+            cumulative += count
+            lines.append(f'hospital_query_duration_seconds_bucket{{{labels},le="{upper}"}} {cumulative}')
+        lines.append(f'hospital_query_duration_seconds_bucket{{{labels},le="+Inf"}} {s["calls"]}')
+        lines.append(f"hospital_query_duration_seconds_sum{{{labels}}} {s['seconds']:.6f}")
+        lines.append(f"hospital_query_duration_seconds_count{{{labels}}} {s['calls']}")
+    for metric, field, help_text in (
+        ("hospital_query_rows_total", "rows", "Rows returned by, or written by, SQLite statements."),
+        ("hospital_slow_queries_total", "slow", f"Statements slower than {_stats.slow_seconds}s."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for s in series:
+            lines.append(f'{metric}{{query="{_label(s["query"])}",page="{_label(s["page"])}"}} {s[field]}')
+    for prefix, fn in _gauges:
+        try:
+            values = fn()
+        except Exception:
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric = f"hospital_{prefix}_{key}"
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+_metrics_lock = threading.Lock()
+_metrics_path = None
+_metrics_written = 0.0
+
+
+def write_metrics(path=None):
+    path = path or _metrics_path or METRICS_FILE
+    # Written under a temporary name and renamed, so a scraper never reads half a file
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(partial, path)
+    return path
+
+
+# Keep the metrics file current from here on; each process exporting
+# metrics needs a file of its own
+def write_metrics_periodically(path=METRICS_FILE):
+    global _metrics_path
+    _metrics_path = path
+
+
+def maybe_write_metrics():
+    global _metrics_written
+    if not _metrics_path or time.monotonic() - _metrics_written < METRICS_INTERVAL:
+        return
+    # One thread writes; the others carry on
+    if not _metrics_lock.acquire(blocking=False):
+        return
+    try:
+        _metrics_written = time.monotonic()
+        write_metrics()
+    except OSError:
+        pass
+    finally:
+        _metrics_lock.release()
@@ -0,0 +1,290 @@
+# Read-only snapshots of the database for the pages that only read (see
+# db.snapshot_reads). A background thread copies the primary with the
+# SQLite backup API, BACKUP_PAGES pages per step with a pause between
+# steps, so no lock on the primary is held for long. Each copy is written
+# to a new numbered file next to the database and renamed into place when
+# complete; reads then move to it, and older copies are removed once no
+# connection is using them.
+#
+# Reads go to the snapshot only while it is at most MAX_STALENESS seconds
+# behind the primary, and to the primary otherwise. PRAGMA data_version
+# tells when nothing has been committed since the last copy, in which case
+# the snapshot is still current and no copy is made. Commits are not copied
+# straight away either: a new copy is only made once the snapshot would
+# otherwise go stale before the next refresh, so a database that is written
+# to all the time is copied every MAX_STALENESS - REFRESH_SECONDS seconds or
+# so, and results cached from a snapshot (see cache.py) last that long.
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from db import DB_PATH, ConnectionPool, get_pool, set_snapshot_source
+from query_stats import add_gauges
+
+ENABLED = os.environ.get("HOSPITAL_REPLICA", "1").lower() not in ("", "0", "false", "off")
+MAX_STALENESS = float(os.environ.get("HOSPITAL_REPLICA_MAX_STALENESS", "30"))
+REFRESH_SECONDS = float(os.environ.get("HOSPITAL_REPLICA_REFRESH", "10"))
+
+BACKUP_PAGES = 256
+BACKUP_PAUSE = 0.005
+# Writes restart a copy in progress; one that has copied this many times the
+# database's pages is finished in a single step instead (in WAL mode, which
+# the primary uses, a reader does not hold writers up), or else abandoned
+# until the next refresh
+MAX_COPY_PASSES = 4
+
+
+class CopyAbandoned(sqlite3.OperationalError):
+    pass
+
+
+class ReplicaManager:
+    """Snapshots of the primary database, and a read-only pool on the latest."""
+
+    def __init__(self, path=DB_PATH, max_staleness=MAX_STALENESS, refresh_seconds=REFRESH_SECONDS):
+        self.path = path
+        self.max_staleness = max_staleness
+        self.refresh_seconds = refresh_seconds
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Kept open: PRAGMA data_version only sees other connections' commits
+        self._source = None
+        self._data_version = None
+        self._generation = 0
+        self._pool = None
+        # time.time() when the snapshot was last known to match the primary
+        self._synced_at = None
+        self._retired = []
+        # Callers using a pool's connections, by pool; its file is not
+        # removed while any are
+        self._pending = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._counters = {
+            "copies": 0,
+            "unchanged": 0,
+            "deferred": 0,
+            "failures": 0,
+            "snapshot_reads": 0,
+            "primary_reads": 0,
+            "pages": 0,
+            "copy_seconds": 0.0,
+        }
+
+    def snapshot_path(self, generation):
+        # One series of files per process, so processes sharing the database do not collide
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.replica-{os.getpid()}-{generation}{ext or '.db'}"
+
+    def _fresh(self):
+        return self._pool is not None and time.time() - self._synced_at <= self.max_staleness
+
+    def lag(self):
+        """Seconds the snapshot may be behind the primary; None before the first copy."""
+        with self._lock:
+            synced_at = self._synced_at
+        return None if synced_at is None else max(time.time() - synced_at, 0.0)
+
+    def current_generation(self):
+        """The snapshot reads are served from now, or None when they go to the primary."""
+        with self._lock:
+            return self._generation if self._fresh() else None
+
+    def connection(self):
+        """A pooled connection to the snapshot, or None when it is too stale to read."""
+        with self._lock:
+            fresh = self._fresh()
+            self._counters["snapshot_reads" if fresh else "primary_reads"] += 1
+        return self._checkout() if fresh else None
+
+    @contextmanager
+    def _checkout(self):
+        # The pool is picked and counted when the caller enters this, under
+        # the lock that retiring a pool takes: a refresh in between just
+        # means the newer snapshot is read, and a caller that never enters
+        # holds no file up
+        with self._lock:
+            pool = self._pool
+            if pool is not None:
+                self._pending[pool] = self._pending.get(pool, 0) + 1
+        if pool is None:
+            # Closed since; read the primary
+            with get_pool().connection() as conn:
+                yield conn
+            return
+        try:
+            with pool.connection() as conn:
+                yield conn
+        finally:
+            with self._lock:
+                self._pending[pool] -= 1
+                if not self._pending[pool]:
+                    del self._pending[pool]
+
+    def _copy(self, target):
+        # Returns the pages copied, counting those of restarted passes
+        copied = 0
+        left = None
+
+        def progress(status, remaining, total):
+            nonlocal copied, left
+            copied += min(BACKUP_PAGES, total if left is None else left)
+            left = remaining
+            if remaining and copied > MAX_COPY_PASSES * total:
+                raise CopyAbandoned("The database changed too often to finish copying it")
+            # backup() only sleeps when the database is locked; give writers
+            # their turn between steps as well
+            if remaining:
+                time.sleep(BACKUP_PAUSE)
+
+        dest = sqlite3.connect(target)
+        try:
+            try:
+                self._source.backup(dest, pages=BACKUP_PAGES, progress=progress, sleep=BACKUP_PAUSE)
+            except CopyAbandoned:
+                if self._source.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                    raise
+                self._source.backup(dest)
+                copied += dest.execute("PRAGMA page_count").fetchone()[0]
+            # The copy is only ever read, and must not need a -wal or -shm file
+            dest.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            dest.close()
+        return copied
+
+    def refresh(self):
+        """Bring the snapshot up to date with the primary; True if a new copy was made."""
+        with self._refresh_lock:
+            if self._stop.is_set():
+                return False
+            try:
+                if self._source is None:
+                    self._source = sqlite3.connect(self.path, check_same_thread=False)
+                checked_at = time.time()
+                version = self._source.execute("PRAGMA data_version").fetchone()[0]
+                if self._pool is not None and version == self._data_version:
+                    with self._lock:
+                        self._synced_at = checked_at
+                        self._counters["unchanged"] += 1
+                    return False
+                if self._pool is not None and not self._copy_due(checked_at):
+                    with self._lock:
+                        self._counters["deferred"] += 1
+                    return False
+
+                generation = self._generation + 1
+                path = self.snapshot_path(generation)
+                partial = path + ".part"
+                started = time.perf_counter()
+                try:
+                    pages = self._copy(partial)
+                    os.replace(partial, path)
+                finally:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+            except (sqlite3.Error, OSError) as e:
+                with self._lock:
+                    self._counters["failures"] += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+            finally:
+                self._remove_retired()
+
+            pool = ConnectionPool(path, read_only=True)
+            with self._lock:
+                if self._pool is not None:
+                    self._retired.append(self._pool)
+                self._pool = pool
+                self._generation = generation
+                self._data_version = version
+                # The copy holds at least every commit made before it started
+                self._synced_at = checked_at
+                self._counters["copies"] += 1
+                self._counters["pages"] += pages
+                self._counters["copy_seconds"] = round(time.perf_counter() - started, 3)
+            self.last_error = None
+            return True
+
+    def _copy_due(self, now):
+        # Would the snapshot go stale before a copy started at the next
+        # refresh is done? Copies take about as long as the last one did.
+        with self._lock:
+            age = now - self._synced_at
+            copy_seconds = self._counters["copy_seconds"]
+        return age + self.refresh_seconds + copy_seconds >= self.max_staleness
+
+    def _remove_retired(self):
+        with self._lock:
+            # Pools with callers still to check out or return a connection,
+            # and those with connections in use, are removed on a later refresh
+            retired = [pool for pool in self._retired if pool not in self._pending]
+        for pool in retired:
+            pool.close()
+            if pool.stats()["in_use"]:
+                continue
+            try:
+                os.remove(pool.path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Windows keeps a file with an open handle; try again next time
+                continue
+            with self._lock:
+                self._retired.remove(pool)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="hospital-db-replica", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_seconds)
+
+    def close(self):
+        # Remove this process's snapshot files; run at exit once started
+        self._stop.set()
+        # Waits for a copy in progress, which would leave its file behind
+        with self._refresh_lock:
+            with self._lock:
+                if self._pool is not None:
+                    self._retired.append(self._pool)
+                    self._pool = None
+            self._remove_retired()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["generation"] = self._generation
+            stats["fresh"] = int(self._fresh())
+            stats["max_staleness_seconds"] = self.max_staleness
+            synced_at = self._synced_at
+        if synced_at is not None:
+            stats["lag_seconds"] = round(max(time.time() - synced_at, 0.0), 3)
+        return stats
+
+
+_replica = ReplicaManager()
+add_gauges("replica", _replica.stats)
+
+
+def get_replica():
+    return _replica
+
+
+# Serve snapshot_reads() from snapshots refreshed in the background, from
+# here on. With HOSPITAL_REPLICA=0, every read goes to the primary.
+def start_replication():
+    if not ENABLED:
+        return
+    set_snapshot_source(_replica)
+    _replica.start()
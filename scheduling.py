@@ -0,0 +1,409 @@
+# Appointment scheduling: free-slot search across the doctors of a
+# specialization or department, and booking that never double-books a
+# doctor.
+#
+# Each doctor's appointments are held in memory as an interval tree, built
+# from APPOINTMENT the first time the doctor is needed and updated as
+# bookings commit, so a slot search reads no rows. A booking is checked
+# against the tree first, then again in SQL inside the writer's transaction
+# (see db.WriterQueue): the database, not the tree, decides whether the
+# slot is free, so bookings from other processes or sessions cannot overlap.
+
+import heapq
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import queries
+from db import get_db_connection, get_pool, get_writer
+from migrations import APPOINTMENT_MINUTES
+from query_stats import add_gauges
+
+# Slots start on multiples of SLOT_MINUTES within opening hours
+SLOT_MINUTES = 15
+OPEN_HOUR = 8
+CLOSE_HOUR = 18
+MAX_MINUTES = 240
+# Days ahead searched for free slots
+SEARCH_DAYS = 14
+
+# Timestamps as stored in START_TS and END_TS
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class SlotTaken(RuntimeError):
+    pass
+
+
+def to_ts(value):
+    return value.strftime(TS_FORMAT)
+
+
+def from_ts(text):
+    return datetime.fromisoformat(text)
+
+
+class _Node:
+    __slots__ = ("start", "end", "key", "priority", "left", "right", "max_end")
+
+    def __init__(self, start, end, key):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+def _update(node):
+    node.max_end = node.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+
+def _update_all(node):
+    if node.left is not None:
+        _update_all(node.left)
+    if node.right is not None:
+        _update_all(node.right)
+    _update(node)
+
+
+def _rotate_right(node):
+    top = node.left
+    node.left = top.right
+    top.right = node
+    _update(node)
+    _update(top)
+    return top
+
+
+def _rotate_left(node):
+    top = node.right
+    node.right = top.left
+    top.left = node
+    _update(node)
+    _update(top)
+    return top
+
+
+def _merge(left, right):
+    # Every start in left sorts before every start in right
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+class IntervalTree:
+    """Half-open intervals [start, end), each with a key (an APPT_ID).
+
+    A treap ordered by (start, key), whose nodes also hold the latest end in
+    their subtree: a search skips every subtree that ends before the window,
+    and everything right of a node that starts after it.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    @classmethod
+    def from_sorted(cls, intervals):
+        """A tree of intervals already in (start, key) order, built in linear time.
+
+        Each node goes on the right spine, below the first node of higher
+        priority, taking the spine beneath that as its left subtree.
+        """
+        tree = cls()
+        spine = []
+        for start, end, key in intervals:
+            node = _Node(start, end, key)
+            left = None
+            while spine and spine[-1].priority < node.priority:
+                left = spine.pop()
+            node.left = left
+            if spine:
+                spine[-1].right = node
+            spine.append(node)
+            tree._size += 1
+        if spine:
+            tree._root = spine[0]
+            _update_all(tree._root)
+        return tree
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, start, end, key):
+        self._root = self._insert(self._root, _Node(start, end, key))
+        self._size += 1
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if (new.start, new.key) < (node.start, node.key):
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                return _rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                return _rotate_left(node)
+        _update(node)
+        return node
+
+    def remove(self, start, key):
+        """Remove the interval starting at start with key; False if there is none."""
+        size = self._size
+        self._root = self._remove(self._root, start, key)
+        return self._size < size
+
+    def _remove(self, node, start, key):
+        if node is None:
+            return None
+        if (start, key) == (node.start, node.key):
+            self._size -= 1
+            return _merge(node.left, node.right)
+        if (start, key) < (node.start, node.key):
+            node.left = self._remove(node.left, start, key)
+        else:
+            node.right = self._remove(node.right, start, key)
+        _update(node)
+        return node
+
+    def overlapping(self, start, end):
+        """(start, end, key) of the intervals overlapping [start, end), by start."""
+        found = []
+        self._collect(self._root, start, end, found)
+        return found
+
+    def _collect(self, node, start, end, found):
+        if node is None or node.max_end <= start:
+            return
+        self._collect(node.left, start, end, found)
+        if node.start >= end:
+            return
+        if node.end > start:
+            found.append((node.start, node.end, node.key))
+        self._collect(node.right, start, end, found)
+
+    def overlaps(self, start, end):
+        node = self._root
+        # Walk down towards the earliest-starting interval that can overlap
+        while node is not None and node.max_end > start:
+            if node.left is not None and node.left.max_end > start:
+                node = node.left
+            elif node.start < end and node.end > start:
+                return True
+            elif node.start >= end:
+                return False
+            else:
+                node = node.right
+        return False
+
+
+class Schedule:
+    """Interval trees of doctors' appointments, by DOC_ID.
+
+    A tree is built from APPOINTMENT when its doctor is first needed, and
+    rebuilt after max_age seconds, which bounds how long an appointment
+    written outside this process (e.g. by a Hospital.py load) goes unseen
+    by the slot search. Bookings are checked in SQL regardless.
+    """
+
+    def __init__(self, max_age=300.0):
+        self.max_age = max_age
+        self._trees = {}
+        self._lock = threading.Lock()
+        self._counters = {"builds": 0, "booked": 0, "rejected": 0, "conflicts": 0}
+
+    def _build(self, doc_id):
+        # From the primary even within db.snapshot_reads(): the tree is kept
+        # for max_age and shared by every session
+        with get_pool().connection() as conn:
+            rows = conn.execute(queries.DOCTOR_SCHEDULE, (doc_id,)).fetchall()
+        intervals = []
+        for appt_id, start, end in rows:
+            try:
+                intervals.append((from_ts(start), from_ts(end), appt_id))
+            except ValueError:
+                # A date the loader could not read, e.g. month 0; it blocks no slot
+                continue
+        tree = IntervalTree.from_sorted(intervals)
+        with self._lock:
+            self._counters["builds"] += 1
+        return tree
+
+    def tree(self, doc_id):
+        with self._lock:
+            entry = self._trees.get(doc_id)
+        if entry is not None and time.monotonic() - entry[1] <= self.max_age:
+            return entry[0]
+        tree = self._build(doc_id)
+        with self._lock:
+            self._trees[doc_id] = (tree, time.monotonic())
+        return tree
+
+    def invalidate(self, doc_id=None):
+        with self._lock:
+            if doc_id is None:
+                self._trees.clear()
+            else:
+                self._trees.pop(doc_id, None)
+
+    def busy(self, doc_id, start, end):
+        tree = self.tree(doc_id)
+        with self._lock:
+            return tree.overlapping(start, end)
+
+    def is_free(self, doc_id, start, end):
+        tree = self.tree(doc_id)
+        with self._lock:
+            return not tree.overlaps(start, end)
+
+    def add(self, doc_id, start, end, appt_id):
+        with self._lock:
+            entry = self._trees.get(doc_id)
+            if entry is not None:
+                # A tree built since the commit already has it
+                entry[0].remove(start, appt_id)
+                entry[0].insert(start, end, appt_id)
+
+    def count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["doctors"] = len(self._trees)
+            stats["appointments"] = sum(len(tree) for tree, built_at in self._trees.values())
+        return stats
+
+
+_schedule = Schedule()
+add_gauges("schedule", _schedule.stats)
+
+
+def get_schedule():
+    return _schedule
+
+
+def doctors_for(specialization=None, dept_id=None):
+    """[(DOC_ID, DOC_NAME)] of a specialization or of a department."""
+    if specialization is not None:
+        sql, params = queries.DOCTORS_BY_SPECIALIZATION, (specialization,)
+    elif dept_id is not None:
+        sql, params = queries.DOCTORS_BY_DEPARTMENT, (dept_id,)
+    else:
+        raise ValueError("Give a specialization or a department")
+    with get_db_connection() as conn:
+        return [tuple(row) for row in conn.execute(sql, params).fetchall()]
+
+
+def next_slot(value):
+    # The first slot boundary at or after value
+    midnight = datetime.combine(value.date(), datetime.min.time())
+    step = SLOT_MINUTES * 60
+    return midnight + timedelta(seconds=math.ceil((value - midnight).total_seconds() / step) * step)
+
+
+def day_slots(busy, start, close, length):
+    """Starts of the free slots of `length` in [start, close), given the busy intervals there by start."""
+    cursor = next_slot(start)
+    for busy_start, busy_end, key in busy:
+        while cursor + length <= busy_start:
+            yield cursor
+            cursor += timedelta(minutes=SLOT_MINUTES)
+        if busy_end > cursor:
+            cursor = next_slot(busy_end)
+    while cursor + length <= close:
+        yield cursor
+        cursor += timedelta(minutes=SLOT_MINUTES)
+
+
+def doctor_slots(busy, start, close, length, doc_id, doc_name):
+    for slot in day_slots(busy, start, close, length):
+        yield slot, slot + length, doc_id, doc_name
+
+
+def free_slots(doctors, after=None, minutes=APPOINTMENT_MINUTES, limit=10, days=SEARCH_DAYS):
+    """The earliest free slots of `minutes` among doctors, [(start, end, doc_id, doc_name)].
+
+    doctors is [(DOC_ID, DOC_NAME)], e.g. from doctors_for(). Days are
+    searched in order, so the search stops at the first day that fills the
+    limit; within a day, each doctor's free slots are merged by start time.
+    """
+    if not 0 < minutes <= MAX_MINUTES:
+        raise ValueError(f"Appointments last 1 to {MAX_MINUTES} minutes")
+    schedule = get_schedule()
+    after = after or datetime.now()
+    length = timedelta(minutes=minutes)
+    found = []
+    for offset in range(days):
+        day = after.date() + timedelta(days=offset)
+        opens = datetime.combine(day, datetime.min.time()).replace(hour=OPEN_HOUR)
+        closes = opens.replace(hour=CLOSE_HOUR)
+        opens = max(opens, after)
+        if opens >= closes:
+            continue
+        per_doctor = []
+        for doc_id, doc_name in doctors:
+            busy = schedule.busy(doc_id, opens, closes)
+            per_doctor.append(doctor_slots(busy, opens, closes, length, doc_id, doc_name))
+        for slot in heapq.merge(*per_doctor):
+            found.append(slot)
+            if len(found) == limit:
+                return found
+    return found
+
+
+def book(doc_id, pat_id, start, minutes=APPOINTMENT_MINUTES):
+    """Book doctor doc_id for patient pat_id over [start, start + minutes); return the APPT_ID.
+
+    Raises SlotTaken if the doctor already has an appointment overlapping
+    it, including one committed by another writer since the tree was built.
+    """
+    if not 0 < minutes <= MAX_MINUTES:
+        raise ValueError(f"Appointments last 1 to {MAX_MINUTES} minutes")
+    schedule = get_schedule()
+    start = start.replace(microsecond=0)
+    end = start + timedelta(minutes=minutes)
+    if not schedule.is_free(doc_id, start, end):
+        schedule.count("rejected")
+        raise SlotTaken(f"Doctor {doc_id} is not free from {to_ts(start)} to {to_ts(end)}")
+
+    def insert(conn):
+        conflict = conn.execute(
+            queries.APPOINTMENT_CONFLICT,
+            (doc_id, to_ts(start - timedelta(minutes=MAX_MINUTES)), to_ts(end), to_ts(start)),
+        ).fetchone()
+        if conflict:
+            raise SlotTaken(f"Doctor {doc_id} is booked from {to_ts(start)} (appointment {conflict[0]})")
+        return conn.execute(
+            queries.INSERT_APPOINTMENT,
+            (doc_id, start.date().isoformat(), start.strftime("%H:%M:%S"), pat_id, to_ts(start), to_ts(end)),
+        ).lastrowid
+
+    try:
+        appt_id = get_writer().call(insert)
+    except SlotTaken:
+        # The tree missed an appointment; read the doctor's again next time
+        schedule.invalidate(doc_id)
+        schedule.count("conflicts")
+        raise
+    schedule.add(doc_id, start, end, appt_id)
+    schedule.count("booked")
+    return appt_id
@@ -0,0 +1,44 @@
+# Name search for the nurse and doctor pages.
+#
+# Every term is a case-insensitive substring match. Terms of three or more
+# characters go through FTS5 tables built with the trigram tokenizer, which
+# answers them from the index. Shorter terms cannot be split into trigrams,
+# so they are matched with LIKE over the NOCASE name indexes: a scan of the
+# index, which holds just the name and the ID, rather than of the table.
+# An empty term is refused rather than matching every patient.
+
+MIN_SUBSTRING_LENGTH = 3
+
+PATIENT_FTS_IDS = "SELECT rowid FROM patient_name_fts WHERE patient_name_fts MATCH ?"
+
+PATIENT_LIKE_IDS = "SELECT PAT_ID FROM PATIENT WHERE {column} LIKE ? ESCAPE '\\'"
+
+
+def fts_match(term, columns):
+    # Quote the term so FTS5 treats it as one string rather than query syntax
+    quoted = '"' + term.replace('"', '""') + '"'
+    return "{" + " ".join(columns) + "} : " + quoted
+
+
+def like_pattern(term):
+    # LIKE's wildcards in the term match themselves
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _id_filter(term, columns, fts_sql, like_sql):
+    term = (term or "").strip()
+    if not term:
+        raise ValueError("a name search needs at least one character")
+    if len(term) >= MIN_SUBSTRING_LENGTH:
+        return fts_sql, [fts_match(term, columns)]
+    sql = " UNION ".join(like_sql.format(column=column) for column in columns)
+    return sql, [like_pattern(term)] * len(columns)
+
+
+def patient_id_filter(term, columns=("FNAME", "LNAME")):
+    """Return (sql, params) for a subquery of PAT_IDs whose name contains term.
+
+    Raises ValueError if term is empty or blank.
+    """
+    return _id_filter(term, columns, PATIENT_FTS_IDS, PATIENT_LIKE_IDS)
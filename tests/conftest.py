@@ -0,0 +1,35 @@
+# Every test runs against databases in temporary directories: the app's
+# modules read their paths from the environment when first imported, so
+# these are set before any of them is.
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix="hospital-tests-")
+os.environ["HOSPITAL_DB"] = os.path.join(_scratch, "hospital.db")
+os.environ["HOSPITAL_REPLICA"] = "0"
+os.environ["HOSPITAL_SLOW_QUERY_LOG"] = os.path.join(_scratch, "slow_queries.log")
+os.environ["HOSPITAL_METRICS_FILE"] = os.path.join(_scratch, "hospital_metrics.prom")
+os.environ["HOSPITAL_PROFILE_DIR"] = os.path.join(_scratch, "profiles")
+os.environ["HOSPITAL_ARCHIVE_DIR"] = os.path.join(_scratch, "archive")
+
+import pytest  # noqa: E402
+
+import db  # noqa: E402
+from cache import get_cache  # noqa: E402
+from Hospital import create_schema  # noqa: E402
+
+
+@pytest.fixture
+def hospital_db(tmp_path, monkeypatch):
+    """An empty, fully migrated database that get_db_connection() and get_writer() use."""
+    path = str(tmp_path / "hospital.db")
+    create_schema(path)
+    pool = db.ConnectionPool(path)
+    writer = db.WriterQueue(path)
+    monkeypatch.setattr(db, "_pool", pool)
+    monkeypatch.setattr(db, "_writer", writer)
+    # Results cached from another test's database would otherwise be served
+    get_cache().clear()
+    yield path
+    writer.close()
+    pool.close()
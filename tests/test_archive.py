@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+import archive
+import db
+from archive import ArchiveManager, ArchiveTooWide
+from cache import read_sql
+from db import archive_reads, get_db_connection, get_writer
+
+# Appointments (APPT_ID, DATE, TIME) two old years and one recent one
+APPOINTMENTS = [
+    (1, "3/4/2021", "2021-03-04T09:00:00.000Z"),
+    (2, "6/7/2022", "2022-06-07T10:00:00.000Z"),
+    (3, "1/2/2025", "2025-01-02T11:00:00.000Z"),
+]
+INVOICES = [("a", "2021-03-04"), ("b", "2022-06-07"), ("c", "2025-01-02")]
+
+
+@pytest.fixture
+def archived(hospital_db, tmp_path, monkeypatch):
+    writer = get_writer()
+    writer.execute("INSERT INTO DOCTOR VALUES (3, 'Dr Hale', 'Cardiology', 'hale@example.com')")
+    writer.execute("INSERT INTO PATIENT VALUES (1, 'Ira', 'Lane', 'ira@example.com', 'Inpatient')")
+    writer.executemany("INSERT INTO APPOINTMENT (APPT_ID, DATE, TIME, PAT_ID, DOC_ID) VALUES (?, ?, ?, 1, 3)",
+                       APPOINTMENTS)
+    writer.executemany("INSERT INTO Medical_History VALUES (?, 'X-ray', ?)", [(10 + i, i) for i in (1, 2, 3)])
+    writer.executemany("INSERT INTO Billing (invoice_id, pat_id, items, amount, BILLED_ON) VALUES (?, 1, 'X-ray', 100, ?)",
+                       INVOICES)
+    manager = ArchiveManager(directory=str(tmp_path / "archive"), path=hospital_db)
+    monkeypatch.setattr(db, "_archive_source", manager)
+    manager.moved = manager.archive("2023-01-01")
+    return manager
+
+
+def count(sql, params=()):
+    with get_db_connection() as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+
+def test_old_rows_move_to_one_file_per_year(archived):
+    assert archived.moved == {
+        2021: {"Medical_History": 1, "APPOINTMENT": 1, "Billing": 1},
+        2022: {"Medical_History": 1, "APPOINTMENT": 1, "Billing": 1},
+    }
+    assert archived.years() == [2021, 2022]
+    assert all(os.path.exists(archived.year_path(year)) for year in (2021, 2022))
+    assert count("SELECT COUNT(*) FROM APPOINTMENT") == 1
+    assert archived.archive("2023-01-01") == {}
+
+
+def test_archive_reads_see_the_union_of_hot_and_archived_rows(archived):
+    with archive_reads():
+        assert count("SELECT COUNT(*) FROM APPOINTMENT") == 3
+        assert count("SELECT COUNT(*) FROM Billing WHERE BILLED_ON < '2023-01-01'") == 2
+        assert count("SELECT COUNT(*) FROM Medical_History MH JOIN APPOINTMENT A ON A.APPT_ID = MH.appt_id") == 3
+    # The views go with the connection's return to the pool
+    assert count("SELECT COUNT(*) FROM APPOINTMENT") == 1
+    with get_db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM temp.sqlite_master WHERE type = 'view'").fetchone()[0] == 0
+
+
+def test_a_range_attaches_only_its_years(archived):
+    with archive_reads("2022-01-01", "2022-12-31"):
+        with get_db_connection() as conn:
+            assert conn.archive_years == [2022]
+            assert conn.execute("SELECT APPT_ID FROM APPOINTMENT ORDER BY APPT_ID").fetchall() == [(2,), (3,)]
+
+
+def test_columns_added_since_archiving_read_as_null(archived):
+    get_writer().execute("ALTER TABLE Billing ADD COLUMN NOTE TEXT")
+    get_writer().execute("UPDATE Billing SET NOTE = 'recent'")
+    with archive_reads(), get_db_connection() as conn:
+        rows = dict(conn.execute("SELECT invoice_id, NOTE FROM Billing").fetchall())
+    assert rows == {"a": None, "b": None, "c": "recent"}
+
+
+def test_cached_results_tell_archive_reads_apart(archived):
+    sql = "SELECT COUNT(*) AS n FROM APPOINTMENT"
+    assert read_sql(sql).iloc[0, 0] == 1
+    with archive_reads():
+        assert read_sql(sql).iloc[0, 0] == 3
+    assert read_sql(sql).iloc[0, 0] == 1
+
+
+def test_dashboard_summaries_keep_counting_archived_days(archived):
+    assert count("SELECT SUM(appointments) FROM AGG_APPT_DOCTOR_DAILY") == 3
+    assert count("SELECT SUM(invoices) FROM AGG_BILLING_DAILY") == 3
+
+
+def test_ranges_wider_than_sqlite_can_attach_are_refused(archived, monkeypatch):
+    monkeypatch.setattr(archive, "MAX_ATTACHED", 1)
+    archived.check_range("2022-01-01", "2022-12-31")
+    with pytest.raises(ArchiveTooWide):
+        archived.check_range()
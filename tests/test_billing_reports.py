@@ -0,0 +1,106 @@
+import sqlite3
+from datetime import date
+
+import numpy as np
+import pytest
+
+import billing_reports
+from db import get_db_connection, get_writer
+from Hospital import create_schema
+from migrations import apply_migrations, rebuild_aggregates
+
+INVOICES = [
+    ("a", 1, "X-ray", 100.0, "2024-01-05"),
+    ("b", 1, "X-ray", 300.0, "2024-01-20"),
+    ("c", 2, "Surgery", 1000.0, "2024-02-03"),
+    ("d", 2, "", 50.0, "2024-03-15"),
+    ("e", 2, "Surgery", 2000.0, None),
+]
+
+
+@pytest.fixture
+def billing(hospital_db):
+    writer = get_writer()
+    writer.executemany(
+        "INSERT INTO PATIENT VALUES (?, ?, ?, ?, ?)",
+        [(1, "Ira", "Lane", "ira@example.com", "Inpatient"), (2, "Bo", "Kim", "bo@example.com", "Outpatient")],
+    )
+    writer.executemany("INSERT INTO Billing (invoice_id, pat_id, items, amount, BILLED_ON) VALUES (?, ?, ?, ?, ?)",
+                       INVOICES)
+    return hospital_db
+
+
+def daily(conn):
+    return conn.execute("SELECT day, invoices, amount FROM AGG_BILLING_DAILY ORDER BY day").fetchall()
+
+
+def test_undated_invoices_stay_undated_and_uncounted(billing):
+    with get_db_connection() as conn:
+        assert conn.execute("SELECT BILLED_ON FROM Billing WHERE invoice_id = 'e'").fetchone()[0] is None
+        assert len(daily(conn)) == 4
+    get_writer().call(rebuild_aggregates)
+    with get_db_connection() as conn:
+        assert conn.execute("SELECT BILLED_ON FROM Billing WHERE invoice_id = 'e'").fetchone()[0] is None
+        assert daily(conn)[0] == ("2024-01-05", 1, 100.0)
+    assert billing_reports.undated_invoices() == 1
+
+
+def test_old_trigger_that_dated_invoices_today_is_replaced(tmp_path):
+    path = str(tmp_path / "old.db")
+    create_schema(path)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        DROP TRIGGER agg_billing_ai;
+        CREATE TRIGGER agg_billing_ai AFTER INSERT ON Billing BEGIN
+            UPDATE Billing SET BILLED_ON = date('now') WHERE invoice_id = new.invoice_id AND new.BILLED_ON IS NULL;
+        END;
+    """)
+    apply_migrations(conn)
+    conn.execute("INSERT INTO PATIENT VALUES (1, 'Ira', 'Lane', 'ira@example.com', 'Inpatient')")
+    conn.execute("INSERT INTO Billing (invoice_id, pat_id, items, amount) VALUES ('z', 1, 'X-ray', 10)")
+    assert conn.execute("SELECT BILLED_ON FROM Billing").fetchone()[0] is None
+    conn.close()
+
+
+def test_billed_days_cover_dated_invoices_only(billing):
+    assert billing_reports.billed_days() == (date(2024, 1, 5), date(2024, 3, 15))
+
+
+def test_revenue_by_period(billing):
+    by_month = billing_reports.revenue_by_period(date(2024, 1, 1), date(2024, 12, 31), "Month")
+    assert by_month["revenue"].to_dict() == {"2024-01": 400.0, "2024-02": 1000.0, "2024-03": 50.0}
+    assert by_month["invoices"].to_dict() == {"2024-01": 2, "2024-02": 1, "2024-03": 1}
+
+
+def test_revenue_by_item_and_patient_type(billing):
+    start, end = date(2024, 1, 1), date(2024, 2, 29)
+    by_item = billing_reports.revenue_by_item(start, end)
+    assert by_item["revenue"].to_dict() == {"Surgery": 1000.0, "X-ray": 400.0}
+    by_type = billing_reports.revenue_by_patient_type(start, end)
+    assert by_type["revenue"].to_dict() == {"Outpatient": 1000.0, "Inpatient": 400.0}
+    top = billing_reports.top_patients(start, end, limit=1)
+    assert list(top.index) == [2]
+
+
+def test_amount_distribution_matches_numpy(billing):
+    df = billing_reports.amount_distribution(date(2024, 1, 1), date(2024, 12, 31))
+    assert list(df.index[:2]) == ["All items", "X-ray"]
+    assert set(df.index[2:]) == {"Surgery", "Unspecified"}
+    amounts = [100.0, 300.0, 1000.0, 50.0]
+    overall = df.loc["All items"]
+    assert overall["invoices"] == 4
+    assert overall["mean"] == pytest.approx(np.mean(amounts))
+    for q in billing_reports.PERCENTILES:
+        assert overall[f"p{q}"] == pytest.approx(np.percentile(amounts, q))
+    assert df.loc["X-ray", "p50"] == pytest.approx(200.0)
+
+
+def test_run_percentiles_of_several_runs():
+    values = np.array([1.0, 2.0, 3.0, 4.0, 10.0, 20.0])
+    result = billing_reports.run_percentiles(values, np.array([0, 4]), np.array([4, 2]), q=(0, 50, 100))
+    assert result.tolist() == [[1.0, 2.5, 4.0], [10.0, 15.0, 20.0]]
+
+
+def test_empty_range(billing):
+    assert billing_reports.amount_distribution(date(2030, 1, 1), date(2030, 1, 31)).empty
+    assert billing_reports.revenue_by_period(date(2030, 1, 1), date(2030, 1, 31)).empty
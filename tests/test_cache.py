@@ -0,0 +1,90 @@
+import pandas as pd
+
+import queries
+from cache import QueryCache, cached_frame, get_cache, read_sql, table_versions
+from db import get_db_connection, get_writer
+
+COUNT_PATIENTS = "SELECT COUNT(*) AS patients FROM PATIENT"
+
+
+def add_patient(pat_id):
+    get_writer().execute("INSERT INTO PATIENT VALUES (?, 'Ira', 'Lane', ?, 'Inpatient')",
+                         (pat_id, f"ira{pat_id}@example.com"))
+
+
+def patients():
+    return int(read_sql(COUNT_PATIENTS).iloc[0, 0])
+
+
+def test_a_write_to_a_table_read_makes_the_result_stale(hospital_db):
+    cache = get_cache()
+    assert patients() == 0
+    hits = cache.stats()["hits"]
+    assert patients() == 0
+    assert cache.stats()["hits"] == hits + 1
+
+    stale = cache.stats()["stale"]
+    add_patient(1)
+    assert patients() == 1
+    assert cache.stats()["stale"] == stale + 1
+
+
+def test_a_write_to_another_table_keeps_the_result(hospital_db):
+    cache = get_cache()
+    patients()
+    get_writer().execute("INSERT INTO NURSE VALUES (7, 'Nia', 'Reed')")
+    hits = cache.stats()["hits"]
+    patients()
+    assert cache.stats()["hits"] == hits + 1
+
+
+def test_reads_through_a_view_depend_on_its_tables(hospital_db):
+    writer = get_writer()
+    writer.execute("INSERT INTO NURSE VALUES (7, 'Nia', 'Reed')")
+    writer.execute("INSERT INTO DOCTOR VALUES (3, 'Dr Hale', 'Cardiology', 'hale@example.com')")
+    add_patient(1)
+    writer.execute("INSERT INTO APPOINTMENT (APPT_ID, DATE, TIME, PAT_ID, DOC_ID) "
+                   "VALUES (10, '1/5/2025', '2025-01-05 09:00:00', 1, 3)")
+    sql, params = queries.nurse_appointments(7)
+    assert read_sql(sql, params).empty
+
+    writer.execute("INSERT INTO NURSE_ASSIGNMENT (NURSE_ID, PAT_ID, ASSIGNED_FROM) VALUES (7, 1, '2025-01-01')")
+    assert list(read_sql(sql, params).iloc[:, 0]) == [10]
+
+
+def test_a_write_committed_while_computing_leaves_the_result_stale(hospital_db):
+    def compute():
+        with get_db_connection() as conn:
+            count = conn.execute(COUNT_PATIENTS).fetchone()[0]
+        add_patient(1)
+        return pd.DataFrame({"patients": [count]})
+
+    assert cached_frame("patients", ["PATIENT"], compute).iloc[0, 0] == 0
+    again = cached_frame("patients", ["PATIENT"], lambda: pd.DataFrame({"patients": [patients()]}))
+    assert again.iloc[0, 0] == 1
+
+
+def test_entries_expire_after_max_age():
+    cache = QueryCache(max_age=0)
+    cache.put("k", pd.DataFrame({"a": [1]}), table_versions(["patient"]))
+    assert cache.get("k") is None
+    assert cache.stats()["stale"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = QueryCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, pd.DataFrame({"a": [1]}), {})
+    cache.get("a")
+    cache.put("c", pd.DataFrame({"a": [1]}), {})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_results_larger_than_the_cache_are_not_kept():
+    df = pd.DataFrame({"a": range(1000)})
+    cache = QueryCache(max_bytes=int(df.memory_usage(deep=True).sum()) - 1)
+    cache.put("k", df, {})
+    assert cache.get("k") is None
+    assert cache.stats()["bytes"] == 0
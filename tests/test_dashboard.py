@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "HospitalApp.py")
+
+
+def dashboard(user_type):
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = "tester"
+    at.session_state["user_type"] = user_type
+    at.run()
+    assert not at.exception
+    return at
+
+
+def markdown(at):
+    return "\n".join(element.value for element in at.markdown)
+
+
+@pytest.mark.parametrize("user_type", ["Admin", "Doctor", "Nurse", "Cashier"])
+def test_staff_see_hospital_figures_and_booking(hospital_db, user_type):
+    at = dashboard(user_type)
+    text = markdown(at)
+    assert "Billed Today" in text
+    assert "Analytics Overview" in text
+    assert "Schedule Appointment" in [button.label for button in at.button]
+
+
+def test_patients_see_no_hospital_figures_or_booking(hospital_db):
+    at = dashboard("Patient")
+    text = markdown(at)
+    for hidden in ("Billed Today", "Invoices Today", "Today's Appointments", "Analytics Overview",
+                   "Upcoming Appointments"):
+        assert hidden not in text
+    assert "Schedule Appointment" not in [button.label for button in at.button]
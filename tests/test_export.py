@@ -0,0 +1,106 @@
+import csv
+import gzip
+import io
+import os
+
+import pytest
+
+import export
+import history
+from db import get_db_connection, get_writer
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def patients(hospital_db):
+    get_writer().executemany(
+        "INSERT INTO PATIENT (PAT_ID, FNAME, LNAME, EMAIL, PATIENT_TYPE) VALUES (?, ?, ?, ?, ?)",
+        [(i, f"First{i}", f"Last{i}", f"p{i}@example.com", "Outpatient") for i in range(1, 121)],
+    )
+    get_writer().execute(
+        "INSERT INTO USER_DATA (username, password, email, user_type) VALUES ('ann', 'secret', 'a@example.com', 'Admin')"
+    )
+    return hospital_db
+
+
+def read_csv(data):
+    return list(csv.reader(io.StringIO(data.decode("utf-8"))))
+
+
+def test_csv_export(patients):
+    calls = []
+    out = io.BytesIO()
+    assert export.export("patient", out, progress=lambda done, total: calls.append((done, total))) == 120
+    rows = read_csv(out.getvalue())
+    assert rows[0] == ["PAT_ID", "FNAME", "LNAME", "EMAIL", "PATIENT_TYPE"]
+    assert rows[1] == ["1", "First1", "Last1", "p1@example.com", "Outpatient"]
+    assert len(rows) == 121
+    assert calls[-1] == (120, 120)
+
+
+def test_rows_are_fetched_in_batches(patients):
+    with get_db_connection() as conn:
+        cursor = conn.execute("SELECT PAT_ID FROM PATIENT")
+        assert [len(rows) for rows in export.batches(cursor, 50)] == [50, 50, 20]
+
+
+def test_gzip_csv_export(patients):
+    out = io.BytesIO()
+    export.export("PATIENT", out, compression="gzip")
+    assert len(read_csv(gzip.decompress(out.getvalue()))) == 121
+
+
+def test_passwords_are_never_exported(patients):
+    out = io.BytesIO()
+    export.export("USER_DATA", out)
+    header, row = read_csv(out.getvalue())
+    assert "password" not in header
+    assert "secret" not in row
+
+
+def test_parquet_export_keeps_column_types(patients):
+    out = io.BytesIO()
+    export.export("PATIENT", out, fmt="parquet", compression="zstd")
+    table = pq.read_table(io.BytesIO(out.getvalue()))
+    assert table.num_rows == 120
+    assert str(table.schema.field("PAT_ID").type) == "int64"
+    assert str(table.schema.field("FNAME").type) == "string"
+
+
+def test_history_bodies_are_exported_as_text(patients, monkeypatch):
+    monkeypatch.setattr(history, "COMPRESS_BYTES", 16)
+    note = "Seen for a follow-up. " * 20
+    history.add_entry(1, "dr_who", note)
+    history.add_entry(1, "dr_who", "short")
+
+    for fmt in ("csv", "parquet"):
+        out = io.BytesIO()
+        export.export("PATIENT_HISTORY", out, fmt=fmt)
+        if fmt == "csv":
+            header, *rows = read_csv(out.getvalue())
+            bodies = [row[header.index("BODY")] for row in rows]
+        else:
+            table = pq.read_table(io.BytesIO(out.getvalue()))
+            header, bodies = table.schema.names, table.column("BODY").to_pylist()
+        assert "ENCODING" not in header
+        assert bodies == [note, "short"]
+
+
+def test_unknown_names_are_refused(patients):
+    with pytest.raises(ValueError):
+        export.export("sqlite_master", io.BytesIO())
+    assert export.export_name("patient_history") == "PATIENT_HISTORY"
+
+
+def test_failed_export_leaves_no_file(patients, tmp_path, monkeypatch):
+    def broken(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(export, "write_csv", broken)
+    out_dir = tmp_path / "exports"
+    out_dir.mkdir()
+    path = str(out_dir / "PATIENT.csv")
+    with pytest.raises(OSError):
+        export.export_to_file("PATIENT", path)
+    assert os.listdir(out_dir) == []
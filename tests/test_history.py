@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+import history
+from db import get_writer
+from export import exportable_objects
+from Hospital import SCHEMA
+from migrations import apply_migrations
+
+LEGACY_NOTES = [(1, "Ira", "asthma"), (2, "ira lane", "penicillin allergy"), (3, "Nobody", "unmatched")]
+
+
+def legacy_database(path):
+    """A database from before PATIENT_HISTORY, with notes in updated_history."""
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.execute("INSERT INTO PATIENT VALUES (1, 'Ira', 'Lane', 'ira@example.com', 'Inpatient')")
+    conn.executemany("INSERT INTO updated_history (ID, pat_name, history) VALUES (?, ?, ?)", LEGACY_NOTES)
+    conn.commit()
+    return conn
+
+
+def legacy_entries(conn):
+    return conn.execute(
+        "SELECT PAT_ID, TS, BODY FROM PATIENT_HISTORY WHERE AUTHOR = 'updated_history' ORDER BY ENTRY_ID"
+    ).fetchall()
+
+
+def test_legacy_notes_are_copied_undated(tmp_path):
+    conn = legacy_database(tmp_path / "old.db")
+    try:
+        apply_migrations(conn)
+        assert legacy_entries(conn) == [(1, "", "asthma"), (1, "", "penicillin allergy")]
+    finally:
+        conn.close()
+
+
+def test_notes_dated_by_an_earlier_copy_are_undated(tmp_path):
+    conn = legacy_database(tmp_path / "old.db")
+    try:
+        apply_migrations(conn)
+        # As the copy used to leave them
+        conn.execute("DROP TRIGGER patient_history_no_update")
+        conn.execute("UPDATE PATIENT_HISTORY SET TS = '2025-06-01 09:00:00'")
+        conn.commit()
+        conn.execute("INSERT INTO PATIENT_HISTORY (PAT_ID, TS, AUTHOR, BODY) VALUES (1, '2025-07-01 10:00:00', 'dr', 'x')")
+        apply_migrations(conn)
+        assert [ts for pat_id, ts, body in legacy_entries(conn)] == ["", ""]
+        assert conn.execute("SELECT TS FROM PATIENT_HISTORY WHERE AUTHOR = 'dr'").fetchone() == ("2025-07-01 10:00:00",)
+        # Append-only again
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("UPDATE PATIENT_HISTORY SET TS = ''")
+    finally:
+        conn.close()
+
+
+def test_undated_notes_page_after_dated_ones(hospital_db):
+    writer = get_writer()
+    writer.execute("INSERT INTO PATIENT VALUES (1, 'Ira', 'Lane', 'ira@example.com', 'Inpatient')")
+    writer.executemany(
+        "INSERT INTO PATIENT_HISTORY (PAT_ID, TS, AUTHOR, BODY) VALUES (1, '', 'updated_history', ?)",
+        [("old 1",), ("old 2",)],
+    )
+    history.add_entry(1, "dr", "new 1", ts="2025-01-01 09:00:00")
+    history.add_entry(1, "dr", "new 2", ts="2025-01-02 09:00:00")
+    first = history.entries(1, limit=3)
+    assert list(first["note"]) == ["new 2", "new 1", "old 2"]
+    last = first.iloc[-1]
+    rest = history.entries(1, before=(last["ts"], int(last["entry_id"])), limit=3)
+    assert list(rest["note"]) == ["old 1"]
+
+
+def test_nurse_patient_history_view_is_gone(tmp_path):
+    conn = legacy_database(tmp_path / "old.db")
+    try:
+        conn.execute("CREATE VIEW Nurse_Patient_History AS SELECT pat_name, history FROM updated_history")
+        apply_migrations(conn)
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'Nurse_Patient_History'").fetchone() is None
+    finally:
+        conn.close()
+    assert "Nurse_Patient_History" not in exportable_objects()
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from db import get_writer  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "HospitalApp.py")
+
+
+@pytest.fixture
+def ward(hospital_db):
+    writer = get_writer()
+    writer.execute("INSERT INTO NURSE (NURSE_ID, FNAME, LNAME) VALUES (7, 'Nia', 'Reed')")
+    writer.execute("INSERT INTO DOCTOR VALUES (3, 'Dr Hale', 'Cardiology', 'hale@example.com')")
+    writer.executemany(
+        "INSERT INTO PATIENT VALUES (?, ?, ?, ?, ?)",
+        [(1, "Ira", "Lane", "ira@example.com", "Inpatient"), (2, "Bo", "Kim", "bo@example.com", "Outpatient")],
+    )
+    writer.executemany(
+        "INSERT INTO APPOINTMENT (APPT_ID, DATE, TIME, PAT_ID, DOC_ID) VALUES (?, ?, ?, ?, 3)",
+        [(10, "1/5/2025", "2025-01-05 09:00:00", 1), (11, "1/6/2025", "2025-01-06 09:00:00", 2)],
+    )
+    return hospital_db
+
+
+def nurse_page(page, search=None):
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = "nia"
+    at.session_state["user_type"] = "Nurse"
+    at.session_state["identity"] = {"doc_id": None, "nurse_id": 7, "staff_id": None}
+    at.run()
+    at.sidebar.radio[0].set_value(page).run()
+    if search is not None:
+        at.text_input[0].input(search)
+        at.button[0].click().run()
+    assert not at.exception
+    return at
+
+
+def notes(at):
+    return [element.value for element in at.info] + [element.value for element in at.warning]
+
+
+@pytest.mark.parametrize("page", ["Appointments", "Assigned Doctor"])
+def test_unassigned_nurse_is_told_why_and_searches_all_patients(ward, page):
+    at = nurse_page(page)
+    assert any("No patients are assigned to you" in note for note in notes(at))
+    assert not at.dataframe
+
+    at = nurse_page(page, "bo")
+    assert list(at.dataframe[0].value["pat_id"]) == [2]
+
+
+def test_assigned_nurse_sees_only_assigned_patients(ward):
+    get_writer().execute("INSERT INTO NURSE_ASSIGNMENT (NURSE_ID, PAT_ID, ASSIGNED_FROM) VALUES (7, 1, '2025-01-01')")
+    at = nurse_page("Appointments")
+    assert not any("No patients are assigned to you" in note for note in notes(at))
+    assert list(at.dataframe[0].value["appt_id"]) == [10]
+    assert not any("Nurse ID" in element.value for element in at.markdown)
+
+    at = nurse_page("Assigned Doctor", "bo")
+    assert not at.dataframe
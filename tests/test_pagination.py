@@ -0,0 +1,108 @@
+import os
+import sqlite3
+
+import pytest
+
+from queries import PAGE_SIZE, count_sql, page_columns, page_sql
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "HospitalApp.py")
+
+# Ten rows whose day repeats, so sorting by it needs the key to break ties
+ROWS = [(i, f"2025-01-0{1 + i % 3}", i % 2, f"name {i}") for i in range(1, 11)]
+ROWS_SQL = "SELECT id, day, part, name FROM t"
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER, day TEXT, part INTEGER, name TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+def walk(conn, key, sort=None, descending=False, limit=3):
+    """Every page of ROWS_SQL, following each page's last row."""
+    pages = []
+    after = None
+    while True:
+        cursor = conn.execute(*page_sql(ROWS_SQL, (), key, sort, descending, after, limit))
+        names = [column[0] for column in cursor.description]
+        rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        if not rows:
+            return pages
+        pages.append(rows)
+        after = [rows[-1][column] for column in page_columns(key, sort)]
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("sort", [None, "day", "name"])
+def test_pages_cover_every_row_once_in_order(conn, sort, descending):
+    pages = walk(conn, "id", sort, descending)
+    rows = [row for page in pages for row in page]
+    assert sorted(row["id"] for row in rows) == [row[0] for row in ROWS]
+    order = [(row[sort], row["id"]) if sort else row["id"] for row in rows]
+    assert order == sorted(order, reverse=descending)
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+
+
+def test_a_composite_key_breaks_ties_on_both_columns(conn):
+    conn.execute("INSERT INTO t VALUES (1, '2025-01-09', 1, 'same id, other part')")
+    rows = [row for page in walk(conn, ("id", "part"), limit=2) for row in page]
+    assert [(row["id"], row["part"]) for row in rows] == sorted([(1, 1)] + [(row[0], row[2]) for row in ROWS])
+
+
+@pytest.mark.parametrize("limit", [1, 5, 10, 11])
+def test_page_sizes_that_divide_the_rows_or_exceed_them(conn, limit):
+    pages = walk(conn, "id", limit=limit)
+    assert [len(page) for page in pages] == [min(limit, 10 - i) for i in range(0, 10, limit)]
+
+
+def test_after_the_last_row_there_is_nothing(conn):
+    assert conn.execute(*page_sql(ROWS_SQL, (), "id", after=[10])).fetchall() == []
+    assert conn.execute(*page_sql(ROWS_SQL, (), "id", descending=True, after=[1])).fetchall() == []
+
+
+def test_filters_and_their_params_are_kept(conn):
+    sql = ROWS_SQL + " WHERE part = ?;"
+    assert conn.execute(count_sql(sql), (1,)).fetchone() == (5,)
+    ids = [row[0] for row in conn.execute(*page_sql(sql, (1,), "id", after=[3], limit=2))]
+    assert ids == [5, 7]
+
+
+def test_next_and_previous_buttons_at_the_page_boundary(hospital_db):
+    pytest.importorskip("streamlit")
+    from streamlit.testing.v1 import AppTest
+
+    from db import get_writer
+
+    writer = get_writer()
+    writer.execute("INSERT INTO NURSE VALUES (7, 'Nia', 'Reed')")
+    writer.execute("INSERT INTO DOCTOR VALUES (3, 'Dr Hale', 'Cardiology', 'hale@example.com')")
+    writer.execute("INSERT INTO PATIENT VALUES (1, 'Ira', 'Lane', 'ira@example.com', 'Inpatient')")
+    writer.execute("INSERT INTO NURSE_ASSIGNMENT (NURSE_ID, PAT_ID, ASSIGNED_FROM) VALUES (7, 1, '2025-01-01')")
+    writer.executemany(
+        "INSERT INTO APPOINTMENT (APPT_ID, DATE, TIME, PAT_ID, DOC_ID) VALUES (?, '2/1/2025', ?, 1, 3)",
+        [(appt_id, f"2025-02-01 09:{appt_id % 60:02d}:00") for appt_id in range(1, PAGE_SIZE + 2)],
+    )
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = "nia"
+    at.session_state["user_type"] = "Nurse"
+    at.session_state["identity"] = {"doc_id": None, "nurse_id": 7, "staff_id": None}
+    at.run()
+    at.sidebar.radio[0].set_value("Appointments").run()
+    buttons = {button.label: button for button in at.button}
+    assert len(at.dataframe[0].value) == PAGE_SIZE
+    assert buttons["◀ Previous"].disabled and not buttons["Next ▶"].disabled
+
+    buttons["Next ▶"].click().run()
+    buttons = {button.label: button for button in at.button}
+    assert list(at.dataframe[0].value.iloc[:, 0]) == [PAGE_SIZE + 1]
+    assert buttons["Next ▶"].disabled and not buttons["◀ Previous"].disabled
+    assert f"Rows {PAGE_SIZE + 1}–{PAGE_SIZE + 1} of {PAGE_SIZE + 1}" in [caption.value for caption in at.caption]
+
+    buttons["◀ Previous"].click().run()
+    assert len(at.dataframe[0].value) == PAGE_SIZE
+    assert not at.exception
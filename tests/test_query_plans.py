@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import queries
+from Hospital import create_schema
+from migrations import INDEXES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPOINTMENT_INDEXES = [name for table, name, columns in INDEXES if table == "APPOINTMENT"]
+
+
+@pytest.fixture(scope="module")
+def migrated(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("plans") / "hospital.db")
+    create_schema(path)
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+def unindexed_appointments(path):
+    """A migrated database at path without APPOINTMENT's secondary indexes."""
+    create_schema(path)
+    conn = sqlite3.connect(path)
+    for name in APPOINTMENT_INDEXES:
+        conn.execute(f"DROP INDEX {name}")
+    conn.commit()
+    return conn
+
+
+@pytest.mark.parametrize("name, sql, params", [
+    pytest.param(name, sql, params, id=name) for name, sql, params in queries.planned_queries()
+])
+def test_no_scan_of_large_tables(migrated, name, sql, params):
+    scanned = queries.full_scans(migrated, sql, params) & queries.LARGE_TABLES
+    assert scanned <= queries.ALLOWED_SCANS.get(name, set())
+
+
+def test_full_scans_sees_unindexed_filters(migrated):
+    assert queries.full_scans(migrated, "SELECT * FROM APPOINTMENT WHERE TIME = ?", ("09:00:00",)) == {"APPOINTMENT"}
+    assert queries.full_scans(migrated, "SELECT * FROM APPOINTMENT WHERE APPT_ID = ?", (1,)) == set()
+
+
+def test_full_scans_names_the_table_behind_an_alias(migrated):
+    sql = "SELECT * FROM PATIENT P JOIN APPOINTMENT A ON A.PAT_ID = P.PAT_ID WHERE A.TIME = ?"
+    assert queries.full_scans(migrated, sql, ("09:00:00",)) == {"APPOINTMENT"}
+
+
+def test_check_query_plans_reports_missing_indexes(tmp_path):
+    conn = unindexed_appointments(str(tmp_path / "hospital.db"))
+    problems = queries.check_query_plans(conn)
+    conn.close()
+    assert ("DOCTOR_APPOINTMENTS", "APPOINTMENT") in problems
+    assert all(table == "APPOINTMENT" for name, table in problems)
+
+
+def test_command_line_check_leaves_the_database_alone(tmp_path):
+    path = str(tmp_path / "hospital.db")
+    unindexed_appointments(path).close()
+
+    env = {**os.environ, "HOSPITAL_DB": path}
+    result = subprocess.run([sys.executable, "queries.py"], cwd=ROOT, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 1
+    assert "DOCTOR_APPOINTMENTS: full scan of APPOINTMENT" in result.stdout
+    conn = sqlite3.connect(path)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert not indexes & set(APPOINTMENT_INDEXES)
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+import queries
+from query_stats import InstrumentedConnection, QueryStats, get_stats, page, query_name
+
+
+@pytest.mark.parametrize("sql, name", [
+    ("CREATE INDEX IF NOT EXISTS idx_appointment_doc_pat ON APPOINTMENT (DOC_ID, PAT_ID)",
+     "CREATE INDEX idx_appointment_doc_pat"),
+    ("create unique index idx_staff_email on STAFF(EMAIL)", "CREATE INDEX idx_staff_email"),
+    ("DROP TRIGGER IF EXISTS agg_billing_ai", "DROP TRIGGER agg_billing_ai"),
+    ("CREATE VIEW v AS SELECT * FROM PATIENT", "CREATE VIEW v"),
+    ("ALTER TABLE Billing ADD COLUMN BILLED_ON TEXT", "ALTER TABLE Billing"),
+    ("PRAGMA journal_mode=WAL", "PRAGMA journal_mode"),
+    ("PRAGMA table_info(STAFF)", "PRAGMA table_info"),
+    ("BEGIN IMMEDIATE", "BEGIN"),
+])
+def test_schema_statements_are_named_after_their_object(sql, name):
+    assert query_name(sql) == name
+
+
+def test_queries_are_named_after_their_constant():
+    assert query_name(queries.UNDATED_INVOICES) == "UNDATED_INVOICES"
+    assert query_name(queries.UNDATED_INVOICES + " AND amount > 0") == "UNDATED_INVOICES (variant)"
+    assert query_name("SELECT 1 FROM STAFF WHERE 0").startswith("SELECT STAFF #")
+
+
+def test_each_schema_statement_keeps_its_own_sql(tmp_path):
+    stats = get_stats()
+    stats.reset()
+    conn = sqlite3.connect(tmp_path / "t.db", factory=InstrumentedConnection)
+    try:
+        with page("load STAFF"):
+            conn.execute("CREATE TABLE STAFF (STAFF_ID INTEGER, EMAIL TEXT)")
+            conn.execute("CREATE INDEX idx_staff_email ON STAFF (EMAIL)")
+        with page("load DOCTOR"):
+            conn.execute("CREATE TABLE DOCTOR (DOC_ID INTEGER, DEPT TEXT)")
+            conn.execute("CREATE INDEX idx_doctor_dept ON DOCTOR (DEPT)")
+    finally:
+        conn.close()
+    rows = {(row["query"], row["page"]): row["sql"] for row in stats.snapshot()}
+    stats.reset()
+    assert rows[("CREATE INDEX idx_staff_email", "load STAFF")] == "CREATE INDEX idx_staff_email ON STAFF (EMAIL)"
+    assert rows[("CREATE INDEX idx_doctor_dept", "load DOCTOR")] == "CREATE INDEX idx_doctor_dept ON DOCTOR (DEPT)"
+    assert ("CREATE INDEX idx_staff_email", "load DOCTOR") not in rows
+    assert not any(name == "CREATE" for name, unused in rows)
+
+
+def test_slow_writes_are_logged_without_their_values(tmp_path):
+    stats = QueryStats(slow_seconds=0, slow_log=str(tmp_path / "slow.log"))
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE STAFF (STAFF_ID INTEGER, PASSWORD TEXT)")
+    try:
+        stats.record(conn, "INSERT INTO STAFF VALUES (?, ?)", (1, "hash"), 0.2, 1, "Admin")
+        stats.record(conn, "SELECT * FROM STAFF WHERE STAFF_ID = ?", (1,), 0.2, 1, "Admin")
+    finally:
+        conn.close()
+    write, read = reversed(stats.slow_queries())
+    assert write["params"] is None
+    assert read["params"] == [1] and read["plan"]
+    assert len((tmp_path / "slow.log").read_text().splitlines()) == 2
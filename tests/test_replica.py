@@ -0,0 +1,107 @@
+import glob
+import os
+import sqlite3
+
+import pytest
+
+from Hospital import create_schema
+from replica import ReplicaManager
+
+
+@pytest.fixture
+def primary(tmp_path):
+    path = str(tmp_path / "hospital.db")
+    create_schema(path)
+    return path
+
+
+@pytest.fixture
+def replica(primary):
+    replica = ReplicaManager(primary, max_staleness=30, refresh_seconds=10)
+    yield replica
+    replica.close()
+
+
+def add_department(path, dept_id):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO DEPARTMENT VALUES (?, 'Cardiology')", (dept_id,))
+    conn.commit()
+    conn.close()
+
+
+def departments(replica):
+    with replica.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM DEPARTMENT").fetchone()[0]
+
+
+def snapshot_files(primary):
+    return sorted(glob.glob(os.path.splitext(primary)[0] + ".replica-*"))
+
+
+def test_reads_go_to_the_primary_before_the_first_copy(replica):
+    assert replica.connection() is None
+    assert replica.current_generation() is None
+
+
+def test_unchanged_database_is_not_copied_again(replica):
+    assert replica.refresh()
+    assert not replica.refresh()
+    assert replica.stats()["copies"] == 1
+    assert replica.stats()["unchanged"] == 1
+
+
+def test_commits_are_copied_only_when_the_snapshot_nears_max_staleness(primary, replica):
+    replica.refresh()
+    add_department(primary, 1)
+    assert not replica.refresh()
+    assert replica.stats()["deferred"] == 1
+    assert departments(replica) == 0
+
+    # 21 s after the copy, the next refresh would be too late
+    replica._synced_at -= 21
+    assert replica.refresh()
+    assert replica.current_generation() == 2
+    assert departments(replica) == 1
+
+
+def test_stale_snapshot_is_not_read(replica):
+    replica.refresh()
+    replica._synced_at -= 31
+    assert replica.connection() is None
+
+
+def test_snapshot_in_use_is_kept_until_returned(primary, replica):
+    replica.refresh()
+    first = snapshot_files(primary)
+    add_department(primary, 1)
+    with replica.connection() as conn:
+        replica._synced_at -= 30
+        assert replica.refresh()
+        # Still readable, and still the old copy
+        assert conn.execute("SELECT COUNT(*) FROM DEPARTMENT").fetchone()[0] == 0
+        assert len(snapshot_files(primary)) == 2
+    replica.refresh()
+    assert snapshot_files(primary) != first
+    assert len(snapshot_files(primary)) == 1
+
+
+def test_connection_never_entered_holds_no_file(primary, replica):
+    replica.refresh()
+    handed_out = replica.connection()
+    add_department(primary, 1)
+    replica._synced_at -= 30
+    assert replica.refresh()
+    # Retired copies are removed on the refresh after
+    replica.refresh()
+    assert len(snapshot_files(primary)) == 1
+    # Entered after the refresh, it reads the new copy
+    with handed_out as conn:
+        assert conn.execute("SELECT COUNT(*) FROM DEPARTMENT").fetchone()[0] == 1
+    assert replica._pending == {}
+
+
+def test_close_removes_snapshot_files(primary, replica):
+    replica.refresh()
+    assert snapshot_files(primary)
+    replica.close()
+    assert snapshot_files(primary) == []
@@ -0,0 +1,138 @@
+import random
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduling
+from db import get_writer
+from scheduling import IntervalTree, Schedule, SlotTaken, book, free_slots, get_schedule
+
+DAY = datetime(2030, 3, 4)
+
+
+def at(hour, minute=0):
+    return DAY.replace(hour=hour, minute=minute)
+
+
+def brute_overlapping(intervals, start, end):
+    # In the tree's (start, key) order
+    return sorted(((s, e, k) for s, e, k in intervals if s < end and e > start), key=lambda i: (i[0], i[2]))
+
+
+def check_max_end(node):
+    if node is None:
+        return None
+    ends = [node.end] + [e for e in (check_max_end(node.left), check_max_end(node.right)) if e is not None]
+    assert node.max_end == max(ends)
+    return node.max_end
+
+
+def test_tree_matches_brute_force_through_inserts_and_removes():
+    rng = random.Random(21)
+    intervals = []
+    for key in range(300):
+        start = rng.randrange(0, 1000)
+        intervals.append((start, start + rng.randrange(1, 60), key))
+    intervals.sort(key=lambda interval: (interval[0], interval[2]))
+    tree = IntervalTree.from_sorted(intervals[:150])
+    for interval in intervals[150:]:
+        tree.insert(*interval)
+    for start, end, key in rng.sample(intervals, 100):
+        assert tree.remove(start, key)
+        intervals.remove((start, end, key))
+    assert not tree.remove(-1, -1)
+    assert len(tree) == len(intervals)
+    check_max_end(tree._root)
+
+    for _ in range(500):
+        start = rng.randrange(-50, 1100)
+        end = start + rng.randrange(1, 80)
+        expected = brute_overlapping(intervals, start, end)
+        assert tree.overlapping(start, end) == expected
+        assert tree.overlaps(start, end) == bool(expected)
+
+
+def test_intervals_are_half_open():
+    tree = IntervalTree.from_sorted([(10, 20, 1)])
+    assert not tree.overlaps(20, 30) and not tree.overlaps(0, 10)
+    assert tree.overlaps(19, 30) and tree.overlaps(0, 11)
+    assert tree.overlapping(0, 100) == [(10, 20, 1)]
+    assert IntervalTree().overlapping(0, 100) == [] and not IntervalTree().overlaps(0, 100)
+
+
+@pytest.fixture
+def clinic(hospital_db, monkeypatch):
+    monkeypatch.setattr(scheduling, "_schedule", Schedule())
+    writer = get_writer()
+    writer.execute("INSERT INTO DOCTOR VALUES (3, 'Dr Hale', 'Cardiology', 'hale@example.com')")
+    writer.execute("INSERT INTO DOCTOR VALUES (4, 'Dr Moss', 'Cardiology', 'moss@example.com')")
+    writer.execute("INSERT INTO PATIENT VALUES (1, 'Ira', 'Lane', 'ira@example.com', 'Inpatient')")
+    return hospital_db
+
+
+def test_bookings_that_touch_do_not_conflict(clinic):
+    book(3, 1, at(9))
+    book(3, 1, at(9, 30))
+    book(3, 1, at(8, 30))
+    with pytest.raises(SlotTaken):
+        book(3, 1, at(9, 15))
+    with pytest.raises(SlotTaken):
+        book(3, 1, at(8, 45), minutes=120)
+    book(4, 1, at(9, 15))
+    assert get_schedule().stats()["rejected"] == 2
+
+
+def test_an_appointment_the_tree_missed_is_caught_in_sql(clinic):
+    schedule = get_schedule()
+    assert schedule.is_free(3, at(10), at(10, 30))
+    # Written behind the tree's back, e.g. by another process
+    get_writer().execute(
+        "INSERT INTO APPOINTMENT (APPT_ID, DATE, TIME, PAT_ID, DOC_ID) "
+        "VALUES (50, '3/4/2030', '2030-03-04T10:00:00.000Z', 1, 3)"
+    )
+    with pytest.raises(SlotTaken, match="appointment 50"):
+        book(3, 1, at(10, 15))
+    assert schedule.stats()["conflicts"] == 1
+    # The tree is read again and now refuses the slot up front
+    assert not schedule.is_free(3, at(10, 15), at(10, 45))
+
+
+def test_concurrent_bookings_of_one_slot_book_it_once(clinic):
+    results = []
+
+    def attempt():
+        try:
+            results.append(book(3, 1, at(11)))
+        except SlotTaken:
+            results.append(None)
+
+    threads = [threading.Thread(target=attempt) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len([appt_id for appt_id in results if appt_id is not None]) == 1
+
+
+def test_free_slots_skip_busy_times_and_stay_in_opening_hours(clinic):
+    book(3, 1, at(8))
+    book(3, 1, at(9), minutes=60)
+    slots = free_slots([(3, "Dr Hale")], after=at(7, 50), limit=4)
+    assert [start for start, end, doc_id, doc_name in slots] == [at(8, 30), at(10), at(10, 15), at(10, 30)]
+
+    late = free_slots([(3, "Dr Hale")], after=at(17, 20), limit=2)
+    assert [start for start, end, doc_id, doc_name in late] == [at(17, 30), DAY + timedelta(days=1, hours=8)]
+
+
+def test_free_slots_merge_doctors_by_start(clinic):
+    book(3, 1, at(8))
+    slots = free_slots([(3, "Dr Hale"), (4, "Dr Moss")], after=at(8), limit=3)
+    assert [(start, doc_id) for start, end, doc_id, doc_name in slots] == [(at(8), 4), (at(8, 15), 4), (at(8, 30), 3)]
+
+
+def test_slot_lengths_are_bounded(clinic):
+    with pytest.raises(ValueError):
+        book(3, 1, at(9), minutes=0)
+    with pytest.raises(ValueError):
+        free_slots([(3, "Dr Hale")], minutes=scheduling.MAX_MINUTES + 1)
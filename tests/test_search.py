@@ -0,0 +1,56 @@
+import pytest
+
+import queries
+from cache import read_sql
+from db import get_db_connection, get_writer
+from search import patient_id_filter
+
+PATIENTS = [
+    (1, "Ira", "Lane", "ira@example.com", "Inpatient"),
+    (2, "Mira", "Stone", "mira@example.com", "Outpatient"),
+    (3, "Bo", "Kira", "bo@example.com", "Outpatient"),
+    (4, "Al_x", "100%", "al@example.com", "Inpatient"),
+]
+
+
+@pytest.fixture
+def patients(hospital_db):
+    get_writer().executemany("INSERT INTO PATIENT VALUES (?, ?, ?, ?, ?)", PATIENTS)
+    return hospital_db
+
+
+def found(term):
+    return sorted(read_sql(*queries.patients_by_name(term))["PAT_ID"])
+
+
+@pytest.mark.parametrize("term", ["", "   ", None])
+def test_empty_terms_are_refused(term):
+    with pytest.raises(ValueError):
+        patient_id_filter(term)
+
+
+@pytest.mark.parametrize("term, ids", [
+    ("i", [1, 2, 3]),
+    ("R", [1, 2, 3]),
+    ("ra", [1, 2, 3]),
+    ("ir", [1, 2, 3]),
+    (" bo ", [3]),
+    ("ira", [1, 2, 3]),
+    ("mira", [2]),
+    ("zz", []),
+])
+def test_terms_of_any_length_match_substrings(patients, term, ids):
+    assert found(term) == ids
+
+
+@pytest.mark.parametrize("term, ids", [("_", [4]), ("%", [4]), ("l_", [4]), ("a%", [])])
+def test_like_wildcards_match_themselves(patients, term, ids):
+    assert found(term) == ids
+
+
+def test_short_terms_scan_the_name_indexes_not_the_table(patients):
+    sql, params = queries.patients_by_name("ra")
+    with get_db_connection() as conn:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    scans = [step for step in plan if step.startswith("SCAN")]
+    assert scans and all("COVERING INDEX" in step for step in scans)
@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db
+from db import WriterQueue, WriteTimeout
+
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / "writer.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE parent (id INTEGER PRIMARY KEY);
+        CREATE TABLE child (
+            id INTEGER PRIMARY KEY,
+            parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED
+        );
+        CREATE TABLE note (id INTEGER PRIMARY KEY, body TEXT NOT NULL);
+    """)
+    conn.close()
+    writer = WriterQueue(path, timeout=5)
+    yield writer
+    writer.close()
+
+
+def held_batch(writer):
+    """Hold the writer in a job until the returned event is set, so jobs submitted meanwhile commit as one batch."""
+    started, release = threading.Event(), threading.Event()
+
+    def hold(conn):
+        started.set()
+        release.wait(5)
+
+    writer.submit(hold)
+    started.wait(5)
+    return release
+
+
+def notes(writer):
+    return writer.call(lambda conn: [row[0] for row in conn.execute("SELECT body FROM note ORDER BY id")])
+
+
+def test_failing_job_rolls_back_only_itself(writer):
+    release = held_batch(writer)
+
+    def half_written(conn):
+        conn.execute("INSERT INTO note (body) VALUES ('half')")
+        raise ValueError("job failed")
+
+    first = writer.submit(lambda conn: conn.execute("INSERT INTO note (body) VALUES ('a')").rowcount)
+    failing = writer.submit(half_written)
+    last = writer.submit(lambda conn: conn.execute("INSERT INTO note (body) VALUES ('b')").rowcount)
+    release.set()
+
+    assert first.result(5) == 1 and last.result(5) == 1
+    with pytest.raises(ValueError):
+        failing.result(5)
+    assert notes(writer) == ["a", "b"]
+    assert writer.stats()["failed"] == 1
+
+
+def test_failed_commit_fails_the_whole_batch(writer):
+    release = held_batch(writer)
+    ok = writer.submit(lambda conn: conn.execute("INSERT INTO note (body) VALUES ('lost')"))
+    # The deferred foreign key is only checked at COMMIT
+    orphan = writer.submit(lambda conn: conn.execute("INSERT INTO child (parent_id) VALUES (42)"))
+    release.set()
+
+    for future in (ok, orphan):
+        with pytest.raises(sqlite3.IntegrityError):
+            future.result(5)
+    assert notes(writer) == []
+    assert writer.execute("INSERT INTO note (body) VALUES ('after')") == 1
+    assert notes(writer) == ["after"]
+
+
+def test_savepoint_error_fails_batch_and_writer_goes_on(writer):
+    def ends_transaction(conn):
+        # Leaves no savepoint for the writer to roll back to
+        conn.execute("COMMIT")
+        raise ValueError("job failed")
+
+    with pytest.raises(sqlite3.OperationalError):
+        writer.call(ends_transaction)
+    assert writer.stats()["failed_batches"] == 1
+    assert writer.execute("INSERT INTO note (body) VALUES ('after')") == 1
+    assert notes(writer) == ["after"]
+
+
+def test_failing_commit_listener_fails_batch_and_writer_goes_on(writer, monkeypatch):
+    def broken(tables):
+        raise RuntimeError("listener failed")
+
+    monkeypatch.setattr(db, "_commit_listeners", [broken])
+    with pytest.raises(RuntimeError):
+        writer.execute("INSERT INTO note (body) VALUES ('a')")
+
+    seen = []
+    monkeypatch.setattr(db, "_commit_listeners", [seen.append])
+    assert writer.execute("INSERT INTO note (body) VALUES ('b')") == 1
+    assert seen[-1] == {"note"}
+
+
+def test_execute_times_out_while_writer_is_busy(writer):
+    writer.timeout = 0.1
+    release = held_batch(writer)
+    try:
+        with pytest.raises(WriteTimeout):
+            writer.execute("INSERT INTO note (body) VALUES ('late')")
+    finally:
+        release.set()
+    writer.timeout = 5
+    # The timed-out write still commits once the writer gets to it
+    assert notes(writer) == ["late"]
+
+
+# The thread's SystemExit is reported by pytest as an unhandled thread exception
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_writer_thread_is_restarted(writer):
+    def stop(conn):
+        raise SystemExit
+
+    future = writer.submit(stop)
+    with pytest.raises(SystemExit):
+        future.result(5)
+    writer._thread.join(5)
+    assert not writer._thread.is_alive()
+
+    assert writer.execute("INSERT INTO note (body) VALUES ('a')") == 1
+    assert writer.stats()["restarts"] == 1
+
+
+def test_submit_after_close_raises(writer):
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.submit(lambda conn: None)